@@ -290,20 +290,10 @@ Provide your evaluation as a raw JSON object, without any markdown formatting or
 """.strip()
 
 
-COMPONENT_CONSISTENCY_PROMPT = """
-You are an expert AI assistant specializing in electronic circuit analysis. Your task is to perform a sophisticated consistency evaluation of two AI models' analyses for a single component, using a provided circuit diagram as the ground truth.
+# 单个组件对与批量评估共用的命名说明和评分标准，两种方式的分数才可以直接比较
+_COMPONENT_NAMING_NOTE = """A key challenge is that the models might use slightly different names for connected components (e.g., Model 1 refers to "U1_ADC" while Model 2 refers to "ADC_Module"). Your evaluation must look beyond simple name matching and focus on functional equivalence."""
 
-A key challenge is that the models might use slightly different names for connected components (e.g., Model 1 refers to "U1_ADC" while Model 2 refers to "ADC_Module"). Your evaluation must look beyond simple name matching and focus on functional equivalence.
-
-Component from Model 1: "{component1_name}"
-Model 1 Analysis: 
-{component1_details}
-
-Matched Component from Model 2: "{component2_name}"
-Model 2 Analysis: 
-{component2_details}
-
-You must use the original circuit diagram image as the primary source of truth to resolve ambiguities.
+_COMPONENT_CONSISTENCY_CRITERIA = """You must use the original circuit diagram image as the primary source of truth to resolve ambiguities.
 
 Please evaluate the consistency based on the following prioritized criteria:
 
@@ -338,7 +328,22 @@ Finally, **adjust this `base_score` to determine the final `consistency_score`**
 **Edge Case:**
 * If either analysis (`component1_details` or `component2_details`) is null, empty, or clearly irrelevant, `is_consistent` must be `false`, `consistency_score` must be `0`, and the reason should be "The compared context is null or empty".
 
-Provide your evaluation as a raw JSON object, without any markdown formatting or surrounding text.
+"""
+
+COMPONENT_CONSISTENCY_PROMPT = ("""
+You are an expert AI assistant specializing in electronic circuit analysis. Your task is to perform a sophisticated consistency evaluation of two AI models' analyses for a single component, using a provided circuit diagram as the ground truth.
+
+""" + _COMPONENT_NAMING_NOTE + """
+
+Component from Model 1: "{component1_name}"
+Model 1 Analysis: 
+{component1_details}
+
+Matched Component from Model 2: "{component2_name}"
+Model 2 Analysis: 
+{component2_details}
+
+""" + _COMPONENT_CONSISTENCY_CRITERIA + """Provide your evaluation as a raw JSON object, without any markdown formatting or surrounding text.
 
 {{
   "component_pair": "{component1_name}",
@@ -348,4 +353,28 @@ Provide your evaluation as a raw JSON object, without any markdown formatting or
   "reasoning": "（用中文回答原因。请在解释你是如何根据功能描述的质量将base_score调整为最终分数的。）"
   "right_model": "model1/model2/both/none",(which model is right according to the connections in the diagram)
 }}
-""".strip()
\ No newline at end of file
+""").strip()
+COMPONENT_CONSISTENCY_BATCH_PROMPT = ("""
+You are an expert AI assistant specializing in electronic circuit analysis. Your task is to perform a sophisticated consistency evaluation of two AI models' analyses for each of the {component_count} components listed below, using a provided circuit diagram as the ground truth.
+
+""" + _COMPONENT_NAMING_NOTE + """
+
+{component_blocks}
+
+Evaluate every component independently, applying the criteria and scoring methodology below to each component exactly as you would for a single component.
+
+""" + _COMPONENT_CONSISTENCY_CRITERIA + """Provide your evaluation as a raw JSON object, without any markdown formatting or surrounding text. The "results" array must contain exactly one entry per component, and each "component_pair" must repeat the component key exactly as given above.
+
+{{
+  "results": [
+    {{
+      "component_pair": "<component key>",
+      "is_consistent": true/false,
+      "consistency_score": 0-100,
+      "score_details": [N_consistent, N_total_model1, N_total_model2, base_score],
+      "reasoning": "（用中文回答原因。请在解释你是如何根据功能描述的质量将base_score调整为最终分数的。）",
+      "right_model": "model1/model2/both/none"
+    }}
+  ]
+}}
+""").strip()
@@ -0,0 +1,89 @@
+"""
+JSON schemas for structured (guided) decoding, one per prompt type
+"""
+
+COMPONENTS_LIST_SCHEMA = {
+    "type": "array",
+    "items": {"type": "string"},
+}
+
+
+def _connection_list(item_properties: dict) -> dict:
+    return {
+        "type": "array",
+        "items": {
+            "type": "object",
+            "properties": item_properties,
+            "required": ["name"],
+        },
+    }
+
+
+def _connections(item_properties: dict) -> dict:
+    return {
+        "type": "object",
+        "properties": {
+            "input": _connection_list(item_properties),
+            "output": _connection_list(item_properties),
+            "bidirectional": _connection_list(item_properties),
+        },
+        "required": ["input", "output", "bidirectional"],
+    }
+
+
+# prompts_node.COMPONENT_IO_PROMPT_MODEL
+COMPONENT_IO_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "component_name": {"type": "string"},
+        "connections": _connections({"name": {"type": "string"}, "description": {"type": "string"}}),
+    },
+    "required": ["component_name", "connections"],
+}
+
+# prompts_node.COMPONENT_IO_PROMPT_MODE_WITH_BOX
+COMPONENT_IO_BOX_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "component_name": {"type": "string"},
+        "box": {"type": "string"},
+        "connections": _connections({"name": {"type": "string"}, "box": {"type": "string"}}),
+    },
+    "required": ["component_name", "box", "connections"],
+}
+
+# prompts_node.COMPONENT_IO_PROMPT_MODEL_QWEN（连接直接放在顶层）
+COMPONENT_IO_QWEN_SCHEMA = _connections({"name": {"type": "string"}, "box": {"type": "string"}})
+
+# prompts.CONSISTENCY_EVAL_PROMPT
+CONSISTENCY_VERDICT_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "is_consistent": {"type": "boolean"},
+        "reason": {"type": "string"},
+    },
+    "required": ["is_consistent", "reason"],
+}
+
+# prompts.COMPONENT_CONSISTENCY_PROMPT
+COMPONENT_CONSISTENCY_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "component_pair": {"type": "string"},
+        "is_consistent": {"type": "boolean"},
+        "consistency_score": {"type": "number", "minimum": 0, "maximum": 100},
+        "score_details": {"type": "array", "items": {"type": "number"}},
+        "reasoning": {"type": "string"},
+        "right_model": {"type": "string", "enum": ["model1", "model2", "both", "none"]},
+    },
+    "required": ["component_pair", "is_consistent", "consistency_score", "score_details", "reasoning", "right_model"],
+}
+
+# prompts.COMPONENT_CONSISTENCY_BATCH_PROMPT
+COMPONENT_CONSISTENCY_BATCH_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "results": {"type": "array", "items": COMPONENT_CONSISTENCY_SCHEMA},
+    },
+    "required": ["results"],
+}
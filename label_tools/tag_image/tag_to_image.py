@@ -1,11 +1,19 @@
 import streamlit as st
 import os
+import sys
 import json
+import sqlite3
 import pandas as pd
 from typing import List, Dict, Any
 import time
+import atexit
+import threading
 import contextlib
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.result_db import default_db_path, open_result_db
+
 # --- Thread-Safe File Locking ---
 @contextlib.contextmanager
 def file_lock(lock_file):
@@ -32,6 +40,8 @@ def file_lock(lock_file):
 # --- Configuration ---
 IMAGE_EXTENSIONS = ['.png', '.jpg', '.jpeg', '.bmp', '.gif']
 ANNOTATIONS_FILE_DEFAULT = "annotations.json"
+# Seconds after a write before annotations.json is re-exported from the SQLite store
+EXPORT_DELAY = 5.0
 
 # --- Helper Functions ---
 
@@ -44,8 +54,58 @@ def find_images(directory: str) -> List[str]:
                 image_files.append(os.path.join(root, file))
     return sorted(image_files)
 
+class AnnotationStore:
+    """
+    The SQLite store (WAL mode) next to one annotations JSON file, shared by all sessions of this process.
+    Writes update a single image's row; annotations.json is re-exported in the background at most
+    EXPORT_DELAY seconds after the last write, and once more when the process exits.
+    """
+
+    def __init__(self, json_filepath: str):
+        self.json_filepath = json_filepath
+        # The store is created from the JSON file on first use
+        self.db = open_result_db(json_filepath)
+        self._lock = threading.Lock()
+        self._timer = None
+        atexit.register(self.flush)
+
+    def update(self, image_name: str, fields: Dict[str, Any]) -> Dict[str, Any]:
+        record = self.db.merge(image_name, fields)
+        self._schedule_export()
+        return record
+
+    def _schedule_export(self):
+        with self._lock:
+            if self._timer is None:
+                self._timer = threading.Timer(EXPORT_DELAY, self._export_in_background)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def _export_in_background(self):
+        try:
+            self.flush()
+        except (TimeoutError, sqlite3.OperationalError) as e:
+            # 文件或数据库正被其他用户占用，下一次写入会重新安排导出
+            print(f"自动导出 {self.json_filepath} 失败: {e}")
+
+    def flush(self) -> int:
+        """Exports the store to the JSON file now, in the original format (indent=4)."""
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+        with file_lock(self.json_filepath):
+            return self.db.export_json(self.json_filepath, indent=4)
+
+@st.cache_resource
+def get_annotation_store(json_filepath: str) -> AnnotationStore:
+    """One store (and one SQLite connection per thread) per annotations file for the whole process."""
+    return AnnotationStore(json_filepath)
+
 def load_annotations(filepath: str) -> Dict[str, Any]:
-    """Loads annotations from a JSON file."""
+    """Loads annotations, preferring the SQLite store next to the JSON file when it exists."""
+    if os.path.exists(default_db_path(filepath)):
+        return get_annotation_store(filepath).db.load_all()
     if os.path.exists(filepath):
         with open(filepath, 'r', encoding='utf-8') as f:
             try:
@@ -61,25 +121,20 @@ def save_annotations(filepath: str, data: Dict[str, Any]):
 
 def safe_update_annotation(json_filepath: str, image_name: str, image_path: str, new_tags: List[str], annotator: str) -> Dict[str, Any]:
     """
-    Safely reads, updates, and writes a single image's annotation using a file lock.
-    Returns the full, updated annotations dictionary.
+    Updates a single image's annotation in the SQLite store (WAL mode) next to the JSON file.
+    Only this image's row is written; annotations.json follows within EXPORT_DELAY seconds.
+    Returns the updated annotation of this image.
     """
-    with file_lock(json_filepath):
-        # Read the latest data from the file inside the lock
-        annotations = load_annotations(json_filepath)
-        
-        # Get or create the annotation entry and update it
-        image_info = annotations.get(image_name, {})
-        image_info['image_path'] = image_path
-        image_info['tags'] = new_tags
-        image_info['annotator'] = annotator
-        annotations[image_name] = image_info
-        
-        # Write the modified data back to the file
-        with open(json_filepath, 'w', encoding='utf-8') as f:
-            json.dump(annotations, f, indent=4, ensure_ascii=False)
-            
-        return annotations
+    try:
+        return get_annotation_store(json_filepath).update(
+            image_name, {'image_path': image_path, 'tags': new_tags, 'annotator': annotator})
+    except sqlite3.OperationalError as e:
+        # 数据库被其他用户长时间锁定
+        raise TimeoutError(str(e))
+
+def export_annotations(json_filepath: str) -> int:
+    """Exports the SQLite store back to the JSON file immediately."""
+    return get_annotation_store(json_filepath).flush()
 
 def filter_images_by_tag(image_files: List[str], annotations: Dict[str, Any], filter_tag: str) -> List[str]:
     """
@@ -282,6 +337,12 @@ with st.sidebar:
         
         st.write("---")
         st.info(f"标签文件路径: {st.session_state.json_path}")
+        if st.button("💾 导出标签JSON", use_container_width=True):
+            try:
+                count = export_annotations(st.session_state.json_path)
+                st.success(f"已导出 {count} 条标注到 {st.session_state.json_path}")
+            except TimeoutError:
+                st.error("无法导出，文件正被其他用户使用。请稍后重试。")
 
 
 # --- Main Display Area ---
@@ -347,14 +408,13 @@ else:
 
                     # Safely update the annotation file
                     try:
-                        updated_annotations = safe_update_annotation(
+                        st.session_state.annotations[image_name] = safe_update_annotation(
                             st.session_state.json_path,
                             image_name,
                             current_image_path,
                             new_tags,
                             st.session_state.username
                         )
-                        st.session_state.annotations = updated_annotations
                         
                         # 重新筛选图片列表（因为标签改变可能影响筛选结果）
                         old_filtered_count = len(st.session_state.filtered_image_files)
@@ -377,14 +437,13 @@ else:
             st.write("---")
             if st.button("🗑️ 删除当前标签", use_container_width=True, type="secondary"):
                 try:
-                    updated_annotations = safe_update_annotation(
+                    st.session_state.annotations[image_name] = safe_update_annotation(
                         st.session_state.json_path,
                         image_name,
                         current_image_path,
                         ['unlabeled'], # Reset tags
                         st.session_state.username
                     )
-                    st.session_state.annotations = updated_annotations
                     
                     # 重新筛选图片列表
                     st.session_state.filtered_image_files = filter_images_by_tag(
@@ -1,4 +1,5 @@
 import os
+import sys
 import asyncio
 import json
 import traceback
@@ -7,12 +8,14 @@ from src.step1_generate import ComponentAnalyzer
 from src.step2_evaluate import ConsistencyEvaluator
 from src.step1_rerun import ComponentAnalyzer as ComponentAnalyzerRerun
 from src.utils import parse_args, create_config_from_args
+from src.columnar_store import export_results
 from config.prompts import (COMPONENTS_LIST_PROMPT_MODEL1
                             , COMPONENTS_LIST_PROMPT_MODEL2
                             , COMPONENT_IO_PROMPT_MODEL1
                             , COMPONENT_IO_PROMPT_MODEL2
                             , CONSISTENCY_EVAL_PROMPT
                             , COMPONENT_CONSISTENCY_PROMPT
+                            , COMPONENT_CONSISTENCY_BATCH_PROMPT
                             )
 
 
@@ -24,11 +27,21 @@ def get_prompts(config: Config):
         "component_io_prompt_model1": COMPONENT_IO_PROMPT_MODEL1,
         "component_io_prompt_model2": COMPONENT_IO_PROMPT_MODEL2,
         "consistency_eval_prompt": CONSISTENCY_EVAL_PROMPT,
-        "component_consistency_prompt": COMPONENT_CONSISTENCY_PROMPT
+        "component_consistency_prompt": COMPONENT_CONSISTENCY_PROMPT,
+        "component_consistency_batch_prompt": COMPONENT_CONSISTENCY_BATCH_PROMPT
     }
     config.prompts = prompts
     return config
 
+def export_columnar(config: Config, evaluator: ConsistencyEvaluator) -> None:
+    """按配置把第二步结果导出为列式表"""
+    if not config.columnar_export or not os.path.exists(evaluator.component_consistency_path):
+        return
+    try:
+        export_results(evaluator.component_consistency_path)
+    except Exception as e:
+        print(f"导出列式结果失败: {str(e)}")
+
 async def main():
     """主程序入口"""
     import time 
@@ -61,13 +74,40 @@ async def main():
             analyzer = ComponentAnalyzerRerun(config)
         else:
             analyzer = ComponentAnalyzer(config)
+
+        if config.pipeline and config.sampling_mode:
+            print("错误: 流水线模式不支持抽样评估（--sampling），请去掉其中一个选项")
+            return 2
+
+        if config.pipeline:
+            # 流水线模式：第一步每完成一张图像就推送给第二步，两步各自保持并发限制
+            print("流水线模式：第一步与第二步同时运行")
+            analyzer.result_queue = asyncio.Queue(maxsize=config.pipeline_queue_size)
+            evaluator = ConsistencyEvaluator(config, {"model_analysis": analyzer.model_analysis_path}, step1_results={})
+            evaluator.shutdown = analyzer.shutdown
+            await asyncio.gather(analyzer.run(), evaluator.run(analyzer.result_queue))
+            if analyzer.shutdown.stopping:
+                print("\n流水线被中断，已保存检查点，重新运行将从断点继续")
+                return 130
+            export_columnar(config, evaluator)
+            print("\n两步评估流程执行完成!")
+            print(f"执行时间: {round(time.time() - st, 2)}秒")
+            return 0
+
         result_paths = await analyzer.run()
+        if analyzer.shutdown.stopping:
+            print("\n第一步被中断，已保存检查点，跳过第二步")
+            return 130
         
         # 第二步：一致性评估
         print("\n第二步：一致性评估")
         print("-" * 50)
         evaluator = ConsistencyEvaluator(config, result_paths)
         await evaluator.run()
+        if evaluator.shutdown.stopping:
+            print("\n第二步被中断，已保存检查点，重新运行将从断点继续")
+            return 130
+        export_columnar(config, evaluator)
         
         print("\n两步评估流程执行完成!")
         
@@ -84,4 +124,4 @@ if __name__ == "__main__":
     if os.name == 'nt':
         asyncio.set_event_loop_policy(asyncio.WindowsSelectorEventLoopPolicy())
     
-    asyncio.run(main()) 
\ No newline at end of file
+    sys.exit(asyncio.run(main())) 
\ No newline at end of file
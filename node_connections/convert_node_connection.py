@@ -1,8 +1,28 @@
+import os
+import sys
 import json
 import re
+from collections import defaultdict
 from difflib import SequenceMatcher
+from functools import lru_cache
 import traceback
 
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.json_stream import iter_json_records, JsonRecordWriter
+from src.box import parse_box
+
+try:
+    from scipy.optimize import linear_sum_assignment as _scipy_assignment
+except ImportError:  # 可选依赖，缺失时使用下面的numpy实现
+    _scipy_assignment = None
+
+# 连接与组件的综合得分（IoU权重0.7，名字相似度权重0.3）不超过该值时视为未匹配
+MIN_MATCH_SCORE = 0.1
+CONNECTION_TYPES = ('input', 'output', 'bidirectional')
+
 def calculate_iou(box1, box2):
     """计算两个边界框的IoU"""
     x1 = max(box1[0], box2[0])
@@ -25,43 +45,179 @@ def calculate_similarity(str1, str2):
     return SequenceMatcher(None, str1.lower(), str2.lower()).ratio()
 
 def parse_box_string(box_str):
-    """解析边界框字符串，支持多种格式"""
-    # 移除括号并分割
-    box_str = eval(box_str) 
-    return box_str
-
-def find_best_match(target_box, target_name, components, component_details):
-    """根据IoU和名字相似性找到最佳匹配的组件"""
-    best_match = None
-    best_score = 0.0
-    
-    for comp_key in components.keys():
-        # 解析组件边界框
-        comp_box = parse_box_string(comp_key)
-        
-        # 计算IoU
-        if len(target_box) == 0 or len(comp_box) == 0:
-            continue
-        iou = calculate_iou(target_box, comp_box)
-        
-        # 获取组件名字
-        comp_name = ""
-        if comp_key in component_details:
-            comp_name = component_details[comp_key]["description"]["component_name"]
-        
-        # 计算名字相似度
-        name_sim = calculate_similarity(target_name, comp_name) if target_name and comp_name else 0.0
-        
-        # 综合得分：IoU权重0.7，名字相似度权重0.3
-        score = iou * 0.7 + name_sim * 0.3
-        # print(f"score: {score}, iou: {iou}, name_sim: {name_sim}")
-        if score > best_score and score > 0.1:  # 设置最低阈值
-            best_score = score
-            best_match = comp_key
-    
-    return best_match
+    """解析边界框字符串，支持多种格式（见 src/box.py），不执行字符串中的代码；无法解析（如 "()"）时返回空元组"""
+    return parse_box(box_str, strict=False) or ()
+
+@lru_cache(maxsize=65536)
+def _name_similarity(name1, name2):
+    """已转小写的两个名字的相似度（同一批连接中名字大量重复，缓存结果）"""
+    return SequenceMatcher(None, name1, name2).ratio()
+
+
+class ComponentIndex:
+    """一张图像中组件框的均匀网格索引，连接匹配时只对重叠的组件计算IoU
+
+    组件名字预先转为小写；名字相似度通过缓存计算，并用长度给出的上界（real_quick_ratio）
+    跳过不可能超过当前最高分的组件。匹配结果与逐个组件计算完全相同（同分时取靠前的组件）。
+    """
+
+    def __init__(self, components, component_details=None, cell_size=None):
+        self.keys = list(components.keys())
+        boxes = [parse_box_string(key) for key in self.keys]
+        self.valid = np.array([len(box) == 4 for box in boxes], dtype=bool)
+        self.boxes = np.array([box if len(box) == 4 else (0, 0, 0, 0) for box in boxes], dtype=float).reshape(-1, 4)
+        self.areas = (self.boxes[:, 2] - self.boxes[:, 0]) * (self.boxes[:, 3] - self.boxes[:, 1])
+        self.names = [self._component_name(key, components, component_details).lower() for key in self.keys]
+        self.name_lengths = np.array([len(name) for name in self.names], dtype=float)
+
+        sides = np.maximum(self.boxes[self.valid, 2] - self.boxes[self.valid, 0],
+                           self.boxes[self.valid, 3] - self.boxes[self.valid, 1])
+        self.cell_size = cell_size or max(float(np.median(sides)) if len(sides) else 1.0, 1.0)
+        self.grid = defaultdict(list)
+        for index in np.flatnonzero(self.valid):
+            for cell in self._cells(self.boxes[index]):
+                self.grid[cell].append(index)
+
+    @staticmethod
+    def _component_name(key, components, component_details):
+        name = components[key].get('name') if isinstance(components[key], dict) else None
+        if name is None and component_details and key in component_details:
+            description = component_details[key].get("description")
+            name = description.get("component_name", "") if isinstance(description, dict) else ""
+        return name or ""
+
+    def _cells(self, box):
+        x1, y1, x2, y2 = (int(np.floor(v / self.cell_size)) for v in box)
+        return ((cx, cy) for cx in range(x1, x2 + 1) for cy in range(y1, y2 + 1))
+
+    def iou(self, target_box):
+        """目标框与所有组件的IoU (N,)，只计算网格中相邻的组件"""
+        ious = np.zeros(len(self.keys))
+        candidates = {index for cell in self._cells(target_box) for index in self.grid.get(cell, ())}
+        if not candidates:
+            return ious
+        candidates = np.fromiter(candidates, dtype=int)
+        boxes = self.boxes[candidates]
+        w = np.minimum(boxes[:, 2], target_box[2]) - np.maximum(boxes[:, 0], target_box[0])
+        h = np.minimum(boxes[:, 3], target_box[3]) - np.maximum(boxes[:, 1], target_box[1])
+        overlap = (w > 0) & (h > 0)
+        inter = w[overlap] * h[overlap]
+        target_area = (target_box[2] - target_box[0]) * (target_box[3] - target_box[1])
+        union = target_area + self.areas[candidates[overlap]] - inter
+        ious[candidates[overlap]] = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+        return ious
+
+    def top_matches(self, target_box, target_name, k=1):
+        """得分最高的 k 个组件 [(组件序号, 得分), ...]，按得分从高到低（同分时序号小的在前），只含得分超过 MIN_MATCH_SCORE 的组件"""
+        if len(target_box) == 0 or not self.keys or k <= 0:
+            return []
+        ious = self.iou(target_box)
+        target_name = target_name.lower() if target_name else ""
+        # 得分上界：名字相似度不超过 2*min(len)/(len1+len2)
+        if target_name:
+            name_bounds = np.where(self.name_lengths > 0,
+                                   2 * np.minimum(self.name_lengths, len(target_name)) / (self.name_lengths + len(target_name)), 0.0)
+        else:
+            name_bounds = np.zeros(len(self.keys))
+        bounds = np.where(self.valid, ious * 0.7 + name_bounds * 0.3, -1.0)
+
+        matches = []
+        for index in np.argsort(-bounds, kind="stable"):
+            bound = bounds[index]
+            if bound <= MIN_MATCH_SCORE or (len(matches) == k and bound < matches[-1][1]):
+                break
+            name_sim = _name_similarity(target_name, self.names[index]) if name_bounds[index] > 0 else 0.0
+            # 综合得分：IoU权重0.7，名字相似度权重0.3
+            score = ious[index] * 0.7 + name_sim * 0.3
+            if score > MIN_MATCH_SCORE:
+                matches.append((int(index), float(score)))
+                matches.sort(key=lambda match: (-match[1], match[0]))
+                del matches[k:]
+        return matches
+
+    def best_match(self, target_box, target_name):
+        """根据IoU和名字相似性找到最佳匹配的组件键，没有得分超过0.1的组件时返回None"""
+        matches = self.top_matches(target_box, target_name, 1)
+        return self.keys[matches[0][0]] if matches else None
 
-def process_connection(conn, components, component_details):
+    def score_matrix(self, targets):
+        """一组连接 [(框, 名字), ...] 的得分矩阵，返回 (候选组件序号 (M,), 得分 (K,M))
+
+        每个连接只保留得分最高的 K 个组件（K为连接数）：K 个连接中其余连接最多占用其中 K-1 个，
+        所以总有一个最优指派只用到这些组件，矩阵的其余位置记为0（不可匹配）。
+        """
+        candidates = [self.top_matches(box, name, len(targets)) for box, name in targets]
+        columns = np.array(sorted({index for matches in candidates for index, _ in matches}), dtype=int)
+        scores = np.zeros((len(targets), len(columns)))
+        for row, matches in enumerate(candidates):
+            if matches:
+                indices, values = zip(*matches)
+                scores[row, np.searchsorted(columns, indices)] = values
+        return columns, scores
+
+
+def _hungarian(cost):
+    """最小化总代价的线性指派（最短增广路径 + 势函数），要求行数不超过列数，返回每行分配的列"""
+    n, m = cost.shape
+    # 1起始编号，第0列为虚拟列；p[j] 为分配到第j列的行，way 记录增广路径
+    u = np.zeros(n + 1)
+    v = np.zeros(m + 1)
+    p = np.zeros(m + 1, dtype=int)
+    way = np.zeros(m + 1, dtype=int)
+    for i in range(1, n + 1):
+        p[0] = i
+        j0 = 0
+        minv = np.full(m + 1, np.inf)
+        used = np.zeros(m + 1, dtype=bool)
+        while True:
+            used[j0] = True
+            i0 = p[j0]
+            free = ~used[1:]
+            reduced = cost[i0 - 1] - u[i0] - v[1:]
+            improve = free & (reduced < minv[1:])
+            minv[1:][improve] = reduced[improve]
+            way[1:][improve] = j0
+            masked = np.where(free, minv[1:], np.inf)
+            j1 = int(np.argmin(masked)) + 1
+            delta = masked[j1 - 1]
+            u[p[used]] += delta
+            v[used] -= delta
+            minv[1:][free] -= delta
+            j0 = j1
+            if p[j0] == 0:
+                break
+        while j0:
+            j1 = way[j0]
+            p[j0] = p[j1]
+            j0 = j1
+    assignment = np.zeros(n, dtype=int)
+    assigned = np.flatnonzero(p[1:])
+    assignment[p[assigned + 1] - 1] = assigned
+    return assignment
+
+
+def linear_assignment(scores):
+    """最大化总得分的一对一指派，返回 (行序号, 列序号)，行按升序；安装了scipy时使用 linear_sum_assignment"""
+    scores = np.asarray(scores, dtype=float)
+    if scores.size == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+    if _scipy_assignment is not None:
+        rows, cols = _scipy_assignment(scores, maximize=True)
+        return np.asarray(rows, dtype=int), np.asarray(cols, dtype=int)
+    if scores.shape[0] <= scores.shape[1]:
+        return np.arange(scores.shape[0]), _hungarian(-scores)
+    cols = np.arange(scores.shape[1])
+    rows = _hungarian(-scores.T)
+    order = np.argsort(rows)
+    return rows[order], cols[order]
+
+def find_best_match(target_box, target_name, components, component_details, index=None):
+    """根据IoU和名字相似性找到最佳匹配的组件；同一张图像的多次匹配应复用 ComponentIndex"""
+    if index is None:
+        index = ComponentIndex(components, component_details)
+    return index.best_match(target_box, target_name)
+
+def process_connection(conn, components, component_details, index=None):
     """处理单个连接的映射"""
     if not ('box' in conn and conn['box']):
         return
@@ -69,7 +225,7 @@ def process_connection(conn, components, component_details):
         target_box = parse_box_string(conn['box'])
         target_name = conn.get('name', '')
         
-        best_match = find_best_match(target_box, target_name, components, component_details)
+        best_match = find_best_match(target_box, target_name, components, component_details, index)
         if best_match:
             conn['box'] = best_match
             conn['name'] = components[best_match]['name']
@@ -82,6 +238,69 @@ def process_connection(conn, components, component_details):
     return conn
 
 
+def assign_connections(connections, components, component_details, index=None):
+    """把一个组件的一组连接一对一地映射到组件上，使总得分最高
+
+    与逐个连接取最佳组件（process_connection）不同，同一组中的多个连接不会映射到同一个组件。
+    匹配的连接就地改为组件的键和名字；没有框、框无法解析或指派得分不超过 MIN_MATCH_SCORE 的连接不做修改。
+
+    Returns:
+        (matched, unmatched)：按原顺序排列的已匹配连接和未匹配连接
+    """
+    if index is None:
+        index = ComponentIndex(components, component_details)
+    rows, targets = [], []
+    for row, conn in enumerate(connections):
+        if isinstance(conn, dict) and conn.get('box'):
+            target_box = parse_box_string(conn['box'])
+            if len(target_box) == 4:
+                rows.append(row)
+                targets.append((target_box, conn.get('name', '') or ''))
+
+    assigned = {}
+    if targets:
+        columns, scores = index.score_matrix(targets)
+        for target_row, column in zip(*linear_assignment(scores)):
+            if scores[target_row, column] > MIN_MATCH_SCORE:
+                assigned[rows[target_row]] = index.keys[columns[column]]
+
+    matched, unmatched = [], []
+    for row, conn in enumerate(connections):
+        comp_key = assigned.get(row)
+        if comp_key is None:
+            unmatched.append(conn)
+            continue
+        conn['box'] = comp_key
+        conn['name'] = components[comp_key].get('name', '')
+        matched.append(conn)
+    return matched, unmatched
+
+
+def assign_image_connections(components, component_details, index=None):
+    """对一张图像中所有组件的各类连接分别做一对一指派（共用一个组件索引）
+
+    匹配的连接写回 description['connections']，未匹配的连接写入 description['unmatched_connections']，
+    返回未匹配的连接总数。
+    """
+    if index is None:
+        index = ComponentIndex(components, component_details)
+    unmatched_count = 0
+    for detail_value in component_details.values():
+        description = detail_value.get('description') if isinstance(detail_value, dict) else None
+        if not isinstance(description, dict) or 'connections' not in description:
+            continue
+        connections = description['connections']
+        unmatched_connections = {}
+        for conn_type in CONNECTION_TYPES:
+            if conn_type in connections:
+                matched, unmatched = assign_connections(connections[conn_type], components, component_details, index)
+                connections[conn_type] = matched
+                unmatched_connections[conn_type] = unmatched
+                unmatched_count += len(unmatched)
+        description['unmatched_connections'] = unmatched_connections
+    return unmatched_count
+
+
 def convert_image_data(image_data):
     # 遍历每个图像的数据
     
@@ -102,37 +321,17 @@ def convert_image_data(image_data):
 
 
     
-    # 2. 处理component_details中的输入输出映射
-    for detail_key, detail_value in component_details.items():
-        if 'description' not in detail_value or 'connections' not in detail_value['description']:
-            continue
-        
-        connections = detail_value['description']['connections']
-        
-        # 处理所有类型的连接
-        for conn_type in ['input', 'output', 'bidirectional']:
-            if conn_type in connections:
-                rtn_connections = []
-                for conn in connections[conn_type]:
-                    rtn_conn = process_connection(conn, components, component_details)
-                    if rtn_conn:
-                        rtn_connections.append(rtn_conn)
-                detail_value['description']['connections'][conn_type] = rtn_connections
+    # 2. 处理component_details中的输入输出映射（组件框索引每张图像只建一次）
+    assign_image_connections(components, component_details)
     return image_data
     
 
 def process_json_file(input_file, output_file):
     """处理JSON文件的主函数"""
-    with open(input_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-
-        # 遍历每个图像的数据
-    for image_name, image_data in data.items():
-        data[image_name] = convert_image_data(image_data)
-
-    # 保存处理后的数据
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
+    # 逐条读取、转换、写出，内存中只保留当前图像的数据
+    with JsonRecordWriter(output_file) as writer:
+        for image_name, image_data in iter_json_records(input_file):
+            writer.write(image_name, convert_image_data(image_data))
     
     print(f"处理完成，结果已保存到 {output_file}")
 
@@ -0,0 +1,114 @@
+import os
+import sys
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 检测模型的推理后端：torch（原始.pt）、onnx（ONNX Runtime）、openvino
+# 导出后的模型仍通过 ultralytics.YOLO 加载，结果接口（boxes/cls/conf）与.pt模型相同
+
+BACKENDS = ("torch", "onnx", "openvino")
+
+WEIGHTS_DIR = os.path.dirname(os.path.abspath(__file__))
+# 权重文件与各自的推理尺寸
+DETECTORS = {
+    "port": ("port_det_v2_20250711.pt", 640),
+    "node": ("node_det_v2_20250711.pt", 1024),
+    # 单模型路径：节点为检测框，端口为关键点（见 pose_det.py）
+    "pose": ("node_pose.pt", 1024),
+}
+# 默认导出的模型（姿态模型需显式指定 --models pose）
+DEFAULT_EXPORTS = ("port", "node")
+
+
+def backend_weights(pt_path: str, backend: str = "torch", int8: bool = False) -> str:
+    """后端对应的模型路径：x.pt -> x.onnx / x_int8.onnx / x_openvino_model / x_int8_openvino_model"""
+    if backend not in BACKENDS:
+        raise ValueError(f"未知的推理后端: {backend}，可选 {BACKENDS}")
+    if backend == "torch":
+        return pt_path
+    stem = os.path.splitext(pt_path)[0]
+    if backend == "onnx":
+        return f"{stem}_int8.onnx" if int8 else f"{stem}.onnx"
+    return f"{stem}_int8_openvino_model" if int8 else f"{stem}_openvino_model"
+
+
+def export_weights(pt_path: str, backend: str, imgsz: int, int8: bool = False, data: str = "") -> str:
+    """把.pt模型导出为指定后端的格式，返回导出路径
+
+    onnx 的INT8为ONNX Runtime动态量化（只量化权重，不需要校准数据）；
+    openvino 的INT8由ultralytics做训练后量化，需要 data 指定校准数据集yaml。
+    """
+    from ultralytics import YOLO
+
+    target = backend_weights(pt_path, backend, int8)
+    model = YOLO(pt_path)
+    if backend == "onnx":
+        onnx_path = model.export(format="onnx", imgsz=imgsz, dynamic=True, simplify=True)
+        if int8:
+            from onnxruntime.quantization import QuantType, quantize_dynamic
+            quantize_dynamic(onnx_path, target, weight_type=QuantType.QUInt8)
+        return target
+    if backend == "openvino":
+        kwargs = {"format": "openvino", "imgsz": imgsz, "dynamic": True, "int8": int8}
+        if int8:
+            if not data:
+                raise ValueError("OpenVINO INT8 导出需要通过 data 指定校准数据集")
+            kwargs["data"] = data
+        return model.export(**kwargs)
+    return pt_path
+
+
+def set_intra_op_threads(yolo, backend: str, weights: str, threads: int) -> bool:
+    """按指定线程数重建ONNX Runtime会话或重新编译OpenVINO模型
+
+    ultralytics 的推理后端不暴露线程配置，需在predictor建立后（至少推理一次）替换；
+    torch 后端设置进程内的torch线程数。返回是否设置成功。
+    """
+    if threads <= 0:
+        return False
+    if backend == "torch":
+        import torch
+        torch.set_num_threads(threads)
+        return True
+    backend_model = getattr(getattr(yolo, "predictor", None), "model", None)
+    if backend == "onnx" and hasattr(backend_model, "session"):
+        import onnxruntime as ort
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = threads
+        options.inter_op_num_threads = 1
+        backend_model.session = ort.InferenceSession(weights, sess_options=options,
+                                                     providers=backend_model.session.get_providers())
+        return True
+    if backend == "openvino" and hasattr(backend_model, "ov_compiled_model"):
+        import openvino as ov
+        core = ov.Core()
+        xml = next(f for f in os.listdir(weights) if f.endswith(".xml"))
+        ov_model = core.read_model(os.path.join(weights, xml))
+        if ov_model.get_parameters()[0].get_layout().empty:
+            ov_model.get_parameters()[0].set_layout(ov.Layout("NCHW"))
+        backend_model.ov_compiled_model = core.compile_model(
+            ov_model, device_name="CPU",
+            config={"PERFORMANCE_HINT": "LATENCY", "INFERENCE_NUM_THREADS": threads})
+        return True
+    print(f"警告: 当前ultralytics版本无法设置 {backend} 后端的线程数，使用默认配置")
+    return False
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把节点/端口检测模型导出为ONNX或OpenVINO格式")
+    parser.add_argument("--backend", type=str, choices=["onnx", "openvino"], default="onnx", help="导出格式")
+    parser.add_argument("--int8", action="store_true", help="导出INT8量化模型")
+    parser.add_argument("--data", type=str, default="", help="OpenVINO INT8量化的校准数据集yaml")
+    parser.add_argument("--models", type=str, nargs="+", choices=list(DETECTORS), default=list(DEFAULT_EXPORTS),
+                        help="要导出的检测模型")
+    args = parser.parse_args()
+
+    for name in args.models:
+        weights, imgsz = DETECTORS[name]
+        path = export_weights(os.path.join(WEIGHTS_DIR, weights), args.backend, imgsz, args.int8, args.data)
+        print(f"{name}: 已导出 {path}")
+
+
+if __name__ == "__main__":
+    main()
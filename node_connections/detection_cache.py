@@ -0,0 +1,275 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import argparse
+import threading
+import contextlib
+from typing import Dict, Iterable, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from node_connections.det_backend import BACKENDS, DETECTORS, WEIGHTS_DIR, backend_weights
+from node_connections.tiling import DEFAULT_TILE_OVERLAP, DEFAULT_TILE_PIXELS, DEFAULT_TILE_SIZE, tiling_params
+
+# 节点/端口检测结果的持久化缓存
+# 键为 (图像内容哈希, 模型键)；模型键由两个检测模型的权重哈希和检测参数
+# （推理尺寸、conf、iou、端口分配方式、切片参数）计算得到，权重或参数变化后旧条目自然不再命中
+
+DEFAULT_CACHE_PATH = os.path.join(WEIGHTS_DIR, ".cache", "detections.db")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS detections (
+    image_hash  TEXT NOT NULL,
+    model_key   TEXT NOT NULL,
+    node_io_map TEXT NOT NULL,
+    boxes       TEXT NOT NULL,
+    created_at  REAL NOT NULL,
+    PRIMARY KEY (image_hash, model_key)
+);
+"""
+
+# 按 (路径, 大小, 修改时间) 缓存的权重哈希，权重文件只在变化后重新计算
+_weights_hashes = {}
+_weights_lock = threading.Lock()
+
+
+def image_hash(data: bytes) -> str:
+    """图像文件内容的哈希（与文件名、路径无关，重命名或移动后仍能命中）"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _file_digest(path: str, digest) -> None:
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+
+
+def weights_hash(path: str) -> str:
+    """模型权重的内容哈希；OpenVINO导出目录按文件名排序后逐个计入"""
+    if os.path.isdir(path):
+        files = sorted(os.path.join(root, f) for root, _, names in os.walk(path) for f in names)
+    else:
+        files = [path]
+    signature = tuple((f, os.path.getsize(f), os.path.getmtime(f)) for f in files)
+    with _weights_lock:
+        cached = _weights_hashes.get(path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+    digest = hashlib.sha256()
+    for f in files:
+        digest.update(os.path.relpath(f, path).encode() if f != path else b"")
+        _file_digest(f, digest)
+    value = digest.hexdigest()
+    with _weights_lock:
+        _weights_hashes[path] = (signature, value)
+    return value
+
+
+def detection_model_key(io_weights: str, node_weights: str, io_imgsz: int = 640, imgsz: int = 1024,
+                        conf: float = 0.25, iou: float = 0.45, assign_metric: str = "iou",
+                        tie_break: str = "nearest", tiling: Optional[dict] = None,
+                        detector: Optional[dict] = None) -> str:
+    """检测模型键：权重内容和所有影响 node_io_map 的参数
+
+    tiling 为切片参数（不切片时为 None）；detector 为单模型（姿态）路径的参数，two_stage 时为 None。
+    """
+    parts = {
+        "io_weights": weights_hash(io_weights),
+        "node_weights": weights_hash(node_weights),
+        "io_imgsz": io_imgsz,
+        "imgsz": imgsz,
+        "conf": conf,
+        "iou": iou,
+        "assign_metric": assign_metric,
+        "tie_break": tie_break,
+        "tiling": tiling,
+        "detector": detector,
+    }
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()[:32]
+
+
+def pose_model_key(weights: str, imgsz: int = 1024, conf: float = 0.25, iou: float = 0.45,
+                   kpt_conf: float = 0.5, port_size: int = 16) -> str:
+    """单模型（姿态）路径的模型键"""
+    return detection_model_key(weights, weights, imgsz, imgsz, conf, iou, None, None, None,
+                               detector={"type": "pose", "kpt_conf": kpt_conf, "port_size": port_size})
+
+
+def _dumps(value) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+class DetectionCache:
+    """SQLite检测缓存（WAL模式），每个线程使用独立连接，多个检测进程可同时读写"""
+
+    def __init__(self, db_path: str = DEFAULT_CACHE_PATH, timeout: float = 30.0):
+        self.db_path = db_path
+        self.timeout = timeout
+        self._local = threading.local()
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn.executescript(_SCHEMA)
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def get_many(self, image_hashes: Iterable[str], model_key: str) -> Dict[str, dict]:
+        """返回已缓存的 {image_hash: node_io_map}"""
+        image_hashes = list(dict.fromkeys(image_hashes))
+        found = {}
+        # SQLite 单条语句的参数个数有限，分段查询
+        for start in range(0, len(image_hashes), 500):
+            chunk = image_hashes[start:start + 500]
+            rows = self.conn.execute(
+                f"SELECT image_hash, node_io_map FROM detections WHERE model_key = ? "
+                f"AND image_hash IN ({','.join('?' * len(chunk))})", [model_key, *chunk])
+            found.update((h, json.loads(m)) for h, m in rows)
+        return found
+
+    def get_boxes(self, image_hash: str, model_key: str) -> Optional[dict]:
+        """返回缓存的原始检测框 {"port": [[x1,y1,x2,y2,cls,conf], ...], "node": [...], "port_names": {...}}"""
+        row = self.conn.execute("SELECT boxes FROM detections WHERE image_hash = ? AND model_key = ?",
+                                (image_hash, model_key)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put_many(self, items, model_key: str) -> int:
+        """在一个事务中写入多条 (image_hash, node_io_map, boxes)，返回写入条数"""
+        now = time.time()
+        rows = [(h, model_key, _dumps(node_io_map), _dumps(boxes), now) for h, node_io_map, boxes in items]
+        if rows:
+            with self._transaction() as conn:
+                conn.executemany("INSERT OR REPLACE INTO detections (image_hash, model_key, node_io_map, boxes, created_at) "
+                                 "VALUES (?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def stats(self) -> Dict[str, int]:
+        """每个模型键的缓存条数"""
+        return dict(self.conn.execute("SELECT model_key, COUNT(*) FROM detections GROUP BY model_key"))
+
+    def prune(self, keep_model_key: str) -> int:
+        """删除其他模型键（旧权重或旧参数）的条目，返回删除条数"""
+        with self._transaction() as conn:
+            removed = conn.execute("DELETE FROM detections WHERE model_key != ?", (keep_model_key,)).rowcount
+        self.conn.execute("VACUUM")
+        return removed
+
+
+def resolve_cache(cache) -> Optional[DetectionCache]:
+    """NodeIO 的 cache 参数：True 为默认路径，字符串为缓存文件路径，False/None 不使用缓存"""
+    if isinstance(cache, DetectionCache) or cache is None:
+        return cache
+    if cache is True:
+        return DetectionCache()
+    if isinstance(cache, str) and cache:
+        return DetectionCache(cache)
+    return None
+
+
+def current_model_key(backend: str = "torch", int8: bool = False, imgsz: int = 1024, conf: float = 0.25,
+                      iou: float = 0.45, assign_metric: str = "iou", tie_break: str = "nearest",
+                      tile_pixels: int = DEFAULT_TILE_PIXELS, tile_size: int = DEFAULT_TILE_SIZE,
+                      tile_overlap: float = DEFAULT_TILE_OVERLAP, tile_merge: str = "nmm",
+                      detector: str = "two_stage", pose_weights: str = "") -> str:
+    """不加载模型，按权重文件和参数计算当前配置的模型键"""
+    if detector == "pose":
+        from node_connections.pose_det import KPT_CONF, PORT_SIZE
+        weights = backend_weights(pose_weights or os.path.join(WEIGHTS_DIR, DETECTORS["pose"][0]), backend, int8)
+        return pose_model_key(weights, imgsz, conf, iou, KPT_CONF, PORT_SIZE)
+    io_weights = backend_weights(os.path.join(WEIGHTS_DIR, DETECTORS["port"][0]), backend, int8)
+    node_weights = backend_weights(os.path.join(WEIGHTS_DIR, DETECTORS["node"][0]), backend, int8)
+    tiling = None
+    if tile_pixels > 0:
+        tiling = tiling_params(tile_pixels, tile_size, tile_overlap, tile_merge)
+    return detection_model_key(io_weights, node_weights, DETECTORS["port"][1], imgsz, conf, iou,
+                               assign_metric, tie_break, tiling)
+
+
+def warmup(args) -> None:
+    """批量检测图像目录，预先填充缓存"""
+    import tqdm
+    from src.image_index import get_image_index
+    from node_connections.get_node_io import create_node_io
+
+    rel_paths = list(get_image_index(args.image_root, args.image_manifest).rel_paths)
+    node_io = create_node_io(args.detector, profile="production", backend=args.backend, threads=args.threads,
+                             int8=args.int8, imgsz=args.imgsz, cache=args.cache_path, tile_pixels=args.tile_pixels,
+                             tile_size=args.tile_size, pose_weights=args.pose_weights)
+    print(f"图像: {len(rel_paths)} 张，缓存: {args.cache_path}")
+    failed = 0
+    # 每次处理若干批，缓存在每段结束时写入，中断后重新运行会跳过已缓存的图像
+    step = args.batch_size * 8
+    with tqdm.tqdm(total=len(rel_paths)) as pbar:
+        for start in range(0, len(rel_paths), step):
+            chunk = [os.path.join(args.image_root, p) for p in rel_paths[start:start + step]]
+            maps = node_io.detect_maps(chunk, imgsz=args.imgsz, batch_size=args.batch_size)
+            failed += sum(m is None for m in maps)
+            pbar.update(len(chunk))
+    print(f"命中 {node_io.cache_hits}，新检测 {node_io.cache_misses}，失败 {failed}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="节点/端口检测结果缓存")
+    parser.add_argument("--cache_path", type=str, default=DEFAULT_CACHE_PATH, help="缓存文件路径")
+    parser.add_argument("--detector", type=str, choices=["two_stage", "pose"], default="two_stage",
+                        help="检测路径：two_stage 两个检测器，pose 单个姿态模型")
+    parser.add_argument("--pose_weights", type=str, default="", help="姿态模型权重，默认 node_connections/node_pose.pt")
+    parser.add_argument("--backend", type=str, choices=BACKENDS, default="torch", help="推理后端")
+    parser.add_argument("--int8", action="store_true", help="使用INT8量化模型")
+    parser.add_argument("--imgsz", type=int, default=1024, help="节点检测推理尺寸")
+    parser.add_argument("--tile_pixels", type=int, default=DEFAULT_TILE_PIXELS, help="切片检测的像素阈值，0为不切片")
+    parser.add_argument("--tile_size", type=int, default=DEFAULT_TILE_SIZE, help="切片图块边长")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    warm = sub.add_parser("warmup", help="批量检测并填充缓存")
+    warm.add_argument("--image_root", type=str, required=True, help="图像根目录")
+    warm.add_argument("--image_manifest", type=str, default="", help="图像清单文件路径")
+    warm.add_argument("--batch_size", type=int, default=8, help="每批检测的图像数")
+    warm.add_argument("--threads", type=int, default=0, help="推理线程数，0为后端默认")
+
+    sub.add_parser("stats", help="各模型键的缓存条数")
+    sub.add_parser("prune", help="删除旧权重/旧参数的缓存条目")
+    args = parser.parse_args()
+
+    if args.command == "warmup":
+        warmup(args)
+        return
+    cache = DetectionCache(args.cache_path)
+    key = current_model_key(args.backend, args.int8, args.imgsz, tile_pixels=args.tile_pixels, tile_size=args.tile_size,
+                            detector=args.detector, pose_weights=args.pose_weights)
+    if args.command == "stats":
+        for model_key, count in cache.stats().items():
+            print(f"{model_key}: {count}{'（当前）' if model_key == key else ''}")
+    else:
+        print(f"已删除 {cache.prune(key)} 条")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,9 @@ from src.config import Config
 from src.image_processor import ImageProcessor
 from src.model_client import ModelClient
 from src.utils import get_image_files
+from src.json_extract import extract_json
+from config.schemas import COMPONENTS_LIST_SCHEMA
+from src.result_db import open_result_db
 import traceback
 
 class ComponentAnalyzer:
@@ -22,7 +25,8 @@ class ComponentAnalyzer:
         self.model_client = ModelClient(
             api_base=config.model1_api,
             api_key=config.model1_key,
-            model=config.model1_model
+            model=config.model1_model,
+            structured_output=config.structured_output
         )
         
         # 结果存储
@@ -32,7 +36,10 @@ class ComponentAnalyzer:
         os.makedirs(self.config.output_dir, exist_ok=True)
         self.model_analysis_path = os.path.join(self.config.output_dir, "model_analysis.json")
 
-        if os.path.exists(self.model_analysis_path):
+        # 结果库模式：每张图像完成后单独写入SQLite，不再反复重写整个JSON文件
+        self.result_db = open_result_db(self.model_analysis_path) if self.config.result_db else None
+
+        if self.result_db is not None or os.path.exists(self.model_analysis_path):
             self.load_results()
 
     
@@ -58,7 +65,9 @@ class ComponentAnalyzer:
                 "请列出电路图中的所有组件",
                 image_base64,
                 temperature=self.config.temperature,
-                max_tokens=self.config.max_tokens
+                max_tokens=self.config.max_tokens,
+                json_schema=COMPONENTS_LIST_SCHEMA,
+                schema_name="components_list"
             )
             
             if "error" in result:
@@ -76,39 +85,15 @@ class ComponentAnalyzer:
                 content_preview = result["content"][:100] + "..." if len(result["content"]) > 100 else result["content"]
                 # print(f"模型响应预览 ({model_name}): {content_preview}")
                 
-                # 尝试直接解析整个响应
-                try:
-                    components = json.loads(result["content"])
-                    if isinstance(components, list):
-                        return components
-                    elif isinstance(components, dict) and "components" in components:
-                        # 有时模型可能会返回 {"components": [...]} 格式
-                        return components["components"] if isinstance(components["components"], list) else []
-                except json.JSONDecodeError:
-                    pass
-                
-                # 如果上面失败，尝试从文本中提取JSON数组
-                match = re.search(r'\[.*\]', result["content"], re.DOTALL)
-                if match:
-                    try:
-                        json_str = match.group(0)
-                        components = json.loads(json_str)
-                        if isinstance(components, list):
-                            return components
-                    except json.JSONDecodeError:
-                        pass
+                # 提取响应中的JSON数组
+                components, _ = extract_json(result["content"], expect=list)
+                if components is not None:
+                    return components
                 
-                # 如果依然无法解析，尝试使用更复杂的正则表达式
-                # 寻找类似 ["元件1", "元件2", ...] 的模式
-                match = re.search(r'\[\s*"[^"]*"(?:\s*,\s*"[^"]*")*\s*\]', result["content"], re.DOTALL)
-                if match:
-                    try:
-                        json_str = match.group(0)
-                        components = json.loads(json_str)
-                        if isinstance(components, list):
-                            return components
-                    except json.JSONDecodeError:
-                        pass
+                # 有时模型可能会返回 {"components": [...]} 格式
+                wrapped, _ = extract_json(result["content"], expect=dict, required_keys=("components",))
+                if wrapped is not None:
+                    return wrapped["components"] if isinstance(wrapped["components"], list) else []
                 
                 # 如果都失败了，尝试创建一个简单的解析器来提取引号括起来的内容作为组件
                 # 适用于类似 ["组件1", "组件2"] 的内容
@@ -203,6 +188,7 @@ class ComponentAnalyzer:
             
             # 保存分析结果
             self.all_results[image_id] = analysis_result
+            self._persist_result(image_id)
             
             print(f"  完成图像 {image_id} 处理")
         except Exception as e:
@@ -216,7 +202,7 @@ class ComponentAnalyzer:
     async def run(self) -> Dict:
         """运行组件分析流程"""
         # 获取所有图像文件
-        image_files = get_image_files(self.config.image_root_dir)
+        image_files = get_image_files(self.config.image_root_dir, self.config.image_manifest)
         
         if not image_files:
             raise Exception(f"在目录 {self.config.image_root_dir} 中未找到图像文件")
@@ -243,8 +229,8 @@ class ComponentAnalyzer:
                     completed += 1
                     pbar.update(1)
                     
-                    # 每处理10张图片就保存一次
-                    if completed % 10 == 0:
+                    # 每处理10张图片就保存一次（结果库模式下已逐张写入）
+                    if completed % 10 == 0 and self.result_db is None:
                         self._save_results()
         
         # 保存结果
@@ -252,13 +238,22 @@ class ComponentAnalyzer:
         
         return result_paths
     
+    def _persist_result(self, image_id: str) -> None:
+        """结果库模式：单张图像完成后立即写入该图像的记录"""
+        if self.result_db is not None and image_id in self.all_results:
+            self.result_db.upsert(image_id, self.all_results[image_id])
+
     def _save_results(self) -> Dict[str, str]:
         """保存分析结果，仅保存最终分析结果，不保存components列表"""
         # 保存模型分析结果
 
 
-        with open(self.model_analysis_path, 'w', encoding='utf-8') as f:
-            json.dump(self.all_results, f, ensure_ascii=False, indent=2)
+        if self.result_db is not None:
+            # 结果库中已是最新结果，导出JSON供第二步和下游工具使用
+            self.result_db.export_json(self.model_analysis_path)
+        else:
+            with open(self.model_analysis_path, 'w', encoding='utf-8') as f:
+                json.dump(self.all_results, f, ensure_ascii=False, indent=2)
         
         print(f"\n分析结果保存完成:")
         print(f"- 模型分析结果: {self.model_analysis_path}")
@@ -269,6 +264,9 @@ class ComponentAnalyzer:
     def load_results(self) -> None:
         """加载评估结果"""
         print(f"加载模型分析结果: {self.model_analysis_path}")
+        if self.result_db is not None:
+            self.all_results = self.result_db.load_all()
+            return
         try:
             with open(self.model_analysis_path, 'r', encoding='utf-8') as f:
                 self.all_results = json.load(f)
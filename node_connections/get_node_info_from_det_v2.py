@@ -13,8 +13,12 @@ from src.config import Config
 from src.image_processor import ImageProcessor
 from src.model_client import ModelClient
 from src.utils import get_image_files
+from src.json_extract import extract_json
+from config.schemas import COMPONENT_IO_BOX_SCHEMA
+from src.result_db import open_result_db
+from src.box import Box
 import traceback
-from node_connections.get_node_io import NodeIO
+from node_connections.get_node_io import DetectionStage
 
 import base64
 from PIL import Image, ImageDraw, ImageFont
@@ -31,7 +35,8 @@ class ComponentAnalyzer:
         self.model_client = ModelClient(
             api_base=config.model2_api,
             api_key=config.model2_key,
-            model=config.model2_model
+            model=config.model2_model,
+            structured_output=config.structured_output
         )
         
         # 结果存储
@@ -41,10 +46,20 @@ class ComponentAnalyzer:
         os.makedirs(self.config.output_dir, exist_ok=True)
         self.model_analysis_path = os.path.join(self.config.output_dir, "model_analysis.json")
 
-        if os.path.exists(self.model_analysis_path):
+        # 结果库模式：每张图像完成后单独写入SQLite，不再反复重写整个JSON文件
+        self.result_db = open_result_db(self.model_analysis_path) if self.config.result_db else None
+
+        if self.result_db is not None or os.path.exists(self.model_analysis_path):
             self.load_results()
 
-        self.NodeIO = NodeIO()
+        # 节点/端口检测在独立的进程池中运行，按处理顺序提前批量检测，不阻塞事件循环
+        self.detections = DetectionStage(self.config.image_root_dir, self.config.detect_batch_size,
+                                         self.config.detect_workers, detector=self.config.detect_model,
+                                         pose_weights=self.config.detect_pose_weights, profile=self.config.detect_profile,
+                                         backend=self.config.detect_backend, threads=self.config.detect_threads,
+                                         int8=self.config.detect_int8,
+                                         cache=self.config.detect_cache_path or self.config.detect_cache,
+                                         tile_pixels=self.config.detect_tile_pixels, tile_size=self.config.detect_tile_size)
 
         self.sample_rate = self.config.node_sample_rate
 
@@ -52,10 +67,7 @@ class ComponentAnalyzer:
     async def _get_component_list(self, session, image_path: str) -> List:
         """获取电路图中的组件列表"""
         try:
-            # 获取完整图像路径
-            full_image_path = os.path.join(self.config.image_root_dir, image_path)
-            results_io,results_node,node_io_map = self.NodeIO(full_image_path)
-            return node_io_map
+            return await self.detections.get(image_path)
         except Exception as e:
             print(f"获取组件列表时出错: {str(e)}")
             return {}
@@ -127,7 +139,7 @@ class ComponentAnalyzer:
             # 并行获取所有组件的名字
             async def get_single_component_name(component_key):
                 try:
-                    node_box = eval(component_key)
+                    node_box = Box.parse(component_key)
                     component_name = await self._get_component_name(session, image_path, node_box)
                     return component_key, component_name
                 except Exception as e:
@@ -215,7 +227,7 @@ class ComponentAnalyzer:
     async def _get_component_io(self, session, image_path: str, node_info: str, model_client: ModelClient, prompt: str, component_names: Dict = None) -> Dict:
         """获取特定组件的输入输出信息"""
         try:
-            node_box = eval(node_info)
+            node_box = Box.parse(node_info)
             # 获取完整图像路径
             full_image_path = os.path.join(self.config.image_root_dir, image_path)
             image_base64 = self._draw_box_to_image(full_image_path,node_box)
@@ -234,7 +246,9 @@ class ComponentAnalyzer:
                 "",
                 image_base64,
                 temperature=self.config.temperature,
-                max_tokens=self.config.max_tokens
+                max_tokens=self.config.max_tokens,
+                json_schema=COMPONENT_IO_BOX_SCHEMA,
+                schema_name="component_io"
             )
             
             if "error" in result:
@@ -247,6 +261,8 @@ class ComponentAnalyzer:
 
             try:
                 description = self._parse_json_from_description(result["content"])
+                if description is None:
+                    return {"description": result["content"], "warning": "非JSON格式"}
                 return {"description": description, "warning": "JSON格式正确"}
             except Exception as e:
                 return {"description": result["content"], "warning": "非JSON格式"}
@@ -314,6 +330,7 @@ class ComponentAnalyzer:
 
             # 保存分析结果
             self.all_results[image_id] = analysis_result
+            self._persist_result(image_id)
             
             print(f"  完成图像 {image_id} 处理")
         except Exception as e:
@@ -322,42 +339,23 @@ class ComponentAnalyzer:
     
     def _parse_json_from_description(self, description: str) -> Dict:
         """从描述字符串中解析JSON"""
-        try:
-            # 如果description包含```json代码块，提取其中的JSON
-            if "```json" in description:
-                # 提取```json和```之间的内容
-                json_start = description.find("```json") + 7
-                json_end = description.find("```", json_start)
-                if json_end != -1:
-                    json_str = description[json_start:json_end].strip()
-                else:
-                    json_str = description[json_start:].strip()
-            else:
-                # 直接尝试解析整个字符串
-                json_str = description.strip()
-            
-            # 尝试解析JSON
-            parsed_json = json.loads(json_str)
-            return parsed_json
-            
-        except (json.JSONDecodeError, ValueError, IndexError) as e:
-            print(f"JSON解析错误: {str(e)}")
-            return None
-        except Exception as e:
-            print(f"未知解析错误: {str(e)}")
-            return None
+        parsed_json, info = extract_json(description, expect=dict)
+        if info is None:
+            print(f"JSON解析错误: 未找到有效的JSON: {str(description)[:100]}")
+        return parsed_json
     
 
         
     async def run(self) -> Dict:
         """运行组件分析流程"""
         # 获取所有图像文件
-        image_files = get_image_files(self.config.image_root_dir)
+        image_files = get_image_files(self.config.image_root_dir, self.config.image_manifest)
         
         if not image_files:
             raise Exception(f"在目录 {self.config.image_root_dir} 中未找到图像文件")
         
         print(f"发现 {len(image_files)} 个图像文件")
+        self.detections.start([p for p in image_files if not self.all_results.get(p.replace('\\', '/'))])
         
         # 创建信号量限制并发
         semaphore = asyncio.Semaphore(self.config.num_workers)
@@ -379,19 +377,30 @@ class ComponentAnalyzer:
                     completed += 1
                     pbar.update(1)
                     
-                    # 每处理10张图片就保存一次
-                    if completed % 10 == 0:
+                    # 每处理10张图片就保存一次（结果库模式下已逐张写入）
+                    if completed % 10 == 0 and self.result_db is None:
                         self._save_results()
         
+        await self.detections.close()
+
         # 保存结果
         result_paths = self._save_results()
         
         return result_paths
     
+    def _persist_result(self, image_id: str) -> None:
+        """结果库模式：单张图像完成后立即写入该图像的记录"""
+        if self.result_db is not None and image_id in self.all_results:
+            self.result_db.upsert(image_id, self.all_results[image_id])
+
     def _save_results(self) -> Dict[str, str]:
         """保存分析结果，仅保存最终分析结果，不保存components列表"""
-        with open(self.model_analysis_path, 'w', encoding='utf-8') as f:
-            json.dump(self.all_results, f, ensure_ascii=False, indent=2)
+        if self.result_db is not None:
+            # 结果库中已是最新结果，导出JSON供第二步和下游工具使用
+            self.result_db.export_json(self.model_analysis_path)
+        else:
+            with open(self.model_analysis_path, 'w', encoding='utf-8') as f:
+                json.dump(self.all_results, f, ensure_ascii=False, indent=2)
         
         print(f"\n分析结果保存完成:")
         print(f"- 模型分析结果: {self.model_analysis_path}")
@@ -402,6 +411,9 @@ class ComponentAnalyzer:
     def load_results(self) -> None:
         """加载评估结果"""
         print(f"加载模型分析结果: {self.model_analysis_path}")
+        if self.result_db is not None:
+            self.all_results = self.result_db.load_all()
+            return
         try:
             with open(self.model_analysis_path, 'r', encoding='utf-8') as f:
                 self.all_results = json.load(f)
@@ -2,15 +2,173 @@
 from PIL import Image, ImageDraw
 import os 
 import sys 
+import asyncio
+import multiprocessing
+import numpy as np
+import torch
+from io import BytesIO
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.box import Box
+from ultralytics.engine.results import Results
 from node_connections.io_det import YoloDet as io_det
 from node_connections.node_det import YoloDet as node_det
+from node_connections.pose_det import KPT_CONF, PORT_NAMES, PORT_SIZE, YoloPose, decode_pose
+from node_connections.detection_cache import detection_model_key, image_hash, pose_model_key, resolve_cache
+from node_connections.tiling import (DEFAULT_TILE_OVERLAP, DEFAULT_TILE_PIXELS, DEFAULT_TILE_SIZE, merge_detections,
+                                     merge_node_detections, merge_tile_results, needs_tiling, result_arrays,
+                                     tile_windows, tiling_params)
+
+TIE_BREAKS = ("nearest", "smallest", "first")
+# two_stage: 节点检测 + 端口检测 + 端口分配；pose: 姿态模型一次输出节点框和端口关键点
+DETECTOR_TYPES = ("two_stage", "pose")
+
+
+def boxes_to_numpy(results):
+    """一次性取出检测结果中的框 (N,4) int 和类别 (N,) int"""
+    boxes, _, classes = result_arrays(results)
+    return boxes.astype(int), classes
+
+
+def raw_boxes(results):
+    """检测结果转为可序列化的 [[x1, y1, x2, y2, cls, conf], ...]"""
+    boxes, scores, classes = result_arrays(results)
+    return [[*map(int, box), int(cls_id), round(float(conf), 4)] for box, cls_id, conf in
+            zip(boxes.tolist(), classes.tolist(), scores.tolist())]
+
+
+def numpy_results(image, names, data):
+    """(N,6) 的 [x1, y1, x2, y2, conf, cls] 数组包装为与检测器输出接口相同的 Results
+
+    框数据转为torch张量，与检测器的输出一样支持 boxes.xyxy.cpu() 等访问方式
+    """
+    data = torch.from_numpy(np.asarray(data, dtype=np.float32).reshape(-1, 6))
+    return Results(np.asarray(image), path="", names=names, boxes=data)
+
+
+def overlap_matrix(node_boxes, io_boxes, metric="iou"):
+    """节点与端口的重叠度矩阵 (N,M)
+
+    metric: iou 交并比；containment 交集占端口面积的比例
+    """
+    node_boxes = np.asarray(node_boxes, dtype=float).reshape(-1, 4)
+    io_boxes = np.asarray(io_boxes, dtype=float).reshape(-1, 4)
+    n, i = node_boxes[:, None, :], io_boxes[None, :, :]
+    inter_w = np.clip(np.minimum(n[..., 2], i[..., 2]) - np.maximum(n[..., 0], i[..., 0]), 0, None)
+    inter_h = np.clip(np.minimum(n[..., 3], i[..., 3]) - np.maximum(n[..., 1], i[..., 1]), 0, None)
+    inter = inter_w * inter_h
+    io_area = (io_boxes[:, 2] - io_boxes[:, 0]) * (io_boxes[:, 3] - io_boxes[:, 1])
+    if metric == "containment":
+        denom = np.broadcast_to(io_area[None, :], inter.shape)
+    elif metric == "iou":
+        node_area = (node_boxes[:, 2] - node_boxes[:, 0]) * (node_boxes[:, 3] - node_boxes[:, 1])
+        denom = node_area[:, None] + io_area[None, :] - inter
+    else:
+        raise ValueError(f"未知的重叠度量: {metric}")
+    return np.divide(inter, denom, out=np.zeros_like(inter), where=denom > 0)
+
+
+def assign_ports(node_boxes, io_boxes, metric="iou", tie_break="nearest"):
+    """每个端口分配给重叠度最高的节点，返回 (M,) 节点下标，不与任何节点重叠的端口为 -1
+
+    tie_break: 重叠度相同时的选择方式
+        nearest  端口中心离节点中心最近
+        smallest 面积最小的节点（嵌套节点时取内层）
+        first    检测顺序靠前的节点
+    """
+    if tie_break not in TIE_BREAKS:
+        raise ValueError(f"未知的tie_break: {tie_break}，可选 {TIE_BREAKS}")
+    node_boxes = np.asarray(node_boxes, dtype=float).reshape(-1, 4)
+    io_boxes = np.asarray(io_boxes, dtype=float).reshape(-1, 4)
+    if len(node_boxes) == 0 or len(io_boxes) == 0:
+        return np.full(len(io_boxes), -1, dtype=int)
+    scores = overlap_matrix(node_boxes, io_boxes, metric)
+    best = scores.max(axis=0)
+    tied = np.isclose(scores, best[None, :]) & (best[None, :] > 0)
+    if tie_break == "nearest":
+        node_center = (node_boxes[:, :2] + node_boxes[:, 2:]) / 2
+        io_center = (io_boxes[:, :2] + io_boxes[:, 2:]) / 2
+        key = ((node_center[:, None, :] - io_center[None, :, :]) ** 2).sum(axis=-1)
+    elif tie_break == "smallest":
+        node_area = (node_boxes[:, 2] - node_boxes[:, 0]) * (node_boxes[:, 3] - node_boxes[:, 1])
+        key = np.broadcast_to(node_area[:, None], scores.shape)
+    else:
+        key = np.broadcast_to(np.arange(len(node_boxes), dtype=float)[:, None], scores.shape)
+    # argmin在相同key时取第一个，即检测顺序
+    assigned = np.where(tied, key, np.inf).argmin(axis=0)
+    return np.where(best > 0, assigned, -1)
+
+
+def build_node_io_map(node_boxes, io_boxes, io_cls, io_names, metric="iou", tie_break="nearest"):
+    """按端口分配结果组装 {Box.key: {"input": [...], "output": [...]}}，端口保持检测顺序"""
+    node_io_dict = {}
+    node_keys = []
+    for node_box in np.asarray(node_boxes).reshape(-1, 4).tolist():
+        key = Box(*node_box).key
+        node_keys.append(key)
+        node_io_dict.setdefault(key, {"input":[],"output":[]})
+    assigned = assign_ports(node_boxes, io_boxes, metric, tie_break)
+    for io_box, cls_id, node_index in zip(np.asarray(io_boxes).tolist(), np.asarray(io_cls).tolist(), assigned.tolist()):
+        if node_index >= 0:
+            node_io_dict[node_keys[node_index]][io_names[cls_id]].append(io_box)
+    return node_io_dict
 
 
 class NodeIO():
-    def __init__(self):
-        self.io_det = io_det()
-        self.node_det = node_det()
+    def __init__(self, assign_metric="iou", tie_break="nearest", concurrent=True, profile="default",
+                 imgsz=1024, backend="torch", threads=0, int8=False, cache=None,
+                 tile_pixels=DEFAULT_TILE_PIXELS, tile_size=DEFAULT_TILE_SIZE, tile_overlap=DEFAULT_TILE_OVERLAP,
+                 tile_merge="nmm"):
+        # profile: default 保持原有行为；production 不写产物、不输出日志、融合模型层并预热
+        # backend: torch / onnx / openvino（见 det_backend.py），threads 为推理线程数（0为默认）
+        self.profile = profile
+        self.io_det = io_det(profile, backend, threads, int8)
+        self.node_det = node_det(profile, backend, threads, int8)
+        # 端口分配：重叠度量（iou / containment）和重叠度相同时的选择方式
+        self.assign_metric = assign_metric
+        self.tie_break = tie_break
+        # 两个检测器在两个线程中同时推理（torch推理时释放GIL），耗时趋近于较慢的一个
+        self.concurrent = concurrent
+        self._pool = None
+        # 检测结果缓存（见 detection_cache.py）：True 为默认路径，字符串为缓存文件路径，只用于 detect_maps
+        self.cache = resolve_cache(cache)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._model_keys = {}
+        # 切片检测（见 tiling.py）：像素数超过 tile_pixels 的图像切成重叠图块检测后合并，0表示不切片
+        self.tile_pixels = tile_pixels
+        self.tile_size = tile_size
+        self.tile_overlap = tile_overlap
+        # 端口框跨图块的合并方式；节点框固定以整图检测为基准按IoU去重
+        self.tile_merge = tile_merge
+        if profile == "production":
+            self.io_det.warmup(640)
+            self.node_det.warmup(imgsz)
+
+    def _run_both(self, run_io, run_node):
+        """运行端口检测和节点检测，返回 (results_io, results_node)"""
+        if not self.concurrent:
+            return run_io(), run_node()
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(2, thread_name_prefix="node_io")
+        future_io = self._pool.submit(run_io)
+        results_node = run_node()
+        return future_io.result(), results_node
+
+    @staticmethod
+    def _decode(image_path):
+        """解码为RGB图像，image_path 也可以是已读取的文件内容（bytes）"""
+        with Image.open(BytesIO(image_path) if isinstance(image_path, bytes) else image_path) as image:
+            return image.convert("RGB")
+
+    def model_key(self, imgsz=1024, conf=0.25, iou=0.45):
+        """当前权重和检测参数对应的缓存模型键"""
+        params = (imgsz, conf, iou)
+        if params not in self._model_keys:
+            self._model_keys[params] = detection_model_key(self.io_det.weights, self.node_det.weights, 640, imgsz,
+                                                           conf, iou, self.assign_metric, self.tie_break,
+                                                           self._tiling())
+        return self._model_keys[params]
 
     def _draw_box_to_image(self,image_path,results_io,results_node,save_path=None):
         image = Image.open(image_path)
@@ -35,34 +193,155 @@ class NodeIO():
         return image_path
     
     def get_all_node_io(self,results_io,results_node):
-        node_io_dict = {}
-        def iou(box1,box2):
-            x1, y1, x2, y2 = box1
-            x3, y3, x4, y4 = box2
-            x_inter = max(0, min(x2, x4) - max(x1, x3))
-            y_inter = max(0, min(y2, y4) - max(y1, y3))
-            inter = x_inter * y_inter
-            union = (x2 - x1) * (y2 - y1) + (x4 - x3) * (y4 - y3) - inter
-            return inter / union
-        for box in results_node.boxes:
-            x1, y1, x2, y2 = box.xyxy.cpu().numpy().astype(int).tolist()[0]
-            node_box = [x1, y1, x2, y2]
-            if str(node_box) not in node_io_dict:
-                node_io_dict[str(node_box)] = {"input":[],"output":[]}
-            io_name=results_io.names
-            for box in results_io.boxes:
-                x1, y1, x2, y2 = box.xyxy.cpu().numpy().astype(int).tolist()[0]
-                io_box = [x1, y1, x2, y2]
-                cls_id = box.cls.cpu().numpy().astype(int).tolist()[0]
-                conf = box.conf.cpu().numpy().astype(float).tolist()[0]
-                if iou(node_box,io_box) > 0:
-                    node_io_dict[str(node_box)][io_name[cls_id]].append(io_box)
-        return node_io_dict
+        """把每个端口分配给重叠度最高的节点，返回 {Box.key: {"input": [...], "output": [...]}}"""
+        node_boxes, _ = boxes_to_numpy(results_node)
+        io_boxes, io_cls = boxes_to_numpy(results_io)
+        return build_node_io_map(node_boxes, io_boxes, io_cls, results_io.names,
+                                 metric=self.assign_metric, tie_break=self.tie_break)
+
+    def _tiling(self):
+        """影响检测结果的切片参数，不切片时为 None"""
+        if self.tile_pixels <= 0:
+            return None
+        return tiling_params(self.tile_pixels, self.tile_size, self.tile_overlap, self.tile_merge)
+
+    def _tile_windows(self, image):
+        if not needs_tiling(image.width, image.height, self.tile_pixels):
+            return []
+        return tile_windows(image.width, image.height, self.tile_size, self.tile_overlap)
+
+    @staticmethod
+    def _tile_results(image, names, boxes, scores, classes):
+        """合并后的检测框包装为与检测器输出接口相同的 Results"""
+        data = np.column_stack([boxes, scores, classes]) if len(boxes) else np.zeros((0, 6))
+        return numpy_results(image, names, data)
+
+    def _merge_port_tiles(self, image, results, windows):
+        """合并各图块的端口检测结果：不同图块中的重复框按 tile_merge 合并"""
+        boxes, scores, classes, sources = merge_tile_results([result_arrays(r) for r in results], windows)
+        boxes, scores, classes = merge_detections(boxes, scores, classes, method=self.tile_merge, sources=sources)
+        return self._tile_results(image, results[0].names, boxes, scores, classes)
+
+    def _merge_node_tiles(self, image, result_full, results, windows):
+        """合并整图和各图块的节点检测结果：以整图检测为基准，按IoU去重（见 merge_node_detections）"""
+        boxes, scores, classes = merge_node_detections(
+            result_arrays(result_full), [result_arrays(r) for r in results], windows, image.width, image.height)
+        return self._tile_results(image, result_full.names, boxes, scores, classes)
+
+    def _detect_images(self, images, imgsz, conf, iou, batch_size):
+        """已解码图像的批量检测，返回 [(results_io, results_node, node_io_map), ...]
+
+        需要切片的大图：端口检测只在图块上运行，节点检测在整图和图块上运行，所有输入一起按 batch_size 批量推理。
+        """
+        io_inputs, node_inputs, plans = [], [], []
+        for image in images:
+            windows = self._tile_windows(image)
+            plans.append((len(io_inputs), len(node_inputs), windows))
+            if windows:
+                crops = [image.crop(window) for window in windows]
+                io_inputs.extend(crops)
+                node_inputs.append(image)
+                node_inputs.extend(crops)
+            else:
+                io_inputs.append(image)
+                node_inputs.append(image)
+
+        results_io, results_node = [], []
+        for start in range(0, max(len(io_inputs), len(node_inputs)), batch_size):
+            io_chunk = io_inputs[start:start + batch_size]
+            node_chunk = node_inputs[start:start + batch_size]
+            chunk_io, chunk_node = self._run_both(
+                lambda: self.io_det.predict_batch(io_chunk, 640, conf, iou, batch_size),
+                lambda: self.node_det.predict_batch(node_chunk, imgsz, conf, iou, batch_size))
+            results_io.extend(chunk_io)
+            results_node.extend(chunk_node)
+
+        outputs = []
+        for image, (io_start, node_start, windows) in zip(images, plans):
+            if windows:
+                result_io = self._merge_port_tiles(image, results_io[io_start:io_start + len(windows)], windows)
+                result_node = self._merge_node_tiles(image, results_node[node_start],
+                                                     results_node[node_start + 1:node_start + len(windows) + 1], windows)
+            else:
+                result_io, result_node = results_io[io_start], results_node[node_start]
+            outputs.append((result_io, result_node, self.get_all_node_io(result_io, result_node)))
+        return outputs
+
+    def batch(self, image_paths, imgsz=1024, conf=0.25, iou=0.45, batch_size=8):
+        """多张图像的批量检测：每张图像只解码一次，两个检测器按 batch_size 批量推理
+
+        Returns:
+            与 image_paths 顺序一致的 (results_io, results_node, node_io_map) 列表，无法读取的图像为 None
+        """
+        outputs = [None] * len(image_paths)
+        for start in range(0, len(image_paths), batch_size):
+            indices, images = [], []
+            for index in range(start, min(start + batch_size, len(image_paths))):
+                try:
+                    images.append(self._decode(image_paths[index]))
+                    indices.append(index)
+                except Exception as e:
+                    print(f"读取图像失败 {image_paths[index]}: {e}")
+            for index, output in zip(indices, self._detect_images(images, imgsz, conf, iou, batch_size)):
+                outputs[index] = output
+        return outputs
+
+    def detect_maps(self, image_paths, imgsz=1024, conf=0.25, iou=0.45, batch_size=8):
+        """批量检测并只返回 node_io_map，无法读取的图像为 None
+
+        启用缓存时先按图像内容哈希查询，只检测未命中的图像，并把结果（node_io_map 和原始框）写回缓存。
+        """
+        if self.cache is None:
+            return [output[2] if output is not None else None
+                    for output in self.batch(image_paths, imgsz, conf, iou, batch_size)]
+        model_key = self.model_key(imgsz, conf, iou)
+        maps = [None] * len(image_paths)
+        contents, hashes = {}, {}
+        for index, image_path in enumerate(image_paths):
+            try:
+                with open(image_path, 'rb') as f:
+                    contents[index] = f.read()
+                hashes[index] = image_hash(contents[index])
+            except Exception as e:
+                print(f"读取图像失败 {image_path}: {e}")
+        cached = self.cache.get_many(hashes.values(), model_key)
+        misses = []
+        for index, key in hashes.items():
+            if key in cached:
+                maps[index] = cached[key]
+            else:
+                misses.append(index)
+        self.cache_hits += len(hashes) - len(misses)
+        self.cache_misses += len(misses)
+
+        for start in range(0, len(misses), batch_size):
+            indices, images = [], []
+            for index in misses[start:start + batch_size]:
+                try:
+                    images.append(self._decode(contents.pop(index)))
+                    indices.append(index)
+                except Exception as e:
+                    print(f"读取图像失败 {image_paths[index]}: {e}")
+            entries = []
+            for index, (result_io, result_node, node_io_map) in zip(
+                    indices, self._detect_images(images, imgsz, conf, iou, batch_size)):
+                maps[index] = node_io_map
+                boxes = {"port": raw_boxes(result_io), "node": raw_boxes(result_node),
+                         "port_names": {str(k): v for k, v in result_io.names.items()}}
+                entries.append((hashes[index], node_io_map, boxes))
+            self.cache.put_many(entries, model_key)
+        return maps
 
     def __call__(self, image_path,imgsz=1024,conf=0.25, iou=0.45,save_json=True,plots=True):
-        print(image_path)
-        results_io = self.io_det(image_path,640,conf, iou,save_json,plots)
-        results_node = self.node_det(image_path,imgsz,conf, iou,save_json,plots)
+        if self.profile != "production":
+            print(image_path)
+        # 只解码一次，两个检测器共用同一张图像
+        image = self._decode(image_path)
+        if self._tile_windows(image):
+            return self._detect_images([image], imgsz, conf, iou, batch_size=8)[0]
+        results_io, results_node = self._run_both(
+            lambda: self.io_det(image,640,conf, iou,save_json,plots),
+            lambda: self.node_det(image,imgsz,conf, iou,save_json,plots))
         ## 识别图中的节点，然后根据输入和输出模型的结果，识别出节的输入和输出
         save_path = os.path.join("/data/home/libo/work/DataFactory/.cache/debug_image", "io_det.jpg")
         # self._draw_box_to_image(image_path,results_io,results_node,save_path)
@@ -70,6 +349,201 @@ class NodeIO():
         return results_io,results_node,node_io_map
     
 
+class PoseNodeIO(NodeIO):
+    """单模型检测路径：姿态模型的检测框为节点、关键点为端口（见 pose_det.py），不需要端口分配
+
+    接口与 NodeIO 相同（__call__ / batch / detect_maps / 缓存），端口结果为由关键点生成的小框。
+    two_stage 专用的参数（assign_metric、tie_break、concurrent、tile_*）被忽略，大图不切片。
+    """
+
+    def __init__(self, profile="default", imgsz=1024, backend="torch", threads=0, int8=False, cache=None,
+                 pose_weights="", kpt_conf=KPT_CONF, port_size=PORT_SIZE, **two_stage_kwargs):
+        self.profile = profile
+        self.pose_det = YoloPose(profile, backend, threads, int8, pose_weights)
+        self.kpt_conf = kpt_conf
+        self.port_size = port_size
+        self.tile_pixels = 0
+        self.cache = resolve_cache(cache)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._model_keys = {}
+        if profile == "production":
+            self.pose_det.warmup(imgsz)
+
+    def model_key(self, imgsz=1024, conf=0.25, iou=0.45):
+        params = (imgsz, conf, iou)
+        if params not in self._model_keys:
+            self._model_keys[params] = pose_model_key(self.pose_det.weights, imgsz, conf, iou,
+                                                      self.kpt_conf, self.port_size)
+        return self._model_keys[params]
+
+    def _to_results(self, image, results):
+        node_io_map, ports = decode_pose(results, self.kpt_conf, self.port_size)
+        results_io = numpy_results(image, PORT_NAMES, ports)
+        return results_io, results, node_io_map
+
+    def _detect_images(self, images, imgsz, conf, iou, batch_size):
+        outputs = []
+        for start in range(0, len(images), batch_size):
+            chunk = images[start:start + batch_size]
+            for image, results in zip(chunk, self.pose_det.predict_batch(chunk, imgsz, conf, iou, batch_size)):
+                outputs.append(self._to_results(image, results))
+        return outputs
+
+    def __call__(self, image_path,imgsz=1024,conf=0.25, iou=0.45,save_json=True,plots=True):
+        if self.profile != "production":
+            print(image_path)
+        image = self._decode(image_path)
+        return self._to_results(image, self.pose_det(image, imgsz, conf, iou, save_json, plots))
+
+
+def create_node_io(detector="two_stage", **kwargs):
+    """按检测路径创建 NodeIO：two_stage 为两个检测器加端口分配，pose 为单个姿态模型"""
+    if detector not in DETECTOR_TYPES:
+        raise ValueError(f"未知的检测路径: {detector}，可选 {DETECTOR_TYPES}")
+    if detector == "pose":
+        return PoseNodeIO(**kwargs)
+    kwargs.pop("pose_weights", None)
+    return NodeIO(**kwargs)
+
+# 检测进程中的NodeIO，每个工作进程只加载一次模型
+_worker_node_io = None
+
+
+def _init_detection_worker(node_io_kwargs):
+    global _worker_node_io
+    _worker_node_io = create_node_io(**node_io_kwargs)
+
+
+def _detect_maps(image_paths, batch_size, node_io=None):
+    """批量检测并只返回 node_io_map（可跨进程传递），无法读取的图像为 None"""
+    node_io = node_io or _worker_node_io
+    return node_io.detect_maps(image_paths, batch_size=batch_size)
+
+
+class DetectionStage:
+    """独立于事件循环的检测流水线阶段
+
+    检测在专用执行器中运行：workers > 0 时为进程池（每个进程加载一次模型），
+    workers = 0 时为当前进程中的单线程（如模型在GPU上）。start() 之后按处理顺序批量提前检测，
+    最多领先消费者 max_ahead 张图像；get() 等待对应图像的结果，未安排的图像按需单独检测。
+    """
+
+    def __init__(self, image_root: str = "", batch_size: int = 8, workers: int = 1, max_ahead: int = 0,
+                 **node_io_kwargs):
+        self.image_root = image_root
+        # 传给 create_node_io 的参数（detector、profile、backend、threads 等），默认使用 production 配置
+        self.node_io_kwargs = dict({"profile": "production"}, **node_io_kwargs)
+        self.batch_size = max(1, batch_size)
+        self.workers = max(0, workers)
+        self.max_ahead = max(max_ahead or self.batch_size * (max(self.workers, 1) + 1), self.batch_size)
+        self._executor = None
+        self._node_io = None
+        self._futures = {}
+        self._slots = None
+        self._producer = None
+        self._batches = set()
+        # 已占用预取名额（已提交检测）的图像
+        self._scheduled = set()
+
+    def _ensure_executor(self) -> None:
+        if self._executor is not None:
+            return
+        if self.workers > 0:
+            self._executor = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context("spawn"),
+                                                 initializer=_init_detection_worker, initargs=(self.node_io_kwargs,))
+        else:
+            self._node_io = create_node_io(**self.node_io_kwargs)
+            self._executor = ThreadPoolExecutor(1, thread_name_prefix="detection")
+
+    async def _detect(self, image_paths) -> list:
+        loop = asyncio.get_running_loop()
+        full_paths = [os.path.join(self.image_root, p) for p in image_paths]
+        return await loop.run_in_executor(self._executor, _detect_maps, full_paths, self.batch_size, self._node_io)
+
+    def start(self, image_paths) -> None:
+        """按处理顺序开始预取（需在事件循环中调用）"""
+        self._ensure_executor()
+        loop = asyncio.get_running_loop()
+        image_paths = [p for p in dict.fromkeys(image_paths) if p not in self._futures]
+        for image_path in image_paths:
+            self._futures[image_path] = loop.create_future()
+        self._slots = asyncio.Semaphore(self.max_ahead)
+        self._producer = asyncio.create_task(self._produce(image_paths))
+
+    async def _produce(self, image_paths) -> None:
+        batch = []
+        for image_path in image_paths:
+            # 等待空位前先提交已凑好的部分批次，避免消费者等待尚未提交的图像
+            if batch and self._slots.locked():
+                self._launch(batch)
+                batch = []
+            await self._slots.acquire()
+            self._scheduled.add(image_path)
+            batch.append(image_path)
+            if len(batch) >= self.batch_size:
+                self._launch(batch)
+                batch = []
+        if batch:
+            self._launch(batch)
+
+    def _launch(self, batch) -> None:
+        task = asyncio.create_task(self._deliver(list(batch)))
+        self._batches.add(task)
+        task.add_done_callback(self._batches.discard)
+
+    async def _deliver(self, batch) -> None:
+        try:
+            maps = await self._detect(batch)
+        except Exception as e:
+            for image_path in batch:
+                if not self._futures[image_path].done():
+                    self._futures[image_path].set_exception(e)
+            return
+        for image_path, node_io_map in zip(batch, maps):
+            future = self._futures[image_path]
+            if future.done():
+                continue
+            if node_io_map is None:
+                future.set_exception(ValueError(f"图像检测失败: {image_path}"))
+            else:
+                future.set_result(node_io_map)
+
+    async def get(self, image_path: str) -> dict:
+        """返回图像的 node_io_map，检测失败时抛出异常"""
+        future = self._futures.get(image_path)
+        if future is None:
+            self._ensure_executor()
+            node_io_map = (await self._detect([image_path]))[0]
+            if node_io_map is None:
+                raise ValueError(f"图像检测失败: {image_path}")
+            return node_io_map
+        try:
+            return await future
+        finally:
+            del self._futures[image_path]
+            if image_path in self._scheduled:
+                self._scheduled.discard(image_path)
+                self._slots.release()
+
+    async def close(self) -> None:
+        """停止预取并关闭执行器"""
+        tasks = [t for t in [self._producer, *self._batches] if t is not None]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        for future in self._futures.values():
+            if not future.done():
+                future.cancel()
+            elif not future.cancelled():
+                future.exception()
+        self._futures.clear()
+        self._scheduled.clear()
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
 if __name__ == "__main__":
     node_io = NodeIO()
     image_path = "/data/home/libo/work/DataFactory/.cache/模拟电路框图/PLL.jpg"
@@ -1,21 +1,60 @@
 from ultralytics import YOLO
 from PIL import Image
+import numpy as np
 import os 
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from node_connections.det_backend import backend_weights, set_intra_op_threads
 os.environ['CUDA_VISIBLE_DEVICES']="-1"
 
+# 生产推理参数：不保存图像/标签/JSON，不画图，不输出逐张日志
+PRODUCTION_PREDICT_ARGS = {"save": False, "save_txt": False, "save_json": False, "save_crop": False,
+                           "plots": False, "verbose": False}
+
 
 
 class YoloDet():
 
-    def __init__(self):
+    def __init__(self, profile="default", backend="torch", threads=0, int8=False):
         # Load a pretrained YOLO11n model
-        self.det  = YOLO(os.path.join(os.path.dirname(os.path.abspath(__file__)),"node_det_v2_20250711.pt"))
+        pt_path = os.path.join(os.path.dirname(os.path.abspath(__file__)),"node_det_v2_20250711.pt")
+        # backend: torch / onnx / openvino，后两者需先用 det_backend.py 导出
+        self.backend = backend
+        self.weights = backend_weights(pt_path, backend, int8)
+        if backend != "torch" and not os.path.exists(self.weights):
+            raise FileNotFoundError(f"{self.weights} 不存在，请先运行 python node_connections/det_backend.py --backend {backend}")
+        self.det  = YOLO(self.weights, task="detect")
+        # production: 不写任何产物、不输出日志、预先融合Conv+BN（导出的模型在导出时已融合）
+        self.profile = profile
+        if profile == "production" and backend == "torch":
+            self.det.fuse()
+        # ONNX Runtime / OpenVINO 的线程数需在predictor建立后设置
+        if threads > 0:
+            if backend != "torch":
+                self.warmup(1024)
+            set_intra_op_threads(self.det, backend, self.weights, threads)
+
+    def _predict_args(self, save_json=True, plots=True):
+        if self.profile == "production":
+            return PRODUCTION_PREDICT_ARGS
+        return {"save_json": save_json, "plots": plots}
+
+    def warmup(self, imgsz=1024):
+        """用空白图像跑一次推理，提前建立predictor并分配输入缓冲区"""
+        self.det.predict(source=np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz, batch=1, **PRODUCTION_PREDICT_ARGS)
 
     # Run inference on 'bus.jpg' with arguments
     def __call__(self, image_path,imgsz=1024,conf=0.25, iou=0.45,save_json=True,plots=True):
-        results = self.det.predict(source=image_path, imgsz=imgsz, batch=1, conf=conf, iou=iou,save_json=save_json,plots=plots)
+        results = self.det.predict(source=image_path, imgsz=imgsz, batch=1, conf=conf, iou=iou, **self._predict_args(save_json, plots))
         return results[0]
 
+    def predict_batch(self, images, imgsz=1024, conf=0.25, iou=0.45, batch_size=8):
+        """批量推理：images 为已解码的图像列表（PIL.Image），按顺序返回每张图像的结果"""
+        if not images:
+            return []
+        args = PRODUCTION_PREDICT_ARGS if self.profile == "production" else {"verbose": False}
+        return self.det.predict(source=list(images), imgsz=imgsz, batch=batch_size, conf=conf, iou=iou, **args)
+
     def convert_to_yolo_format(self, x1, y1, x2, y2, img_width, img_height):
         """
         将边界框坐标从 (x1, y1, x2, y2) 格式转换为YOLO格式 (x_center, y_center, width, height)
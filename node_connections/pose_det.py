@@ -0,0 +1,86 @@
+from ultralytics import YOLO
+import numpy as np
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from src.box import Box
+from node_connections.det_backend import DETECTORS, WEIGHTS_DIR, backend_weights, set_intra_op_threads
+from node_connections.io_det import PRODUCTION_PREDICT_ARGS
+os.environ['CUDA_VISIBLE_DEVICES']="-1"
+
+# 姿态模型的关键点布局：kpt_shape 为 [2*K, 3]，前K个关键点为输入端口，后K个为输出端口，
+# 各类端口按从上到下、行内从左到右的顺序排列，未使用的位置标注为 "0 0 0"
+# （训练数据见 node_keypoint/get_keypoint_train_data.py --pose_slots K）。位置顺序依赖横坐标，训练时需设 fliplr=0.0
+PORT_NAMES = {0: "input", 1: "output"}
+# 关键点置信度不低于该值时视为存在端口
+KPT_CONF = 0.5
+# 由关键点生成的端口框边长（像素），与端口检测框的典型大小相当
+PORT_SIZE = 16
+
+
+class YoloPose():
+
+    def __init__(self, profile="default", backend="torch", threads=0, int8=False, weights=""):
+        pt_path = weights or os.path.join(WEIGHTS_DIR, DETECTORS["pose"][0])
+        self.backend = backend
+        self.weights = backend_weights(pt_path, backend, int8)
+        if not os.path.exists(self.weights):
+            raise FileNotFoundError(f"{self.weights} 不存在，请先训练姿态模型或用 det_backend.py --models pose 导出")
+        self.det = YOLO(self.weights, task="pose")
+        self.profile = profile
+        if profile == "production" and backend == "torch":
+            self.det.fuse()
+        if threads > 0:
+            if backend != "torch":
+                self.warmup(1024)
+            set_intra_op_threads(self.det, backend, self.weights, threads)
+
+    def _predict_args(self, save_json=True, plots=True):
+        if self.profile == "production":
+            return PRODUCTION_PREDICT_ARGS
+        return {"save_json": save_json, "plots": plots}
+
+    def warmup(self, imgsz=1024):
+        """用空白图像跑一次推理，提前建立predictor并分配输入缓冲区"""
+        self.det.predict(source=np.zeros((imgsz, imgsz, 3), dtype=np.uint8), imgsz=imgsz, batch=1, **PRODUCTION_PREDICT_ARGS)
+
+    def __call__(self, image_path,imgsz=1024,conf=0.25, iou=0.45,save_json=True,plots=True):
+        results = self.det.predict(source=image_path, imgsz=imgsz, batch=1, conf=conf, iou=iou, **self._predict_args(save_json, plots))
+        return results[0]
+
+    def predict_batch(self, images, imgsz=1024, conf=0.25, iou=0.45, batch_size=8):
+        """批量推理：images 为已解码的图像列表（PIL.Image），按顺序返回每张图像的结果"""
+        if not images:
+            return []
+        args = PRODUCTION_PREDICT_ARGS if self.profile == "production" else {"verbose": False}
+        return self.det.predict(source=list(images), imgsz=imgsz, batch=batch_size, conf=conf, iou=iou, **args)
+
+
+def decode_pose(results, kpt_conf=KPT_CONF, port_size=PORT_SIZE):
+    """把姿态模型的输出转为 node_io_map 和端口框
+
+    Returns:
+        (node_io_map, ports)：node_io_map 与 NodeIO 的结构相同；
+        ports 为 (M,6) 的 [x1, y1, x2, y2, conf, cls]，cls 0为输入、1为输出
+    """
+    boxes = results.boxes
+    node_io_map = {}
+    ports = []
+    if boxes is None or len(boxes) == 0:
+        return node_io_map, np.zeros((0, 6))
+    node_boxes = boxes.xyxy.cpu().numpy().astype(int).tolist()
+    keypoints = results.keypoints.data.cpu().numpy() if results.keypoints is not None else \
+        np.zeros((len(node_boxes), 0, 3))
+    slots = keypoints.shape[1] // 2
+    half = port_size / 2
+    for node_box, points in zip(node_boxes, keypoints):
+        io_data = node_io_map.setdefault(Box(*node_box).key, {"input": [], "output": []})
+        for index, point in enumerate(points):
+            conf = float(point[2]) if len(point) > 2 else 1.0
+            if conf < kpt_conf:
+                continue
+            cls_id = 0 if index < slots else 1
+            port_box = [int(point[0] - half), int(point[1] - half), int(point[0] + half), int(point[1] + half)]
+            io_data[PORT_NAMES[cls_id]].append(port_box)
+            ports.append([*port_box, conf, cls_id])
+    return node_io_map, np.asarray(ports, dtype=float).reshape(-1, 6)
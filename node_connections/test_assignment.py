@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import itertools
+import sys
+import os
+
+import numpy as np
+
+# 添加当前目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from convert_node_connection import _hungarian, linear_assignment, assign_connections
+
+def brute_force_best(scores):
+    """穷举所有一对一指派的最大总得分"""
+    rows, cols = scores.shape
+    if rows <= cols:
+        return max(sum(scores[i, j] for i, j in enumerate(perm)) for perm in itertools.permutations(range(cols), rows))
+    return max(sum(scores[i, j] for j, i in enumerate(perm)) for perm in itertools.permutations(range(rows), cols))
+
+def check_assignment(scores, rows, cols):
+    """指派是一对一的，且覆盖较短的一维"""
+    assert len(rows) == len(cols) == min(scores.shape)
+    assert len(set(rows.tolist())) == len(rows) and len(set(cols.tolist())) == len(cols)
+    assert list(rows) == sorted(rows)
+
+def test_hungarian():
+    """_hungarian 与穷举的最小总代价一致（行数不超过列数）"""
+    rng = np.random.default_rng(0)
+    for _ in range(200):
+        n = int(rng.integers(1, 6))
+        m = int(rng.integers(n, 7))
+        cost = rng.random((n, m))
+        if rng.random() < 0.3:
+            cost = np.round(cost * 3)  # 含大量同分的情况
+        assignment = _hungarian(cost)
+        assert len(set(assignment.tolist())) == n
+        total = cost[np.arange(n), assignment].sum()
+        assert np.isclose(total, -brute_force_best(-cost)), (cost, assignment)
+    print("_hungarian 与穷举一致: 通过")
+
+def test_linear_assignment():
+    """linear_assignment 最大化总得分，支持行多于列、空矩阵"""
+    rng = np.random.default_rng(1)
+    for _ in range(200):
+        scores = rng.random((int(rng.integers(1, 6)), int(rng.integers(1, 6))))
+        rows, cols = linear_assignment(scores)
+        check_assignment(scores, rows, cols)
+        assert np.isclose(scores[rows, cols].sum(), brute_force_best(scores)), scores
+    rows, cols = linear_assignment(np.zeros((0, 3)))
+    assert len(rows) == len(cols) == 0
+    # 逐行取最大会让两行都选第0列，最优指派为 0->1, 1->0
+    rows, cols = linear_assignment([[0.9, 0.8], [0.85, 0.1]])
+    assert rows.tolist() == [0, 1] and cols.tolist() == [1, 0]
+    print("linear_assignment 与穷举一致: 通过")
+
+def make_components():
+    components = {
+        "[0, 0, 100, 100]": {"name": "PID"},
+        "[200, 0, 300, 100]": {"name": "System"},
+        "[400, 0, 500, 100]": {"name": "Sensor"},
+    }
+    return components, {key: {"description": {"component_name": value["name"]}} for key, value in components.items()}
+
+def test_assign_connections_one_to_one():
+    """两个连接都最接近同一个组件时，只有得分总和最高的指派被采用，不会映射到同一个组件"""
+    components, details = make_components()
+    connections = [
+        {"name": "PID", "box": "(0, 0, 100, 100)"},
+        {"name": "System", "box": "(20, 0, 120, 100)"},   # 框与PID重叠更多，但名字是System
+        {"name": "Sensor", "box": "(400, 0, 500, 100)"},
+    ]
+    matched, unmatched = assign_connections(connections, components, details)
+    assert unmatched == []
+    assert [conn["box"] for conn in matched] == ["[0, 0, 100, 100]", "[200, 0, 300, 100]", "[400, 0, 500, 100]"]
+    assert [conn["name"] for conn in matched] == ["PID", "System", "Sensor"]
+    assert len({conn["box"] for conn in matched}) == len(matched)
+    print("assign_connections 一对一: 通过")
+
+def test_assign_connections_unmatched():
+    """没有框、框无法解析、得分过低或组件已被占用的连接列为未匹配，且不被修改"""
+    components, details = make_components()
+    connections = [
+        {"name": "r", "box": "()"},
+        {"name": "", "box": "(1000, 1000, 1100, 1100)"},
+        {"name": "PID"},
+        {"name": "PID", "box": "(0, 0, 100, 100)"},
+        {"name": "PID", "box": "(0, 0, 100, 100)"},
+    ]
+    originals = [dict(conn) for conn in connections]
+    matched, unmatched = assign_connections(connections, components, details)
+    assert len(matched) == 1 and matched[0]["box"] == "[0, 0, 100, 100]"
+    assert unmatched[:3] == originals[:3]
+    assert unmatched[3] == originals[4 if matched[0] is connections[3] else 3]  # 两个相同的连接只有一个能匹配
+    assert len(matched) + len(unmatched) == len(connections)
+    assert assign_connections([], components, details) == ([], [])
+    print("assign_connections 未匹配: 通过")
+
+if __name__ == "__main__":
+    test_hungarian()
+    test_linear_assignment()
+    test_assign_connections_one_to_one()
+    test_assign_connections_unmatched()
+    print("\n全部测试通过")
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import sys
+import os
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.box import Box, parse_box, box_key
+
+def test_key_round_trip():
+    """Box.key 与 str(list) 相同，且 Box.parse 能解析回同一个框"""
+    samples = [
+        [467, 130, 665, 213],
+        [0, 0, 1, 1],
+        [-5, -3, 10, 20],
+        [1.5, 2.25, 300.75, 400.125],
+        [1e-05, 2, 3e-07, 4],       # str 输出为指数形式的小数
+        [0.1, 0.2, 0.30000000000000004, 1],
+    ]
+    for values in samples:
+        text = str(values)
+        box = Box.parse(text)
+        assert box.key == text, (box.key, text)
+        assert Box.parse(box.key) == box
+        assert list(box) == values
+        assert box_key(values) == text
+    # 整数值的浮点数规范为整数
+    assert Box.parse("[1.0, 2.0, 3, 4]").key == "[1, 2, 3, 4]"
+    assert Box.parse(str([1e16, 0, 1, 1])) == Box(10 ** 16, 0, 1, 1)
+    print("Box.key/Box.parse 往返: 通过")
+
+def test_formats():
+    """各种支持的字符串格式"""
+    expected = Box(10, 20, 30, 40)
+    for text in ["[10, 20, 30, 40]", "(10,20,30,40)", "<|box_start|>(10,20),(30,40)<|box_end|>",
+                 "[10.0, 20, 30, 40]", " [ 10 , 20 , 30 , 40 ] "]:
+        assert Box.parse(text) == expected, text
+    assert Box.parse([10, 20, 30, 40]) == expected
+    assert Box.parse((10, 20, 30, 40)) == expected
+    assert Box.parse(expected) is expected
+    print("字符串格式: 通过")
+
+def test_exponent():
+    """指数形式整体作为一个数解析，不会被拆成多个数或截断"""
+    assert Box.parse("[1e3, 2, 3, 4]") == Box(1000, 2, 3, 4)
+    assert Box.parse("[1.5E+2, 2, 3, 4e-1]") == Box(150, 2, 3, 0.4)
+    assert Box.parse("[1, 2, 3, 4e0]") == Box(1, 2, 3, 4)
+    for text in ["[1e, 2, 3, 4]", "[1e3e3, 2, 3, 4]", "[1.2.3, 2, 3, 4]"]:
+        assert parse_box(text) is None, text
+    print("指数形式: 通过")
+
+def test_rejects():
+    """strict 时数的个数必须恰好为4，不能把名字中的数字当成坐标"""
+    for value in ["", "()", "[1, 2, 3]", "[1, 2, 3, 4, 5]", "box_2d: [1, 2, 3]", "[1a, 2, 3, 4]",
+                  "__import__('os').system('x')", [1, 2, 3], ["a", 2, 3, 4], None, 5]:
+        assert parse_box(value) is None, value
+        try:
+            Box.parse(value)
+        except ValueError:
+            pass
+        else:
+            raise AssertionError(f"应当解析失败: {value!r}")
+    # 非 strict 时取前4个数
+    assert Box.parse("[1, 2, 3, 4, 5]", strict=False) == Box(1, 2, 3, 4)
+    assert Box.parse("box_2d: [1, 2, 3, 4] score 0.9", strict=False) == Box(1, 2, 3, 4)
+    assert parse_box("[1, 2, 3]", strict=False) is None
+    print("非法输入: 通过")
+
+if __name__ == "__main__":
+    test_key_round_trip()
+    test_formats()
+    test_exponent()
+    test_rejects()
+    print("\n全部测试通过")
@@ -4,6 +4,7 @@
 import json
 import sys
 import os
+import tempfile
 
 # 添加当前目录到Python路径
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
@@ -219,9 +220,10 @@ def test_with_sample_data():
         }
     }
     
-    # 保存测试数据
-    test_input_file = "test_input.json"
-    test_output_file = "test_output.json"
+    # 保存测试数据（写在临时目录中，不在工作目录留下文件）
+    test_dir = tempfile.TemporaryDirectory()
+    test_input_file = os.path.join(test_dir.name, "test_input.json")
+    test_output_file = os.path.join(test_dir.name, "test_output.json")
     
     with open(test_input_file, 'w', encoding='utf-8') as f:
         json.dump(test_data, f, ensure_ascii=False, indent=2)
@@ -263,8 +265,6 @@ def test_with_sample_data():
                         else:
                             print(f"      [{i}] 未映射")
         
-        print(f"\n完整结果已保存到 {test_output_file}")
-        
     except Exception as e:
         print(f"测试过程中发生错误: {str(e)}")
         import traceback
@@ -272,9 +272,8 @@ def test_with_sample_data():
     
     finally:
         # 清理测试文件
-        if os.path.exists(test_input_file):
-            os.remove(test_input_file)
-        print(f"测试文件 {test_input_file} 已清理")
+        test_dir.cleanup()
+        print(f"测试目录 {test_dir.name} 已清理")
 
 if __name__ == "__main__":
     test_with_sample_data() 
\ No newline at end of file
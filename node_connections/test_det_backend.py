@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from node_connections.io_det import YoloDet as io_det
+from node_connections.node_det import YoloDet as node_det
+from node_connections.get_node_io import NodeIO, overlap_matrix
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def match_detections(reference, candidate, iou_threshold=0.9):
+    """按类别和IoU匹配两组检测结果，返回 (匹配数, 参考框数, 候选框数, 匹配框的最大置信度差)"""
+    ref_boxes = reference.boxes.xyxy.cpu().numpy()
+    ref_cls = reference.boxes.cls.cpu().numpy().astype(int)
+    ref_conf = reference.boxes.conf.cpu().numpy()
+    cand_boxes = candidate.boxes.xyxy.cpu().numpy()
+    cand_cls = candidate.boxes.cls.cpu().numpy().astype(int)
+    cand_conf = candidate.boxes.conf.cpu().numpy()
+    if len(ref_boxes) == 0 or len(cand_boxes) == 0:
+        return 0, len(ref_boxes), len(cand_boxes), 0.0
+
+    scores = overlap_matrix(ref_boxes, cand_boxes)
+    scores[ref_cls[:, None] != cand_cls[None, :]] = 0
+    matched, conf_diff = 0, 0.0
+    used = set()
+    for i in np.argsort(-ref_conf):
+        j = int(scores[i].argmax())
+        if scores[i, j] >= iou_threshold and j not in used:
+            used.add(j)
+            matched += 1
+            conf_diff = max(conf_diff, abs(float(ref_conf[i]) - float(cand_conf[j])))
+    return matched, len(ref_boxes), len(cand_boxes), conf_diff
+
+
+def test_backend_parity(image_paths, backend, int8=False, min_recall=0.95, max_conf_diff=0.05):
+    """导出后端与PyTorch模型在同一批图像上的检测结果一致性"""
+    all_passed = True
+    for name, detector_cls, imgsz in (("port", io_det, 640), ("node", node_det, 1024)):
+        reference = detector_cls("production")
+        candidate = detector_cls("production", backend, int8=int8)
+        totals = np.zeros(3, dtype=int)
+        worst_conf_diff = 0.0
+        ref_time = cand_time = 0.0
+        for image_path in image_paths:
+            start = time.perf_counter()
+            ref_result = reference(image_path, imgsz)
+            ref_time += time.perf_counter() - start
+            start = time.perf_counter()
+            cand_result = candidate(image_path, imgsz)
+            cand_time += time.perf_counter() - start
+            matched, n_ref, n_cand, conf_diff = match_detections(ref_result, cand_result)
+            totals += (matched, n_ref, n_cand)
+            worst_conf_diff = max(worst_conf_diff, conf_diff)
+
+        recall = totals[0] / max(totals[1], 1)
+        precision = totals[0] / max(totals[2], 1)
+        # INT8量化允许更大的置信度偏差
+        passed = recall >= min_recall and precision >= min_recall and \
+            (int8 or worst_conf_diff <= max_conf_diff)
+        all_passed &= passed
+        print(f"{name}: torch {totals[1]} 框, {backend}{'-int8' if int8 else ''} {totals[2]} 框, "
+              f"匹配 {totals[0]} (召回 {recall:.3f}, 精度 {precision:.3f}), 最大置信度差 {worst_conf_diff:.4f}, "
+              f"耗时 {ref_time / len(image_paths) * 1000:.1f}ms -> {cand_time / len(image_paths) * 1000:.1f}ms "
+              f"{'✅' if passed else '❌'}")
+    return all_passed
+
+
+def test_node_io_parity(image_paths, backend, int8=False):
+    """NodeIO 最终的节点-端口映射是否一致"""
+    reference = NodeIO(profile="production")
+    candidate = NodeIO(profile="production", backend=backend, int8=int8)
+    same = 0
+    for image_path in image_paths:
+        same += reference(image_path)[2] == candidate(image_path)[2]
+    print(f"NodeIO: {same}/{len(image_paths)} 张图像的 node_io_map 完全一致")
+    return same
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="检测模型导出后端与PyTorch输出的一致性测试")
+    parser.add_argument("--image_dir", type=str, required=True, help="测试图像目录")
+    parser.add_argument("--backend", type=str, choices=["onnx", "openvino"], default="onnx", help="待测后端")
+    parser.add_argument("--int8", action="store_true", help="测试INT8量化模型")
+    parser.add_argument("--count", type=int, default=20, help="测试图像数量")
+    args = parser.parse_args()
+
+    images = sorted(os.path.join(args.image_dir, f) for f in os.listdir(args.image_dir)
+                    if f.lower().endswith(IMAGE_EXTENSIONS))[:args.count]
+    print(f"测试图像: {len(images)} 张")
+    ok = test_backend_parity(images, args.backend, args.int8)
+    test_node_io_parity(images, args.backend, args.int8)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+import torch
+from PIL import Image
+from ultralytics.engine.results import Results
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import node_connections.get_node_io as get_node_io
+from node_connections.get_node_io import PoseNodeIO
+
+# 姿态检测路径的端到端测试：用固定输出的假姿态模型代替模型权重，
+# 检查由关键点生成的端口结果能够写入检测缓存（raw_boxes）并再次读取
+
+# 每个节点 K=2 个输入位 + 2 个输出位；置信度低于0.5的关键点不是端口
+NODE_BOXES = [[100, 100, 300, 200], [400, 100, 600, 200]]
+KEYPOINTS = [
+    [[100, 150, 0.9], [0, 0, 0.0], [300, 150, 0.8], [0, 0, 0.0]],
+    [[400, 130, 0.9], [400, 170, 0.7], [0, 0, 0.1], [600, 150, 0.95]],
+]
+
+
+class FakePose:
+    def __init__(self, weights):
+        self.weights = weights
+
+    def warmup(self, imgsz=1024):
+        pass
+
+    def _detect(self, image):
+        boxes = torch.tensor([[*box, 0.9, 0] for box in NODE_BOXES], dtype=torch.float32)
+        return Results(np.asarray(image), path="", names={0: "node"}, boxes=boxes,
+                       keypoints=torch.tensor(KEYPOINTS, dtype=torch.float32))
+
+    def predict_batch(self, images, imgsz=1024, conf=0.25, iou=0.45, batch_size=8):
+        return [self._detect(image) for image in images]
+
+    def __call__(self, image, imgsz=1024, conf=0.25, iou=0.45, save_json=True, plots=True):
+        return self._detect(image)
+
+
+def test_pose_detect_maps(workdir):
+    weights = os.path.join(workdir, "pose.pt")
+    with open(weights, "wb") as f:
+        f.write(b"fake weights")
+    image_path = os.path.join(workdir, "image.png")
+    Image.new("RGB", (800, 400), (255, 255, 255)).save(image_path)
+    get_node_io.YoloPose = lambda *args, **kwargs: FakePose(weights)
+    node_io = PoseNodeIO(profile="production", cache=os.path.join(workdir, "detections.db"))
+
+    results_io, _, node_io_map = node_io(image_path)
+    assert node_io_map == {
+        "[100, 100, 300, 200]": {"input": [[92, 142, 108, 158]], "output": [[292, 142, 308, 158]]},
+        "[400, 100, 600, 200]": {"input": [[392, 122, 408, 138], [392, 162, 408, 178]],
+                                 "output": [[592, 142, 608, 158]]},
+    }, node_io_map
+    # 端口结果与检测器输出的访问方式相同
+    assert results_io.boxes.cls.cpu().numpy().tolist() == [0, 1, 0, 0, 1]
+
+    maps = node_io.detect_maps([image_path])
+    assert maps == [node_io_map] and node_io.cache_misses == 1
+    assert node_io.detect_maps([image_path]) == maps and node_io.cache_hits == 1
+    print("姿态检测 detect_maps（缓存）: 通过")
+
+
+if __name__ == "__main__":
+    with tempfile.TemporaryDirectory() as workdir:
+        test_pose_detect_maps(workdir)
+    print("\n全部测试通过")
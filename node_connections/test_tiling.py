@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+import os
+import sys
+import tempfile
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import node_connections.get_node_io as get_node_io
+from node_connections.get_node_io import NodeIO, numpy_results
+from node_connections.tiling import merge_detections, tile_windows
+
+# 切片检测的端到端测试：用按颜色"检测"的假检测器代替模型权重，
+# 检测器输出与真实模型相同的 Results（torch张量），图块中得到的是被边界截断的真实片段
+
+SIZE = 2600  # 超过默认切片阈值 2048x2048，切成 3x3 个 1024 的图块
+NODE_NAMES = {0: "node"}
+PORT_NAMES = {0: "input", 1: "output"}
+# (框, 类别, 颜色)，每个目标颜色不同；节点先画，内层节点和端口后画
+NODES = {
+    "A": ([100, 100, 1500, 1500], (200, 200, 200)),   # 跨越多个图块的大节点
+    "B": ([300, 300, 600, 600], (150, 150, 150)),     # 嵌套在A中的节点
+    "C": ([2200, 2200, 2300, 2300], (100, 100, 100)), # 整图检测漏检的小节点，只在一个图块中
+    "D": ([900, 1700, 1000, 1800], (50, 50, 50)),     # 整图漏检、位于两个图块重叠区域的小节点
+}
+PORTS = {
+    "p1": ([290, 440, 310, 460], 0, (255, 0, 0)),     # B 的输入
+    "p2": ([1490, 800, 1510, 820], 1, (0, 255, 0)),   # A 的输出
+    "p3": ([1014, 90, 1034, 110], 0, (255, 0, 1)),    # A 的输入，被第一个图块的右边界截断
+    "p4": ([2290, 2240, 2310, 2260], 1, (0, 255, 1)), # C 的输出
+    "p5": ([940, 1690, 960, 1710], 0, (255, 0, 2)),   # D 的输入，位于两个图块的重叠区域
+}
+EXPECTED = {
+    "A": {"input": ["p3"], "output": ["p2"]},
+    "B": {"input": ["p1"], "output": []},
+    "C": {"input": [], "output": ["p4"]},
+    "D": {"input": ["p5"], "output": []},
+}
+# 整图推理时小于该边长的节点检测不到（模拟大图缩放后的小目标漏检）
+FULL_IMAGE_MIN_SIDE = 150
+
+
+def draw_scene(path, size=SIZE):
+    image = Image.new("RGB", (size, size), (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    for box, color in NODES.values():
+        draw.rectangle([box[0], box[1], box[2] - 1, box[3] - 1], fill=color)
+    for box, _, color in PORTS.values():
+        draw.rectangle([box[0], box[1], box[2] - 1, box[3] - 1], fill=color)
+    image.save(path)
+
+
+class ColorDet:
+    """按颜色"检测"：每个目标的框为输入图像中该颜色像素的外接框"""
+
+    def __init__(self, weights, targets, names, full_image_min_side=0):
+        self.weights = weights
+        self.targets = targets
+        self.names = names
+        self.full_image_min_side = full_image_min_side
+
+    def _detect(self, image):
+        pixels = np.asarray(image)
+        full_image = image.width > 1024
+        data = []
+        for box, cls_id, color in self.targets:
+            if full_image and min(box[2] - box[0], box[3] - box[1]) < self.full_image_min_side:
+                continue
+            ys, xs = np.nonzero(np.all(pixels == color, axis=2))
+            if len(xs):
+                data.append([xs.min(), ys.min(), xs.max() + 1, ys.max() + 1, 0.9, cls_id])
+        return numpy_results(image, self.names, np.asarray(data, dtype=float).reshape(-1, 6))
+
+    def warmup(self, imgsz=1024):
+        pass
+
+    def predict_batch(self, images, imgsz=1024, conf=0.25, iou=0.45, batch_size=8):
+        return [self._detect(image) for image in images]
+
+    def __call__(self, image, imgsz=1024, conf=0.25, iou=0.45, save_json=True, plots=True):
+        return self._detect(image)
+
+
+def make_node_io(workdir, cache=None):
+    weights = os.path.join(workdir, "fake.pt")
+    with open(weights, "wb") as f:
+        f.write(b"fake weights")
+    nodes = [(box, 0, color) for box, color in NODES.values()]
+    ports = list(PORTS.values())
+    get_node_io.io_det = lambda *args, **kwargs: ColorDet(weights, ports, PORT_NAMES)
+    get_node_io.node_det = lambda *args, **kwargs: ColorDet(weights, nodes, NODE_NAMES, FULL_IMAGE_MIN_SIDE)
+    return NodeIO(concurrent=False, profile="production", cache=cache)
+
+
+def expected_map():
+    return {str(NODES[node][0]): {io_type: [PORTS[port][0] for port in ports] for io_type, ports in io.items()}
+            for node, io in EXPECTED.items()}
+
+
+def test_merge_keeps_nested():
+    """同一输入中的嵌套框不合并，只合并来自不同图块的重复框"""
+    boxes, _, _ = merge_detections([[0, 0, 1000, 1000], [100, 100, 200, 200]], [0.9, 0.8], [0, 0])
+    assert len(boxes) == 2
+    boxes, _, _ = merge_detections([[0, 0, 1000, 1000], [100, 100, 200, 200]], [0.9, 0.8], [0, 0], sources=[0, 1])
+    assert len(boxes) == 1
+    print("嵌套框保留: 通过")
+
+
+def test_tiled_node_io(workdir):
+    """大图经切片检测后得到完整的 node_io_map：嵌套节点保留，截断和重复的框合并"""
+    image_path = os.path.join(workdir, "large.png")
+    draw_scene(image_path)
+    assert len(tile_windows(SIZE, SIZE)) == 9
+    node_io = make_node_io(workdir)
+    results_io, results_node, node_io_map = node_io(image_path)
+    assert node_io_map == expected_map(), node_io_map
+    # 合并后的结果与检测器输出的访问方式相同
+    assert results_node.boxes.xyxy.cpu().numpy().shape == (4, 4)
+    assert node_io.get_all_node_io(results_io, results_node) == node_io_map
+    assert node_io.batch([image_path])[0][2] == node_io_map
+    print("切片检测 get_all_node_io: 通过")
+
+
+def test_tiled_detect_maps(workdir):
+    """启用缓存的 detect_maps：切片和不切片的图像一起检测，原始框写入缓存后再次读取结果相同"""
+    large_path = os.path.join(workdir, "large.png")
+    small_path = os.path.join(workdir, "small.png")
+    draw_scene(large_path)
+    Image.open(large_path).crop((0, 0, 1024, 1024)).save(small_path)
+    node_io = make_node_io(workdir, cache=os.path.join(workdir, "detections.db"))
+    maps = node_io.detect_maps([large_path, small_path])
+    assert maps[0] == expected_map(), maps[0]
+    assert str(NODES["B"][0]) in maps[1]
+    assert node_io.cache_misses == 2
+    assert node_io.detect_maps([large_path, small_path]) == maps
+    assert node_io.cache_hits == 2
+    print("切片检测 detect_maps（缓存）: 通过")
+
+
+if __name__ == "__main__":
+    test_merge_keeps_nested()
+    with tempfile.TemporaryDirectory() as workdir:
+        test_tiled_node_io(workdir)
+        test_tiled_detect_maps(workdir)
+    print("\n全部测试通过")
@@ -0,0 +1,189 @@
+import numpy as np
+
+# 大图切片检测：把超过像素阈值的图像切成相互重叠的图块分别推理，再把图块坐标的检测框
+# 平移回整图并跨图块合并。端口检测只用图块（小目标），节点检测另加一次整图推理，
+# 以便跨越多个图块的大节点有完整的框。只合并来自不同输入（图块/整图）的重复框：
+# 同一输入中的框已经过检测器的NMS，即使相互嵌套也是不同的目标
+
+# 超过该像素数（宽x高）时自动切片，约为 2048x2048
+DEFAULT_TILE_PIXELS = 2048 * 2048
+DEFAULT_TILE_SIZE = 1024
+DEFAULT_TILE_OVERLAP = 0.2
+# 端口框的合并方式。nmm: 重叠的框合并为外接框（适合被图块边界截断的框）；nms: 只保留置信度最高的框
+TILE_MERGES = ("nmm", "nms")
+# 节点框的合并方式（写入缓存键，修改节点合并算法时同时修改）：整图检测为基准，按IoU去重
+NODE_MERGE = "full_ref_nms"
+# 距图块内部边界不超过该像素数的框视为被图块截断
+CUT_MARGIN = 2
+
+
+def needs_tiling(width: int, height: int, tile_pixels: int = DEFAULT_TILE_PIXELS) -> bool:
+    return tile_pixels > 0 and width * height > tile_pixels
+
+
+def tile_windows(width: int, height: int, tile_size: int = DEFAULT_TILE_SIZE, overlap: float = DEFAULT_TILE_OVERLAP):
+    """覆盖整图的重叠图块 [(x1, y1, x2, y2), ...]，最后一行/列贴齐图像边缘"""
+    stride = max(1, int(tile_size * (1 - overlap)))
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, stride))
+        positions.append(length - tile_size)
+        return positions
+
+    return [(x, y, min(x + tile_size, width), min(y + tile_size, height))
+            for y in starts(height) for x in starts(width)]
+
+
+def tiling_params(pixels: int, size: int, overlap: float, merge: str) -> dict:
+    """影响切片检测结果的参数（用于检测缓存的模型键）"""
+    return {"pixels": pixels, "size": size, "overlap": overlap, "merge": merge, "node_merge": NODE_MERGE}
+
+
+def result_arrays(results):
+    """检测结果的 (boxes (N,4) float, scores (N,), classes (N,) int)，框数据为torch张量或numpy数组均可"""
+    boxes = results.boxes
+    if boxes is None or len(boxes) == 0:
+        return np.zeros((0, 4)), np.zeros((0,)), np.zeros((0,), dtype=int)
+    boxes = boxes.cpu().numpy()
+    return boxes.xyxy.astype(float), boxes.conf.astype(float), boxes.cls.astype(int)
+
+
+def _row_overlap(box, boxes, method):
+    """一个框与一组框的重叠度：nmm 用交集占较小框面积的比例，nms 用IoU"""
+    w = np.clip(np.minimum(box[2], boxes[:, 2]) - np.maximum(box[0], boxes[:, 0]), 0, None)
+    h = np.clip(np.minimum(box[3], boxes[:, 3]) - np.maximum(box[1], boxes[:, 1]), 0, None)
+    inter = w * h
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    if method == "nmm":
+        denom = np.minimum(area, areas)
+    else:
+        denom = area + areas - inter
+    return np.divide(inter, denom, out=np.zeros_like(inter), where=denom > 0)
+
+
+def _iou_matrix(boxes_a, boxes_b):
+    """两组框两两之间的IoU (len(a), len(b))"""
+    w = np.clip(np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2]) - np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0]), 0, None)
+    h = np.clip(np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3]) - np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1]), 0, None)
+    inter = w * h
+    areas_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    areas_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = areas_a[:, None] + areas_b[None, :] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+def _empty():
+    return np.zeros((0, 4)), np.zeros((0,)), np.zeros((0,), dtype=int)
+
+
+def merge_detections(boxes, scores, classes, method="nmm", threshold=0.5, sources=None):
+    """按类别贪心合并来自不同输入的重复检测框，返回 (boxes, scores, classes)
+
+    按置信度从高到低，每个未处理的框从其他输入中各吸收至多一个同类别、重叠度不低于 threshold 的框
+    （同一输入中的框互不合并）；nmm 取这组框的外接框，nms 保留置信度最高的框。置信度取组内最高值。
+
+    Args:
+        sources: 每个框来自的输入编号，None 表示所有框来自同一输入（不合并）
+    """
+    if method not in TILE_MERGES:
+        raise ValueError(f"未知的合并方式: {method}，可选 {TILE_MERGES}")
+    boxes = np.asarray(boxes, dtype=float).reshape(-1, 4)
+    scores = np.asarray(scores, dtype=float).reshape(-1)
+    classes = np.asarray(classes, dtype=int).reshape(-1)
+    sources = np.zeros(len(boxes), dtype=int) if sources is None else np.asarray(sources, dtype=int).reshape(-1)
+    done = np.zeros(len(boxes), dtype=bool)
+    merged = []
+    for i in np.argsort(-scores, kind="stable"):
+        if done[i]:
+            continue
+        overlap = _row_overlap(boxes[i], boxes, method)
+        candidates = np.flatnonzero(~done & (classes == classes[i]) & (sources != sources[i]) & (overlap >= threshold))
+        group, used = [i], {sources[i]}
+        # 每个输入只取与当前框重叠度最高的一个
+        for j in candidates[np.argsort(-overlap[candidates], kind="stable")]:
+            if sources[j] not in used:
+                used.add(sources[j])
+                group.append(j)
+        done[group] = True
+        if method == "nmm":
+            members = boxes[group]
+            merged.append((*members[:, :2].min(axis=0), *members[:, 2:].max(axis=0), scores[i], classes[i]))
+        else:
+            merged.append((*boxes[i], scores[i], classes[i]))
+    if not merged:
+        return _empty()
+    merged = np.asarray(merged, dtype=float)
+    return merged[:, :4], merged[:, 4], merged[:, 5].astype(int)
+
+
+def shift_to_image(boxes, window):
+    """图块坐标的框平移回整图坐标"""
+    return boxes + np.array([window[0], window[1], window[0], window[1]], dtype=float)
+
+
+def merge_tile_results(parts, windows):
+    """把各图块的检测结果平移回整图坐标并拼接，返回 (boxes, scores, classes, sources)
+
+    Args:
+        parts: 每个图块的 (boxes, scores, classes)
+        windows: 与 parts 对应的图块窗口，None 表示整图结果（不平移）
+    """
+    all_boxes, all_scores, all_classes, all_sources = [], [], [], []
+    for source, ((boxes, scores, classes), window) in enumerate(zip(parts, windows)):
+        if window is not None:
+            boxes = shift_to_image(boxes, window)
+        all_boxes.append(boxes)
+        all_scores.append(scores)
+        all_classes.append(classes)
+        all_sources.append(np.full(len(boxes), source, dtype=int))
+    if not all_boxes:
+        return (*_empty(), np.zeros((0,), dtype=int))
+    return np.concatenate(all_boxes), np.concatenate(all_scores), np.concatenate(all_classes), np.concatenate(all_sources)
+
+
+def cut_by_tile(boxes, window, width, height, margin=CUT_MARGIN):
+    """整图坐标的框中被图块内部边界（不是图像边界）截断的框"""
+    x1, y1, x2, y2 = window
+    cut = np.zeros(len(boxes), dtype=bool)
+    if x1 > 0:
+        cut |= boxes[:, 0] <= x1 + margin
+    if y1 > 0:
+        cut |= boxes[:, 1] <= y1 + margin
+    if x2 < width:
+        cut |= boxes[:, 2] >= x2 - margin
+    if y2 < height:
+        cut |= boxes[:, 3] >= y2 - margin
+    return cut
+
+
+def merge_node_detections(full, parts, windows, width, height, threshold=0.5):
+    """合并整图和各图块的节点检测结果，返回 (boxes, scores, classes)
+
+    整图检测的框全部保留，作为基准。图块中被内部边界截断的框丢弃：大节点由整图检测给出完整的框，
+    比重叠区域小的节点在相邻图块中完整出现。其余图块框与同类别基准框的IoU不低于 threshold 时视为重复，
+    剩下的（整图漏检的小节点）在不同图块之间按IoU做NMS。所有合并都不使用包含关系，嵌套节点得以保留。
+
+    Args:
+        full: 整图的 (boxes, scores, classes)
+        parts: 每个图块的 (boxes, scores, classes)，图块坐标
+        windows: 与 parts 对应的图块窗口
+    """
+    ref_boxes, ref_scores, ref_classes = (np.asarray(a) for a in full)
+    ref_boxes = ref_boxes.astype(float).reshape(-1, 4)
+    kept = []
+    for (boxes, scores, classes), window in zip(parts, windows):
+        boxes = shift_to_image(np.asarray(boxes, dtype=float).reshape(-1, 4), window)
+        keep = ~cut_by_tile(boxes, window, width, height)
+        kept.append((boxes[keep], np.asarray(scores)[keep], np.asarray(classes)[keep]))
+    boxes, scores, classes, sources = merge_tile_results(kept, [None] * len(kept))
+    if len(boxes) and len(ref_boxes):
+        ious = _iou_matrix(boxes, ref_boxes)
+        ious[classes[:, None] != ref_classes[None, :]] = 0.0
+        new = ious.max(axis=1) < threshold
+        boxes, scores, classes, sources = boxes[new], scores[new], classes[new], sources[new]
+    boxes, scores, classes = merge_detections(boxes, scores, classes, "nms", threshold, sources)
+    return (np.concatenate([ref_boxes, boxes]), np.concatenate([np.asarray(ref_scores, dtype=float), scores]),
+            np.concatenate([np.asarray(ref_classes, dtype=int), classes]))
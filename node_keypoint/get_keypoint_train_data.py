@@ -1,6 +1,5 @@
 
 from PIL import Image, ImageDraw, ImageFont
-import ast
 import os
 import argparse
 
@@ -8,20 +7,24 @@ import sys
 print(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from node_keypoint.get_node_io import NodeIO
+from src.box import Box
 
 def get_box_center_and_size(box_str):
     """
     从字符串格式的box中提取中心点和大小
     box_str: "[x1, y1, x2, y2]" 格式的字符串
     """
-    box = ast.literal_eval(box_str)
-    x1, y1, x2, y2 = box
+    x1, y1, x2, y2 = Box.parse(box_str)
     center_x = (x1 + x2) / 2
     center_y = (y1 + y2) / 2
     width = x2 - x1
     height = y2 - y1
     return center_x, center_y, width, height
 
+# 固定关键点布局中端口的排列顺序：按关键点中心从上到下、同一行内从左到右，
+# 纵坐标相差不超过 PORT_ROW_TOLERANCE 像素的端口视为同一行（端口框边长约16像素）
+PORT_ROW_TOLERANCE = 8
+
 def get_keypoint_center(box):
     """
     从box坐标中计算关键点中心
@@ -74,7 +77,7 @@ def parse_yolo_pose_line(line):
     
     return class_id, center_x, center_y, width, height, keypoints
 
-def visualize_yolo_pose_results(image_path, yolo_lines, save_path=None):
+def visualize_yolo_pose_results(image_path, yolo_lines, save_path=None, slots=None):
     """
     可视化YOLO pose格式的结果
     
@@ -82,6 +85,7 @@ def visualize_yolo_pose_results(image_path, yolo_lines, save_path=None):
         image_path: 原始图片路径
         yolo_lines: YOLO pose格式的标签行列表
         save_path: 保存路径，如果为None则显示图片
+        slots: 固定关键点布局（见 convert_to_yolo_pose_format）的每类位置数，None为按可见性区分输入输出
     """
     # 打开图片
     image = Image.open(image_path)
@@ -129,12 +133,14 @@ def visualize_yolo_pose_results(image_path, yolo_lines, save_path=None):
         input_count = 0
         output_count = 0
         
-        for kp_x, kp_y, visibility in keypoints:
+        for kp_index, (kp_x, kp_y, visibility) in enumerate(keypoints):
+            if slots is not None and visibility == 0:  # 固定布局中未使用的位置
+                continue
             # 反归一化关键点坐标
             abs_kp_x = int(kp_x * img_width)
             abs_kp_y = int(kp_y * img_height)
             
-            if visibility == 0:  # 输入关键点
+            if (kp_index < slots) if slots is not None else visibility == 0:  # 输入关键点
                 color = colors['input_point']
                 input_count += 1
                 label = f"I{input_count}"
@@ -208,7 +214,19 @@ def visualize_from_label_file(image_path, label_path, save_path=None):
         print(f"读取标签文件时出错: {e}")
         return None
 
-def convert_to_yolo_pose_format(node_io_map, image_path, class_id=0, visibility=2):
+def sort_ports(io_boxes):
+    """
+    按固定关键点布局的位置顺序排列端口框：先按行（从上到下），行内按横坐标（从左到右）
+    """
+    centers = sorted((get_keypoint_center(box)[::-1], box) for box in io_boxes)
+    ordered, row_y = [], None
+    for (y, x), box in centers:
+        if row_y is None or y - row_y > PORT_ROW_TOLERANCE:
+            row_y = y
+        ordered.append(((row_y, x), box))
+    return [box for _, box in sorted(ordered, key=lambda item: item[0])]
+
+def convert_to_yolo_pose_format(node_io_map, image_path, class_id=0, visibility=2, slots=None):
     """
     将NodeIO的输出转换为YOLO pose训练集格式
     
@@ -217,6 +235,11 @@ def convert_to_yolo_pose_format(node_io_map, image_path, class_id=0, visibility=
         image_path: 图片路径，用于获取图片尺寸
         class_id: 默认类别ID，默认为0
         visibility: 关键点可见性，默认为2（可见）
+        slots: 固定关键点布局，None 时关键点数随端口数变化、用可见性区分输入(1)输出(2)；
+            为K时每行固定 2*K 个关键点（kpt_shape [2K, 3]）：前K个为输入、后K个为输出，各自按 sort_ports
+            的顺序（从上到下、行内从左到右）填入，空位写 "0 0 0"，超出K个的端口被丢弃并打印警告，
+            没有端口的节点也保留。供 node_connections/pose_det.py 的姿态模型训练使用。
+            位置顺序依赖横坐标，左右翻转后不再成立，且无法用固定的 flip_idx 表示，训练时需关闭左右翻转增强（fliplr=0.0）
     
     Returns:
         lines: YOLO pose格式的字符串列表
@@ -226,6 +249,7 @@ def convert_to_yolo_pose_format(node_io_map, image_path, class_id=0, visibility=
         img_width, img_height = img.size
     
     lines = []
+    dropped = 0
     
     for node_box_str, io_data in node_io_map.items():
         # 获取节点框的中心点和大小
@@ -245,6 +269,18 @@ def convert_to_yolo_pose_format(node_io_map, image_path, class_id=0, visibility=
             f"{norm_height:.5f}"     # 归一化高度
         ]
         
+        if slots is not None:
+            for io_type in ("input", "output"):
+                io_boxes = sort_ports(io_data.get(io_type, []))
+                dropped += max(len(io_boxes) - slots, 0)
+                io_boxes = io_boxes[:slots]
+                for io_box in io_boxes:
+                    kp_x, kp_y = get_keypoint_center(io_box)
+                    line_parts.extend([f"{kp_x / img_width:.5f}", f"{kp_y / img_height:.5f}", str(visibility)])
+                line_parts.extend(["0", "0", "0"] * (slots - len(io_boxes)))
+            lines.append(" ".join(line_parts))
+            continue
+
         # 添加输入关键点 (visibility=0)
         for input_box in io_data.get("input", []):
             kp_x, kp_y = get_keypoint_center(input_box)
@@ -263,6 +299,8 @@ def convert_to_yolo_pose_format(node_io_map, image_path, class_id=0, visibility=
         if len(line_parts) > 5:  # 基本的5个参数之外还有关键点
             lines.append(" ".join(line_parts))
     
+    if dropped:
+        print(f"警告: {image_path} 中有 {dropped} 个端口超出每类 {slots} 个位置，已丢弃")
     return lines
 
 def save_yolo_pose_labels(lines, output_path):
@@ -273,7 +311,8 @@ def save_yolo_pose_labels(lines, output_path):
         for line in lines:
             f.write(line + '\n')
 
-def process_image_to_yolo_pose(image_path, output_dir=None, class_id=0, visualize=False, vis_save_path=None):
+def process_image_to_yolo_pose(image_path, output_dir=None, class_id=0, visualize=False, vis_save_path=None,
+                               node_io=None, node_io_map=None, slots=None):
     """
     处理单张图片，生成YOLO pose格式的标签文件
     
@@ -283,15 +322,20 @@ def process_image_to_yolo_pose(image_path, output_dir=None, class_id=0, visualiz
         class_id: 类别ID，默认为0
         visualize: 是否生成可视化图片，默认为False
         vis_save_path: 可视化图片保存路径，如果为None则自动生成
+        node_io: 复用的NodeIO实例，为None时新建
+        node_io_map: 已批量检测得到的节点IO映射，为None时对该图片单独检测
+        slots: 固定关键点布局的每类位置数（见 convert_to_yolo_pose_format）
     """
-    # 初始化NodeIO
-    node_io = NodeIO()
-    
-    # 获取节点IO数据
-    results_io, results_node, node_io_map = node_io(image_path)
+    if node_io_map is None:
+        # 初始化NodeIO
+        if node_io is None:
+            node_io = NodeIO()
+        
+        # 获取节点IO数据
+        results_io, results_node, node_io_map = node_io(image_path)
     
     # 转换为YOLO pose格式
-    yolo_lines = convert_to_yolo_pose_format(node_io_map, image_path, class_id)
+    yolo_lines = convert_to_yolo_pose_format(node_io_map, image_path, class_id, slots=slots)
     
     # 确定输出路径
     if output_dir is None:
@@ -314,7 +358,7 @@ def process_image_to_yolo_pose(image_path, output_dir=None, class_id=0, visualiz
         if not os.path.exists(vis_dir):
             os.makedirs(vis_dir)
             
-        visualize_yolo_pose_results(image_path, yolo_lines, vis_save_path)
+        visualize_yolo_pose_results(image_path, yolo_lines, vis_save_path, slots)
     
     print(f"处理图片: {image_path}")
     print(f"生成标签: {label_path}")
@@ -324,7 +368,8 @@ def process_image_to_yolo_pose(image_path, output_dir=None, class_id=0, visualiz
     
     return yolo_lines, label_path
 
-def batch_process_images(image_dir, output_dir, class_id=0, visualize=True, vis_output_dir=None):
+def batch_process_images(image_dir, output_dir, class_id=0, visualize=True, vis_output_dir=None, batch_size=8,
+                         cache=True, slots=None):
     """
     批量处理图片目录，生成YOLO pose格式的标签文件
     
@@ -334,6 +379,9 @@ def batch_process_images(image_dir, output_dir, class_id=0, visualize=True, vis_
         class_id: 类别ID，默认为0
         visualize: 是否生成可视化图片，默认为True
         vis_output_dir: 可视化图片输出目录，如果为None则使用output_dir
+        batch_size: 每批检测的图片数，检测模型只加载一次
+        cache: 检测结果缓存（True为默认路径，字符串为缓存文件路径，False不使用），重复运行时跳过已检测的图片
+        slots: 固定关键点布局的每类位置数（见 convert_to_yolo_pose_format）
     """
     if not os.path.exists(output_dir):
         os.makedirs(output_dir)
@@ -348,24 +396,35 @@ def batch_process_images(image_dir, output_dir, class_id=0, visualize=True, vis_
 
     print(f"开始批量处理图片: {image_dir},len(os.listdir(image_dir))={len(os.listdir(image_dir))}")
     import tqdm
-    for filename in tqdm.tqdm(os.listdir(image_dir)):
-        if any(filename.lower().endswith(ext) for ext in image_extensions):
-            image_path = os.path.join(image_dir, filename)
-            try:
-                # 生成可视化路径
-                vis_save_path = None
-                if visualize:
-                    image_name = os.path.splitext(filename)[0]
-                    vis_save_path = os.path.join(vis_output_dir, f"{image_name}_visualized.jpg")
-                
-                # 处理图片生成标签，包括可视化
-                yolo_lines, label_path = process_image_to_yolo_pose(
-                    image_path, output_dir, class_id, visualize, vis_save_path
-                )
+    filenames = [f for f in os.listdir(image_dir) if any(f.lower().endswith(ext) for ext in image_extensions)]
+    node_io = NodeIO(profile="production", cache=cache)
+    with tqdm.tqdm(total=len(filenames)) as pbar:
+        for start in range(0, len(filenames), batch_size):
+            chunk = filenames[start:start + batch_size]
+            # 一批图片只解码一次，两个检测器批量推理
+            detections = node_io.detect_maps([os.path.join(image_dir, f) for f in chunk], batch_size=batch_size)
+            for filename, node_io_map in zip(chunk, detections):
+                pbar.update(1)
+                if node_io_map is None:
+                    continue
+                image_path = os.path.join(image_dir, filename)
+                try:
+                    # 生成可视化路径
+                    vis_save_path = None
+                    if visualize:
+                        image_name = os.path.splitext(filename)[0]
+                        vis_save_path = os.path.join(vis_output_dir, f"{image_name}_visualized.jpg")
                     
-            except Exception as e:
-                print(f"处理图片 {filename} 时出错: {e}")
-    
+                    # 处理图片生成标签，包括可视化
+                    yolo_lines, label_path = process_image_to_yolo_pose(
+                        image_path, output_dir, class_id, visualize, vis_save_path, node_io_map=node_io_map, slots=slots
+                    )
+                        
+                except Exception as e:
+                    print(f"处理图片 {filename} 时出错: {e}")
+    
+    if node_io.cache is not None:
+        print(f"检测缓存: 命中 {node_io.cache_hits}，新检测 {node_io.cache_misses}")
     print(f"\n批量处理完成!")
     print(f"标签文件保存在: {output_dir}")
     if visualize:
@@ -397,6 +456,18 @@ def main():
     parser.add_argument('--batch', '-b', action='store_true',
                        help='批量处理模式（处理目录中的所有图片）')
     
+    parser.add_argument('--batch_size', type=int, default=8,
+                       help='批量处理模式下每批检测的图片数，默认为8')
+
+    parser.add_argument('--no_cache', action='store_true',
+                       help='批量处理模式下不使用检测结果缓存')
+
+    parser.add_argument('--cache_path', default='',
+                       help='检测结果缓存文件路径，默认为 node_connections/.cache/detections.db')
+
+    parser.add_argument('--pose_slots', type=int, default=None,
+                       help='固定关键点布局：每个节点K个输入位+K个输出位（姿态模型 kpt_shape 为 [2K, 3]）')
+    
     args = parser.parse_args()
     
     # 检查输入路径是否存在
@@ -428,7 +499,8 @@ def main():
         if args.visualize:
             print(f"可视化输出目录: {vis_output_dir}")
         
-        batch_process_images(args.image, output_dir, args.class_id, args.visualize, vis_output_dir)
+        batch_process_images(args.image, output_dir, args.class_id, args.visualize, vis_output_dir, args.batch_size,
+                             False if args.no_cache else (args.cache_path or True), args.pose_slots)
         
     else:
         # 单张图片处理
@@ -458,7 +530,7 @@ def main():
             print(f"可视化图片路径: {vis_save_path}")
         
         yolo_lines, label_path = process_image_to_yolo_pose(
-            args.image, output_dir, args.class_id, args.visualize, vis_save_path
+            args.image, output_dir, args.class_id, args.visualize, vis_save_path, slots=args.pose_slots
         )
         
         # 打印结果
@@ -0,0 +1,108 @@
+"""
+连接-组件匹配基准：对比原先逐个组件计算的 find_best_match 与网格索引版本（ComponentIndex）的耗时，并检查匹配结果一致；
+再把连接按组件分组，对比逐个取最佳组件与一对一指派（assign_connections）的重复映射数和总得分
+
+用法: python script/benchmark_convert_connection.py [--components 300] [--connections 600]
+"""
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from node_connections.convert_node_connection import ComponentIndex, assign_connections, calculate_iou, calculate_similarity
+
+NAMES = ["ADC", "DAC", "PLL", "VCO", "LNA", "Mixer", "Filter", "Buffer", "Amplifier", "Comparator",
+         "Reference", "Divider", "Oscillator", "Regulator", "Driver", "Switch", "Memory", "Controller"]
+
+
+def legacy_best_match(target_box, target_name, components, component_details):
+    """原实现：每个连接遍历所有组件，逐个eval组件键、计算IoU和名字相似度"""
+    best_match = None
+    best_score = 0.0
+    for comp_key in components.keys():
+        comp_box = eval(comp_key)
+        if len(target_box) == 0 or len(comp_box) == 0:
+            continue
+        iou = calculate_iou(target_box, comp_box)
+        comp_name = ""
+        if comp_key in component_details:
+            comp_name = component_details[comp_key]["description"]["component_name"]
+        name_sim = calculate_similarity(target_name, comp_name) if target_name and comp_name else 0.0
+        score = iou * 0.7 + name_sim * 0.3
+        if score > best_score and score > 0.1:
+            best_score = score
+            best_match = comp_key
+    return best_match
+
+
+def make_diagram(n_components, n_connections, seed=0, size=4000):
+    """随机生成密集框图：组件框、组件名字，以及带噪声框和名字的连接"""
+    rng = random.Random(seed)
+    components, component_details, boxes = {}, {}, []
+    for i in range(n_components):
+        x, y = rng.randint(0, size), rng.randint(0, size)
+        box = [x, y, x + rng.randint(40, 200), y + rng.randint(30, 120)]
+        key = str(box)
+        name = f"{rng.choice(NAMES)}{i % 7 or ''}"
+        components[key] = {"input": [], "output": [], "name": name}
+        component_details[key] = {"description": {"component_name": name}}
+        boxes.append((box, name))
+    connections = []
+    for _ in range(n_connections):
+        box, name = rng.choice(boxes)
+        jitter = [v + rng.randint(-15, 15) for v in box]
+        if rng.random() < 0.2:
+            jitter = [rng.randint(0, size)] * 2
+            jitter += [jitter[0] + 80, jitter[1] + 60]
+        noisy_name = name if rng.random() < 0.6 else rng.choice(NAMES)
+        connections.append((jitter, noisy_name))
+    return components, component_details, connections
+
+
+def main():
+    parser = argparse.ArgumentParser(description="连接-组件匹配基准")
+    parser.add_argument("--components", type=int, default=300, help="组件数")
+    parser.add_argument("--connections", type=int, default=600, help="连接数")
+    parser.add_argument("--group", type=int, default=4, help="每个组件的连接数（一对一指派的分组大小）")
+    args = parser.parse_args()
+
+    components, component_details, connections = make_diagram(args.components, args.connections)
+
+    start = time.perf_counter()
+    legacy = [legacy_best_match(box, name, components, component_details) for box, name in connections]
+    legacy_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    index = ComponentIndex(components, component_details)
+    indexed = [index.best_match(box, name) for box, name in connections]
+    indexed_ms = (time.perf_counter() - start) * 1000
+
+    same = sum(a == b for a, b in zip(legacy, indexed))
+    print(f"组件 {args.components}，连接 {args.connections}")
+    print(f"原实现: {legacy_ms:.1f}ms，网格索引: {indexed_ms:.1f}ms（含建索引），加速 {legacy_ms / max(indexed_ms, 1e-6):.1f}x")
+    print(f"匹配结果一致: {same}/{len(connections)}")
+
+    groups = [connections[i:i + args.group] for i in range(0, len(connections), args.group)]
+    greedy_dup = 0
+    for i in range(0, len(indexed), args.group):
+        keys = [key for key in indexed[i:i + args.group] if key]
+        greedy_dup += len(keys) - len(set(keys))
+    start = time.perf_counter()
+    assigned, unmatched = [], 0
+    for group in groups:
+        conns = [{"box": str(box), "name": name} for box, name in group]
+        matched, missing = assign_connections(conns, components, component_details, index)
+        assigned.append([conn["box"] for conn in matched])
+        unmatched += len(missing)
+    assign_ms = (time.perf_counter() - start) * 1000
+    assign_dup = sum(len(keys) - len(set(keys)) for keys in assigned)
+    print(f"分组 {len(groups)}（每组 {args.group} 个连接）: 逐个取最佳重复映射 {greedy_dup}，"
+          f"一对一指派重复映射 {assign_dup}、未匹配 {unmatched}，指派耗时 {assign_ms:.1f}ms")
+    sys.exit(0 if same == len(connections) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+JSON提取微基准：对比原先各处使用的正则解析链与 src/json_extract.py 的共用提取器
+
+用法: python script/benchmark_json_extract.py [--repeat 20]
+"""
+import os
+import re
+import sys
+import json
+import time
+import argparse
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.json_extract import extract_json
+
+
+def legacy_extract(content: str):
+    """原 _evaluate_component_pair 中的解析链（代码块 -> 直接解析 -> 贪婪正则 -> 引号修复）"""
+    if "```" in content:
+        match = re.search(r'```(?:json)?\s*([\s\S]*?)\s*```', content)
+        if match:
+            content = match.group(1)
+    try:
+        return json.loads(content)
+    except json.JSONDecodeError:
+        pass
+    match = re.search(r'\{.*\}', content, re.DOTALL)
+    if match:
+        try:
+            return json.loads(match.group(0))
+        except json.JSONDecodeError:
+            pass
+    if content.strip().startswith("{") and "}" in content:
+        try:
+            json_str = content[content.find("{"):content.rfind("}") + 1]
+            json_str = json_str.replace("'", "\"")
+            json_str = re.sub(r'(\w+):', r'"\1":', json_str)
+            return json.loads(json_str)
+        except json.JSONDecodeError:
+            pass
+    return None
+
+
+def make_cases():
+    result = {"component_pair": "[10, 20, 30, 40]", "is_consistent": True, "consistency_score": 92,
+              "score_details": [3, 3, 4, 85.7], "reasoning": "两个模型的输入一致，输出多了一个 {clock} 连接", "right_model": "both"}
+    body = json.dumps(result, ensure_ascii=False, indent=2)
+    prose = "分析过程：模型1认为 {A} 连接到 {B}，模型2认为 [C] 是输入。" * 20
+    return {
+        "纯JSON": (body, result),
+        "代码块+说明": (f"以下是评估结果：\n```json\n{body}\n```\n如有疑问请告知。", result),
+        "前后有括号的说明": (f"{prose}\n{body}\n补充说明：{{见上}}", result),
+        "尾随逗号": (body[:-2] + ",\n}", result),
+        "单引号": (str(result), result),
+        "长输出": (prose * 50 + body + prose * 50, result),
+        "大量未闭合括号": ("{" * 3000 + " 模型输出被截断 " + body, result),
+    }
+
+
+def bench(func, text, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        value = func(text)
+    return (time.perf_counter() - start) / repeat * 1000, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description="JSON提取微基准")
+    parser.add_argument("--repeat", type=int, default=20, help="每个用例重复次数")
+    args = parser.parse_args()
+
+    print(f"{'用例':<14}{'长度':>9}{'正则链(ms)':>12}{'正确':>6}{'提取器(ms)':>12}{'正确':>6}  修复")
+    for name, (text, expected) in make_cases().items():
+        legacy_ms, legacy_value = bench(legacy_extract, text, args.repeat)
+        new_ms, (new_value, info) = bench(lambda t: extract_json(t, expect=dict), text, args.repeat)
+        repairs = f"{info['source']} {','.join(info['repairs'])}" if info else "-"
+        print(f"{name:<14}{len(text):>9}{legacy_ms:>12.3f}{'是' if legacy_value == expected else '否':>6}"
+              f"{new_ms:>12.3f}{'是' if new_value == expected else '否':>6}  {repairs}")
+
+
+if __name__ == "__main__":
+    main()
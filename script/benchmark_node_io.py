@@ -0,0 +1,75 @@
+"""
+NodeIO检测耗时基准：对比默认推理参数（save_json/plots，逐张日志）与 production 推理配置的单张图像耗时
+
+用法: python script/benchmark_node_io.py --image_dir ./images [--count 20] [--batch_size 8] [--pose]
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from node_connections.get_node_io import NodeIO, PoseNodeIO
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+def bench_single(node_io, image_paths, **kwargs):
+    """逐张调用 NodeIO，返回每张图像的耗时（毫秒）"""
+    latencies = []
+    for image_path in image_paths:
+        start = time.perf_counter()
+        node_io(image_path, **kwargs)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def bench_batch(node_io, image_paths, batch_size):
+    start = time.perf_counter()
+    node_io.batch(image_paths, batch_size=batch_size)
+    return (time.perf_counter() - start) * 1000 / max(len(image_paths), 1)
+
+
+def report(name, latencies):
+    print(f"{name:<28}{statistics.mean(latencies):>10.1f}{statistics.median(latencies):>10.1f}{max(latencies):>10.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="NodeIO检测耗时基准")
+    parser.add_argument("--image_dir", type=str, required=True, help="测试图像目录")
+    parser.add_argument("--count", type=int, default=20, help="测试图像数量")
+    parser.add_argument("--batch_size", type=int, default=8, help="批量检测的批大小")
+    parser.add_argument("--pose", action="store_true", help="同时测试单模型（姿态）检测路径")
+    parser.add_argument("--pose_weights", type=str, default="", help="姿态模型权重")
+    args = parser.parse_args()
+
+    image_paths = sorted(os.path.join(args.image_dir, f) for f in os.listdir(args.image_dir)
+                         if f.lower().endswith(IMAGE_EXTENSIONS))[:args.count]
+    if not image_paths:
+        print(f"目录中没有图像: {args.image_dir}")
+        return
+
+    print(f"测试图像: {len(image_paths)} 张")
+    print(f"{'配置':<28}{'平均(ms)':>10}{'中位(ms)':>10}{'最大(ms)':>10}")
+
+    # 原始行为：串行检测、save_json/plots、逐张日志；第一张包含predictor初始化
+    default_io = NodeIO(profile="default", concurrent=False)
+    report("default（串行）", bench_single(default_io, image_paths))
+
+    start = time.perf_counter()
+    production_io = NodeIO(profile="production")
+    print(f"production 初始化（融合+预热）: {(time.perf_counter() - start) * 1000:.0f}ms")
+    report("production（并行）", bench_single(production_io, image_paths))
+    print(f"{'production 批量':<28}{bench_batch(production_io, image_paths, args.batch_size):>10.1f}")
+
+    if args.pose:
+        # 单模型路径：一次推理得到节点和端口，没有端口分配
+        pose_io = PoseNodeIO(profile="production", pose_weights=args.pose_weights)
+        report("pose（单模型）", bench_single(pose_io, image_paths))
+        print(f"{'pose 批量':<28}{bench_batch(pose_io, image_paths, args.batch_size):>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
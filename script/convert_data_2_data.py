@@ -1,7 +1,13 @@
 import json
 import os
+import sys
 from pathlib import Path
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.json_stream import iter_json_records
+from src.box import Box
+
 def convert_component_details_to_test_format(component_details):
     """
     将 component_details 转换为 test.json 格式
@@ -19,7 +25,7 @@ def convert_component_details_to_test_format(component_details):
         
         # 解析边界框坐标
         # box_coord 格式如 "[599, 160, 737, 253]"
-        coords = eval(box_coord)  # 将字符串转换为列表
+        coords = Box.parse(box_coord)  # 将字符串解析为 (x1, y1, x2, y2)
         component_box = [float(coord) for coord in coords]
         
         # 转换连接信息
@@ -72,13 +78,10 @@ def process_model_analysis_file(input_file, output_dir):
     output_path = Path(output_dir)
     output_path.mkdir(parents=True, exist_ok=True)
     
-    # 读取输入文件
-    with open(input_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
     processed_count = 0
     
-    for image_name, image_data in data.items():
+    # 逐条读取输入文件，不一次性载入整个文件
+    for image_name, image_data in iter_json_records(input_file):
         # 检查是否有 component_details
         if 'component_details' not in image_data or not image_data['component_details']:
             print(f"跳过 {image_name}：没有 component_details 数据")
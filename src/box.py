@@ -0,0 +1,151 @@
+import re
+from functools import lru_cache
+from typing import Iterable, List, Optional
+
+# 组件框的统一表示
+# 组件在结果、标注和缓存中以 "[x1, y1, x2, y2]" 字符串作为键（即 str(list)），
+# Box 提供唯一的序列化方式（Box.key）和不执行代码的解析（Box.parse），替代各处的 eval 和正则
+
+# 数字前后不能是字母、数字、下划线或小数点，避免把 "box_2d" 之类的名字或 "1e"、"1.2.3" 的一部分当成坐标；
+# 指数形式（str 对很大或很小的浮点数的输出，如 1e-05）作为一个数整体匹配
+_NUMBER = re.compile(r'(?<![\w.])-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?(?![\w.])')
+
+
+def _coord(value):
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+class Box(tuple):
+    """(x1, y1, x2, y2) 框，不可变、可哈希，可直接用于索引、解包、PIL绘图和JSON序列化"""
+
+    __slots__ = ()
+
+    def __new__(cls, x1, y1, x2, y2):
+        return tuple.__new__(cls, (_coord(x1), _coord(y1), _coord(x2), _coord(y2)))
+
+    @classmethod
+    def parse(cls, value, strict: bool = True) -> "Box":
+        """解析框，失败时抛出 ValueError
+
+        支持 Box、4个数的列表/元组，以及字符串 "[x1, y1, x2, y2]"、"(x1,y1,x2,y2)"、
+        "<|box_start|>(x1,y1),(x2,y2)<|box_end|>"。strict 时字符串中必须恰好有4个数，
+        否则取前4个数（用于模型输出中夹带其他文字的情况）。
+        """
+        if isinstance(value, Box):
+            return value
+        if isinstance(value, str):
+            return _parse_string(value, strict)
+        if isinstance(value, (list, tuple)) and len(value) == 4:
+            try:
+                return cls(*value)
+            except (TypeError, ValueError):
+                pass
+        raise ValueError(f"无法解析的框: {value!r}")
+
+    @property
+    def key(self) -> str:
+        """规范的字符串形式 "[x1, y1, x2, y2]"，与 str(list) 相同"""
+        return str(list(self))
+
+    def __str__(self) -> str:
+        return self.key
+
+    def __repr__(self) -> str:
+        return f"Box{tuple.__repr__(self)}"
+
+    x1 = property(lambda self: self[0])
+    y1 = property(lambda self: self[1])
+    x2 = property(lambda self: self[2])
+    y2 = property(lambda self: self[3])
+
+    @property
+    def width(self):
+        return self[2] - self[0]
+
+    @property
+    def height(self):
+        return self[3] - self[1]
+
+    @property
+    def area(self):
+        return max(self.width, 0) * max(self.height, 0)
+
+    @property
+    def center(self):
+        return (self[0] + self[2]) / 2, (self[1] + self[3]) / 2
+
+    def iou(self, other) -> float:
+        w = min(self[2], other[2]) - max(self[0], other[0])
+        h = min(self[3], other[3]) - max(self[1], other[1])
+        if w <= 0 or h <= 0:
+            return 0.0
+        inter = w * h
+        union = self.area + (other[2] - other[0]) * (other[3] - other[1]) - inter
+        return inter / union if union > 0 else 0.0
+
+    def to_list(self) -> list:
+        return list(self)
+
+
+@lru_cache(maxsize=65536)
+def _parse_string(text: str, strict: bool) -> Box:
+    numbers = _NUMBER.findall(text)
+    if len(numbers) < 4 or (strict and len(numbers) != 4):
+        raise ValueError(f"无法解析的框: {text!r}")
+    return Box(*numbers[:4])
+
+
+def parse_box(value, strict: bool = True) -> Optional[Box]:
+    """解析框，失败时返回 None"""
+    try:
+        return Box.parse(value, strict)
+    except ValueError:
+        return None
+
+
+def box_key(value) -> str:
+    """任意形式的框转为规范的键字符串"""
+    return Box.parse(value).key
+
+
+class Component:
+    """检测得到的组件：节点框和分配给它的输入/输出端口框
+
+    对应 node_io_map 中的一项 {"[x1, y1, x2, y2]": {"input": [[...], ...], "output": [...]}}
+    """
+
+    __slots__ = ("box", "inputs", "outputs", "name")
+
+    def __init__(self, box, inputs: Iterable = (), outputs: Iterable = (), name: str = ""):
+        self.box = Box.parse(box)
+        self.inputs = [Box.parse(b) for b in inputs]
+        self.outputs = [Box.parse(b) for b in outputs]
+        self.name = name
+
+    @property
+    def key(self) -> str:
+        return self.box.key
+
+    @classmethod
+    def from_entry(cls, key: str, value: dict) -> "Component":
+        value = value or {}
+        return cls(key, value.get("input", []), value.get("output", []), value.get("name", ""))
+
+    def to_entry(self) -> dict:
+        entry = {"input": [b.to_list() for b in self.inputs], "output": [b.to_list() for b in self.outputs]}
+        if self.name:
+            entry["name"] = self.name
+        return entry
+
+    def __repr__(self) -> str:
+        return f"Component({self.key}, inputs={len(self.inputs)}, outputs={len(self.outputs)}, name={self.name!r})"
+
+
+def components_from_map(node_io_map: dict) -> List[Component]:
+    """node_io_map（或带 name 的 components 字典）转为 Component 列表"""
+    return [Component.from_entry(key, value) for key, value in node_io_map.items()]
+
+
+def components_to_map(components: Iterable[Component]) -> dict:
+    return {component.key: component.to_entry() for component in components}
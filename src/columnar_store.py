@@ -0,0 +1,362 @@
+import os
+import sys
+import json
+import argparse
+from typing import Dict, List, Tuple
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pc = pq = None
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.json_stream import iter_json_records
+from src.component_compare import parse_connections, canonical_name, DIRECTION_KEYS
+
+# 结果文件拆分成的四张规范化表
+#   images:      每张图像一行（组件数、整图评估结果）
+#   components:  每个组件、每个模型一行（描述格式、IO匹配、标注、各方向连接数）
+#   connections: 每条连接一行
+#   evaluations: 每个组件对的一致性评估一行
+TABLES = ("images", "components", "connections", "evaluations")
+
+# 与JSON文件签名一起写入输出目录，用于判断列式结果是否过期
+SOURCE_FILE = "_source.json"
+
+
+def _schemas() -> Dict[str, "pa.Schema"]:
+    return {
+        "images": pa.schema([
+            ("image_id", pa.string()),
+            ("component_count", pa.int32()),
+            ("overall_score", pa.float64()),
+            ("overall_consistent", pa.bool_()),
+            ("consistent_count", pa.int32()),
+            ("engine", pa.string()),
+        ]),
+        "components": pa.schema([
+            ("image_id", pa.string()),
+            ("component", pa.string()),
+            ("model", pa.string()),
+            ("is_json", pa.bool_()),
+            ("has_error", pa.bool_()),
+            ("warning", pa.string()),
+            ("io_num_match", pa.bool_()),
+            ("label", pa.string()),
+            ("input_count", pa.int32()),
+            ("output_count", pa.int32()),
+            ("bidirectional_count", pa.int32()),
+        ]),
+        "connections": pa.schema([
+            ("image_id", pa.string()),
+            ("component", pa.string()),
+            ("model", pa.string()),
+            ("direction", pa.string()),
+            ("name", pa.string()),
+            ("canonical_name", pa.string()),
+        ]),
+        "evaluations": pa.schema([
+            ("image_id", pa.string()),
+            ("component", pa.string()),
+            ("consistency_score", pa.float64()),
+            ("is_consistent", pa.bool_()),
+            ("right_model", pa.string()),
+            ("fast_path", pa.bool_()),
+            ("engine", pa.string()),
+        ]),
+    }
+
+
+def _require_pyarrow() -> None:
+    if pa is None:
+        raise ImportError("列式结果需要 pyarrow，请先安装: pip install pyarrow")
+
+
+def _model_entries(detail: Dict) -> List[Tuple[str, Dict]]:
+    """组件详情中各模型的结果；节点连接结果没有按模型分层，模型名记为空字符串"""
+    if "description" in detail:
+        return [("", detail)]
+    return [(k, v) for k, v in detail.items() if k != "eval_result" and isinstance(v, dict)]
+
+
+def _is_json_description(description) -> bool:
+    if isinstance(description, (dict, list)):
+        return True
+    if not isinstance(description, str):
+        return False
+    try:
+        json.loads(description)
+        return True
+    except (json.JSONDecodeError, ValueError):
+        return False
+
+
+def _number(value):
+    return float(value) if isinstance(value, (int, float)) and not isinstance(value, bool) else None
+
+
+def _bool(value):
+    return value if isinstance(value, bool) else None
+
+
+def flatten_record(image_id: str, record: Dict) -> Dict[str, List[Dict]]:
+    """把单张图像的记录拆分成四张表的行"""
+    rows = {name: [] for name in TABLES}
+    component_details = record.get("component_details", {}) or {}
+    total_eval = record.get("total_eval_result", {}) or {}
+    rows["images"].append({
+        "image_id": image_id,
+        "component_count": len(component_details),
+        "overall_score": _number(total_eval.get("overall_score")),
+        "overall_consistent": _bool(total_eval.get("overall_consistent")),
+        "consistent_count": total_eval.get("consistent_count") if isinstance(total_eval.get("consistent_count"), int) else None,
+        "engine": total_eval.get("engine", "llm" if total_eval else None),
+    })
+
+    # 图结构引擎的组件结果只保存在 total_eval_result 中
+    graph_results = {r.get("component_pair"): r for r in total_eval.get("component_results", []) if isinstance(r, dict)}
+
+    for component, detail in component_details.items():
+        if not isinstance(detail, dict):
+            continue
+        for model, entry in _model_entries(detail):
+            connections = parse_connections(entry) or {}
+            rows["components"].append({
+                "image_id": image_id,
+                "component": component,
+                "model": model,
+                "is_json": _is_json_description(entry.get("description")),
+                "has_error": "error" in entry,
+                "warning": entry.get("warning"),
+                "io_num_match": _bool(entry.get("io_num_match")),
+                "label": entry.get("label"),
+                "input_count": len(connections.get("input", [])),
+                "output_count": len(connections.get("output", [])),
+                "bidirectional_count": len(connections.get("bidirectional", [])),
+            })
+            for direction in DIRECTION_KEYS:
+                for name in connections.get(direction, []):
+                    rows["connections"].append({
+                        "image_id": image_id,
+                        "component": component,
+                        "model": model,
+                        "direction": direction,
+                        "name": str(name),
+                        "canonical_name": canonical_name(name),
+                    })
+
+        eval_result = detail.get("eval_result") or graph_results.get(component)
+        if isinstance(eval_result, dict) and eval_result:
+            rows["evaluations"].append({
+                "image_id": image_id,
+                "component": component,
+                "consistency_score": _number(eval_result.get("consistency_score")),
+                "is_consistent": _bool(eval_result.get("is_consistent")),
+                "right_model": eval_result.get("right_model"),
+                "fast_path": bool(eval_result.get("fast_path", False)),
+                "engine": eval_result.get("engine", "llm"),
+            })
+    return rows
+
+
+def default_columnar_dir(json_path: str) -> str:
+    """JSON结果文件对应的列式结果目录，如 results/model_analysis_columnar"""
+    return os.path.splitext(json_path)[0] + "_columnar"
+
+
+def _file_signature(path: str) -> list:
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+def is_up_to_date(json_path: str, output_dir: str = "") -> bool:
+    """列式结果是否由当前版本的JSON文件导出"""
+    output_dir = output_dir or default_columnar_dir(json_path)
+    try:
+        with open(os.path.join(output_dir, SOURCE_FILE), 'r', encoding='utf-8') as f:
+            source = json.load(f)
+        return source.get("signature") == _file_signature(json_path)
+    except (OSError, json.JSONDecodeError):
+        return False
+
+
+class ColumnarWriter:
+    """把 {image_id: record} 结果按行组增量写成Parquet表
+
+    Args:
+        output_dir: 输出目录，每张表一个 <table>.parquet 文件
+        row_group_size: 每张表缓冲多少行后写出一个行组
+    """
+
+    def __init__(self, output_dir: str, row_group_size: int = 50000):
+        _require_pyarrow()
+        self.output_dir = output_dir
+        self.row_group_size = row_group_size
+        self.schemas = _schemas()
+        self._buffers = {name: [] for name in TABLES}
+        self._writers = {}
+        self.row_counts = {name: 0 for name in TABLES}
+
+    def __enter__(self) -> "ColumnarWriter":
+        os.makedirs(self.output_dir, exist_ok=True)
+        for name in TABLES:
+            self._writers[name] = pq.ParquetWriter(os.path.join(self.output_dir, f"{name}.parquet.tmp"), self.schemas[name])
+        return self
+
+    def write(self, image_id: str, record: Dict) -> None:
+        for name, rows in flatten_record(image_id, record).items():
+            self._buffers[name].extend(rows)
+            if len(self._buffers[name]) >= self.row_group_size:
+                self._flush(name)
+
+    def _flush(self, name: str) -> None:
+        rows = self._buffers[name]
+        if not rows:
+            return
+        self._writers[name].write_table(pa.Table.from_pylist(rows, schema=self.schemas[name]))
+        self.row_counts[name] += len(rows)
+        self._buffers[name] = []
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        for name in TABLES:
+            if exc_type is None:
+                self._flush(name)
+            self._writers[name].close()
+            tmp_path = os.path.join(self.output_dir, f"{name}.parquet.tmp")
+            if exc_type is None:
+                os.replace(tmp_path, os.path.join(self.output_dir, f"{name}.parquet"))
+            else:
+                os.remove(tmp_path)
+
+
+def export_results(json_path: str, output_dir: str = "") -> str:
+    """流式读取JSON结果文件并导出为列式表，返回输出目录"""
+    output_dir = output_dir or default_columnar_dir(json_path)
+    signature = _file_signature(json_path)
+    with ColumnarWriter(output_dir) as writer:
+        for image_id, record in iter_json_records(json_path):
+            writer.write(image_id, record)
+    with open(os.path.join(output_dir, SOURCE_FILE), 'w', encoding='utf-8') as f:
+        json.dump({"path": os.path.abspath(json_path), "signature": signature, "row_counts": writer.row_counts},
+                  f, ensure_ascii=False, indent=2)
+    print(f"列式结果已导出到 {output_dir}: " + ", ".join(f"{k} {v}行" for k, v in writer.row_counts.items()))
+    return output_dir
+
+
+class ResultQuery:
+    """列式结果上的常用统计，全部按列向量化计算"""
+
+    def __init__(self, output_dir: str):
+        _require_pyarrow()
+        self.output_dir = output_dir
+        self._tables = {}
+
+    def table(self, name: str) -> "pa.Table":
+        """读取一张表（按需加载并缓存）"""
+        if name not in self._tables:
+            self._tables[name] = pq.read_table(os.path.join(self.output_dir, f"{name}.parquet"))
+        return self._tables[name]
+
+    @staticmethod
+    def _as_int(array) -> "pa.Array":
+        return pc.cast(pc.fill_null(array, False), pa.int64())
+
+    def summary(self) -> Dict:
+        """整体一致性统计，字段与 component_consistency_stats.json 一致"""
+        images = self.table("images")
+        evaluations = self.table("evaluations")
+        total_components = evaluations.num_rows
+        consistent_components = pc.sum(self._as_int(evaluations["is_consistent"])).as_py() or 0
+        consistent_images = pc.sum(self._as_int(images["overall_consistent"])).as_py() or 0
+        evaluated_images = images.num_rows - images["overall_score"].null_count
+        return {
+            "total_images": images.num_rows,
+            "consistent_images": consistent_images,
+            "inconsistent_images": evaluated_images - consistent_images,
+            "image_consistency_rate": consistent_images / evaluated_images if evaluated_images else 0,
+            "total_components": total_components,
+            "consistent_components": consistent_components,
+            "component_consistency_rate": consistent_components / total_components if total_components else 0,
+            "average_consistency_score": pc.mean(evaluations["consistency_score"]).as_py() or 0,
+        }
+
+    def image_stats(self) -> List[Dict]:
+        """每张图像的组件数、JSON格式正确数和IO匹配数，按图像名排序"""
+        components = self.table("components")
+        flags = pa.table({
+            "image_id": components["image_id"],
+            "json_format_correct": self._as_int(pc.equal(components["warning"], "JSON格式正确")),
+            "io_matches": self._as_int(components["io_num_match"]),
+        })
+        counts = flags.group_by("image_id").aggregate([("json_format_correct", "sum"), ("io_matches", "sum")])
+        images = self.table("images").select(["image_id", "component_count"])
+        joined = images.join(counts, keys="image_id", join_type="left outer").sort_by("image_id")
+        return [{
+            "name": row["image_id"],
+            "total_components": row["component_count"],
+            "json_format_correct": row["json_format_correct_sum"] or 0,
+            "io_matches": row["io_matches_sum"] or 0,
+        } for row in joined.to_pylist()]
+
+    def model_stats(self) -> List[Dict]:
+        """按模型统计描述为JSON的比例、出错比例、IO匹配比例和平均连接数"""
+        components = self.table("components")
+        metrics = pa.table({
+            "model": components["model"],
+            "is_json": self._as_int(components["is_json"]),
+            "has_error": self._as_int(components["has_error"]),
+            "io_num_match": self._as_int(components["io_num_match"]),
+            "connections": pc.add(pc.add(components["input_count"], components["output_count"]),
+                                  components["bidirectional_count"]),
+        })
+        grouped = metrics.group_by("model").aggregate([
+            ("is_json", "count"), ("is_json", "mean"), ("has_error", "mean"),
+            ("io_num_match", "mean"), ("connections", "mean")
+        ]).sort_by("model")
+        return [{
+            "model": row["model"],
+            "components": row["is_json_count"],
+            "json_rate": row["is_json_mean"],
+            "error_rate": row["has_error_mean"],
+            "io_match_rate": row["io_num_match_mean"],
+            "average_connections": row["connections_mean"],
+        } for row in grouped.to_pylist()]
+
+    def by_component_count(self) -> List[Dict]:
+        """按图像组件数统计组件一致率和平均分"""
+        evaluations = self.table("evaluations").select(["image_id", "consistency_score", "is_consistent"])
+        joined = evaluations.join(self.table("images").select(["image_id", "component_count"]), keys="image_id")
+        metrics = pa.table({
+            "component_count": joined["component_count"],
+            "consistency_score": joined["consistency_score"],
+            "is_consistent": self._as_int(joined["is_consistent"]),
+        })
+        grouped = metrics.group_by("component_count").aggregate([
+            ("is_consistent", "count"), ("is_consistent", "mean"), ("consistency_score", "mean")
+        ]).sort_by("component_count")
+        return [{
+            "component_count": row["component_count"],
+            "evaluated_components": row["is_consistent_count"],
+            "consistency_rate": row["is_consistent_mean"],
+            "average_consistency_score": row["consistency_score_mean"],
+        } for row in grouped.to_pylist()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="把结果JSON导出为列式表（Parquet）并打印统计")
+    parser.add_argument("--input_file", type=str, required=True, help="model_analysis.json 或 component_consistency_results.json")
+    parser.add_argument("--output_dir", type=str, default="", help="输出目录，默认为 <输入文件名>_columnar")
+    args = parser.parse_args()
+
+    output_dir = export_results(args.input_file, args.output_dir)
+    query = ResultQuery(output_dir)
+    print(json.dumps(query.summary(), ensure_ascii=False, indent=2))
+    for row in query.model_stats():
+        print(row)
+
+
+if __name__ == "__main__":
+    main()
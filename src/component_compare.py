@@ -0,0 +1,171 @@
+import re
+import unicodedata
+from typing import Dict, List, Optional
+
+from src.json_extract import extract_json
+
+# 连接方向的同义字段
+DIRECTION_KEYS = {
+    "input": ("input", "inputs"),
+    "output": ("output", "outputs"),
+    "bidirectional": ("bidirectional", "inout", "bidirectionals"),
+}
+
+# 常见的连接名称别名，规范化后再比较
+NAME_ALIASES = {
+    "gnd": "ground",
+    "vss": "ground",
+    "vcc": "power",
+    "vdd": "power",
+    "clk": "clock",
+    "rst": "reset",
+    "unnamed connection": "",
+    "unnamed": "",
+    "未命名连接": "",
+}
+
+# markdown格式描述中的分节标题，如 "* **Inputs**:"
+_SECTION_PATTERN = re.compile(r'^\s*[\*\-]?\s*\*{0,2}\s*(inputs?|outputs?|bidirectional|inout)\b', re.IGNORECASE)
+_ITEM_PATTERN = re.compile(r'^\s+[\*\-]\s+(.+)$')
+
+
+def canonical_name(name) -> str:
+    """规范化连接名称：全半角、大小写、空白和下划线统一，并应用常见别名"""
+    if isinstance(name, dict):
+        name = name.get("name", "")
+    if not isinstance(name, str):
+        name = str(name)
+    name = unicodedata.normalize("NFKC", name).lower()
+    name = name.replace("*", "").replace("`", "")
+    name = re.sub(r'[\s_\-]+', ' ', name).strip(" .:;,\"'")
+    return NAME_ALIASES.get(name, name)
+
+
+def _section_direction(title: str) -> str:
+    title = title.lower()
+    if title.startswith("input"):
+        return "input"
+    if title.startswith("output"):
+        return "output"
+    return "bidirectional"
+
+
+def _parse_markdown(text: str) -> Optional[Dict[str, List[str]]]:
+    """解析 "* **Inputs**:\n    * ADC:描述" 格式的连接描述"""
+    connections = {key: [] for key in DIRECTION_KEYS}
+    current = None
+    found = False
+    for line in text.splitlines():
+        item = _ITEM_PATTERN.match(line)
+        if item and current:
+            connections[current].append(item.group(1).split(":", 1)[0])
+            continue
+        section = _SECTION_PATTERN.match(line)
+        if section:
+            current = _section_direction(section.group(1))
+            found = True
+    return connections if found else None
+
+
+def parse_connections(details) -> Optional[Dict[str, List[str]]]:
+    """从单个模型的组件详情中提取各方向的连接名称列表，无法解析时返回None"""
+    if not isinstance(details, dict) or "error" in details:
+        return None
+    description = details.get("description")
+    if isinstance(description, str):
+        parsed, _ = extract_json(description, expect=dict)
+        if parsed is None:
+            return _parse_markdown(description)
+        description = parsed
+    if not isinstance(description, dict):
+        return None
+
+    source = description.get("connections", description)
+    if not isinstance(source, dict):
+        return None
+    connections = {}
+    for direction, keys in DIRECTION_KEYS.items():
+        items = next((source[k] for k in keys if k in source), [])
+        if not isinstance(items, list):
+            return None
+        connections[direction] = [item.get("name", "") if isinstance(item, dict) else item for item in items]
+    return connections
+
+
+def _multiset_overlap(names1: List[str], names2: List[str]) -> int:
+    remaining = list(names2)
+    overlap = 0
+    for name in names1:
+        if name in remaining:
+            remaining.remove(name)
+            overlap += 1
+    return overlap
+
+
+class ComponentComparator:
+    """本地确定性组件对比较器
+
+    在调用评估模型前，对两个模型的连接描述做规范化后的集合比较：
+    完全一致或明显不相交的组件对直接给出分数，只有中间地带才交给评估模型。
+    """
+
+    def __init__(self, mismatch_score: float = 0.0):
+        # 两个模型的连接名称完全不相交时判定为明显不一致，直接记该分数
+        self.mismatch_score = mismatch_score
+        self.stats = {"exact_match": 0, "clear_mismatch": 0, "sent_to_evaluator": 0}
+
+    def compare(self, component: str, model1_details: Dict, model2_details: Dict) -> Optional[Dict]:
+        """比较一对组件，能本地判定时返回与评估模型相同结构的结果，否则返回None"""
+        connections1 = parse_connections(model1_details)
+        connections2 = parse_connections(model2_details)
+        if connections1 is None or connections2 is None:
+            self.stats["sent_to_evaluator"] += 1
+            return None
+
+        names1 = {d: [canonical_name(n) for n in connections1[d]] for d in DIRECTION_KEYS}
+        names2 = {d: [canonical_name(n) for n in connections2[d]] for d in DIRECTION_KEYS}
+        total1 = sum(len(v) for v in names1.values())
+        total2 = sum(len(v) for v in names2.values())
+        # 两边都没有连接时交给评估模型结合图像判断
+        if total1 == 0 or total2 == 0:
+            self.stats["sent_to_evaluator"] += 1
+            return None
+
+        consistent = sum(_multiset_overlap(names1[d], names2[d]) for d in DIRECTION_KEYS)
+        base_score = 100 * 2 * consistent / (total1 + total2)
+        all1 = [n for v in names1.values() for n in v]
+        all2 = [n for v in names2.values() for n in v]
+        # 未命名的连接无法通过名称比较，不参与快速判定
+        has_unnamed = "" in all1 or "" in all2
+
+        if base_score == 100 and not has_unnamed:
+            self.stats["exact_match"] += 1
+            return self._result(component, True, 100, [consistent, total1, total2, base_score],
+                                "本地规则判定：规范化后两个模型各方向的连接完全相同", "both")
+        if _multiset_overlap(all1, all2) == 0 and not has_unnamed:
+            self.stats["clear_mismatch"] += 1
+            return self._result(component, False, self.mismatch_score, [consistent, total1, total2, base_score],
+                                "本地规则判定：规范化后两个模型的连接名称没有任何交集", "")
+
+        self.stats["sent_to_evaluator"] += 1
+        return None
+
+    @staticmethod
+    def _result(component: str, is_consistent: bool, score: float, score_details: List,
+                reasoning: str, right_model: str) -> Dict:
+        return {
+            "component_pair": component,
+            "is_consistent": is_consistent,
+            "consistency_score": score,
+            "score_details": score_details,
+            "reasoning": reasoning,
+            "right_model": right_model,
+            "fast_path": True
+        }
+
+    def summary(self) -> str:
+        """调用节省情况汇总"""
+        avoided = self.stats["exact_match"] + self.stats["clear_mismatch"]
+        total = avoided + self.stats["sent_to_evaluator"]
+        return (f"本地快速判定: 完全一致 {self.stats['exact_match']}，明显不一致 {self.stats['clear_mismatch']}，"
+                f"送评估模型 {self.stats['sent_to_evaluator']}，节省 {avoided}/{total} 次评估调用")
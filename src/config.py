@@ -10,6 +10,8 @@ class Config:
         self.image_root_dir = kwargs.get('image_root_dir', '')
         self.prompts_path = kwargs.get('prompts_path', '')
         self.output_dir = kwargs.get('output_dir', '')
+        # 可选的图像清单文件，避免每次启动遍历大目录
+        self.image_manifest = kwargs.get('image_manifest', '')
 
         self.old_results_path = kwargs.get('old_results_path', '')
         self.rerun = kwargs.get('rerun', False)
@@ -29,7 +31,62 @@ class Config:
         
         # 并发与生成参数
         self.num_workers = kwargs.get('num_workers', 4)
+        # 第二步中所有图像共享的评估模型最大并发请求数
+        self.evaluator_workers = kwargs.get('evaluator_workers', 16)
         self.temperature = kwargs.get('temperature', 0.1)
         self.max_tokens = kwargs.get('max_tokens', 2048)
+        # 结构化输出：按提示词类型把JSON schema传给服务端（auto / guided_json / json_schema / off）
+        self.structured_output = kwargs.get('structured_output', 'auto')
 
         self.node_sample_rate = kwargs.get('node_sample_rate', 0.5)
+        # 节点/端口检测每批处理的图像数（node_connections 分析器批量预取检测结果）
+        self.detect_batch_size = kwargs.get('detect_batch_size', 8)
+        # 检测进程数（每个进程加载一次模型），0表示在当前进程的单独线程中检测
+        self.detect_workers = kwargs.get('detect_workers', 1)
+        # 检测推理配置：production 不写 runs/ 产物、不输出日志、融合模型层并预热；default 为原始行为
+        self.detect_profile = kwargs.get('detect_profile', 'production')
+        # 检测推理后端：torch / onnx / openvino（需先运行 node_connections/det_backend.py 导出），线程数0为后端默认
+        self.detect_backend = kwargs.get('detect_backend', 'torch')
+        self.detect_threads = kwargs.get('detect_threads', 0)
+        self.detect_int8 = kwargs.get('detect_int8', False)
+        # 检测结果缓存：按图像内容哈希和权重哈希缓存 node_io_map，路径为空时使用 node_connections/.cache/detections.db
+        self.detect_cache = kwargs.get('detect_cache', True)
+        self.detect_cache_path = kwargs.get('detect_cache_path', '')
+        # 切片检测：像素数（宽x高）超过阈值的大图切成重叠图块检测后跨图块合并，0表示不切片
+        self.detect_tile_pixels = kwargs.get('detect_tile_pixels', 2048 * 2048)
+        self.detect_tile_size = kwargs.get('detect_tile_size', 1024)
+        # 检测路径：two_stage 节点检测+端口检测+端口分配；pose 单个姿态模型同时输出节点框和端口关键点
+        self.detect_model = kwargs.get('detect_model', 'two_stage')
+        self.detect_pose_weights = kwargs.get('detect_pose_weights', '')
+
+        # 优雅退出：收到SIGINT/SIGTERM后等待在途请求完成的最长秒数
+        self.drain_timeout = kwargs.get('drain_timeout', 60.0)
+
+        # 流水线模式：第一步每完成一张图像即送入第二步评估
+        self.pipeline = kwargs.get('pipeline', False)
+        # 流水线队列容量：第二步积压这么多张图像时第一步暂停推送，限制内存占用；0表示不限
+        self.pipeline_queue_size = kwargs.get('pipeline_queue_size', 16)
+
+        # 第二步本地快速比较：连接完全一致或明显不相交的组件对不再调用评估模型
+        self.fast_path_compare = kwargs.get('fast_path_compare', False)
+        self.fast_path_mismatch_score = kwargs.get('fast_path_mismatch_score', 0.0)
+
+        # 第二步批量评估：每次请求最多打包的组件对数量，1表示逐个评估
+        self.eval_batch_size = kwargs.get('eval_batch_size', 1)
+
+        # 第二步评估引擎：llm（评估模型）或 graph（本地图结构评分）
+        self.eval_engine = kwargs.get('eval_engine', 'llm')
+
+        # 第二步抽样模式：随机抽取组件估计一致率，置信区间半宽达到目标即停止
+        self.sampling_mode = kwargs.get('sampling_mode', False)
+        self.sampling_half_width = kwargs.get('sampling_half_width', 0.03)
+        self.sampling_confidence = kwargs.get('sampling_confidence', 0.95)
+        self.sampling_min_samples = kwargs.get('sampling_min_samples', 30)
+        self.sampling_stratify = kwargs.get('sampling_stratify', False)
+        self.sampling_seed = kwargs.get('sampling_seed', 0)
+
+        # 第二步完成后把评估结果导出为列式表（Parquet），需要安装pyarrow
+        self.columnar_export = kwargs.get('columnar_export', False)
+
+        # 结果库模式：结果逐张写入与JSON文件同名的SQLite库（WAL），JSON只在结束时导出
+        self.result_db = kwargs.get('result_db', False)
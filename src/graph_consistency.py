@@ -0,0 +1,199 @@
+import os
+import sys
+import json
+import argparse
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.component_compare import parse_connections, canonical_name
+
+
+class GraphConsistencyScorer:
+    """基于连接图结构的一致性评分（不调用评估模型）
+
+    为每个模型从 component_details 构建连接图：节点为组件，输入/输出为有向边，
+    双向连接为无向边。在同一节点编号下对两个模型的邻接矩阵做向量化比较，
+    给出逐组件和整图的边精确率/召回率、度一致性以及近似图编辑距离。
+    """
+
+    def __init__(self, consistent_threshold: float = 85, with_ged: bool = True):
+        self.consistent_threshold = consistent_threshold
+        self.with_ged = with_ged
+
+    @staticmethod
+    def _model_names(component_details: Dict) -> List[str]:
+        for details in component_details.values():
+            names = [k for k in details.keys() if k != "eval_result"]
+            if len(names) >= 2:
+                return names[:2]
+        return []
+
+    def _build_graphs(self, component_details: Dict, model_names: List[str]) -> Tuple[List[str], List[str], List[np.ndarray], List[np.ndarray]]:
+        """构建两个模型的有向邻接矩阵和无向邻接矩阵，返回(节点, 被评估组件, 有向矩阵, 无向矩阵)"""
+        components = list(component_details.keys())
+        edges = [[], []]
+        nodes = {canonical_name(c): None for c in components}
+        for component in components:
+            source = canonical_name(component)
+            for m, model_name in enumerate(model_names):
+                connections = parse_connections(component_details[component].get(model_name)) or {}
+                for name in connections.get("input", []):
+                    target = canonical_name(name)
+                    nodes.setdefault(target, None)
+                    edges[m].append((target, source, False))
+                for name in connections.get("output", []):
+                    target = canonical_name(name)
+                    nodes.setdefault(target, None)
+                    edges[m].append((source, target, False))
+                for name in connections.get("bidirectional", []):
+                    target = canonical_name(name)
+                    nodes.setdefault(target, None)
+                    edges[m].append((source, target, True))
+
+        node_list = list(nodes.keys())
+        index = {name: i for i, name in enumerate(node_list)}
+        n = len(node_list)
+        directed, undirected = [], []
+        for m in range(2):
+            d = np.zeros((n, n), dtype=bool)
+            u = np.zeros((n, n), dtype=bool)
+            for a, b, bidirectional in edges[m]:
+                if bidirectional:
+                    u[index[a], index[b]] = u[index[b], index[a]] = True
+                else:
+                    d[index[a], index[b]] = True
+            directed.append(d)
+            undirected.append(u)
+        return node_list, [canonical_name(c) for c in components], directed, undirected
+
+    @staticmethod
+    def _incident(d: np.ndarray, u: np.ndarray) -> np.ndarray:
+        """每个节点关联的边数（有向边计入两端，无向边计一次）"""
+        return d.sum(axis=1) + d.sum(axis=0) - np.diag(d) + u.sum(axis=1)
+
+    @staticmethod
+    def _prf(tp, e1, e2):
+        """以模型1为参照的精确率、召回率和F1，两边都没有边时记为完全一致"""
+        tp, e1, e2 = np.asarray(tp, float), np.asarray(e1, float), np.asarray(e2, float)
+        empty = (e1 == 0) & (e2 == 0)
+        precision = np.where(e2 > 0, tp / np.maximum(e2, 1), empty.astype(float))
+        recall = np.where(e1 > 0, tp / np.maximum(e1, 1), empty.astype(float))
+        f1 = np.where(precision + recall > 0, 2 * precision * recall / np.maximum(precision + recall, 1e-12), 0.0)
+        return precision, recall, f1
+
+    def score_image(self, model_analysis: Dict) -> Dict:
+        """对单张图像评分，返回与组件级评估相同结构的汇总结果"""
+        component_details = model_analysis.get("component_details", {})
+        model_names = self._model_names(component_details)
+        if not component_details or len(model_names) < 2:
+            return {
+                "overall_consistent": False,
+                "component_count": 0,
+                "component_results": [],
+                "reason": "缺少两个模型的组件分析结果",
+                "engine": "graph"
+            }
+
+        node_list, components, (d1, d2), (u1, u2) = self._build_graphs(component_details, model_names)
+        index = {name: i for i, name in enumerate(node_list)}
+        rows = np.array([index[c] for c in components])
+
+        # 逐组件：关联边的匹配情况
+        tp_inc = self._incident(d1 & d2, u1 & u2)[rows]
+        e1_inc = self._incident(d1, u1)[rows]
+        e2_inc = self._incident(d2, u2)[rows]
+        precision, recall, f1 = self._prf(tp_inc, e1_inc, e2_inc)
+
+        # 逐组件：入度/出度/双向度一致性
+        degrees1 = np.stack([d1.sum(axis=0), d1.sum(axis=1), u1.sum(axis=1)])[:, rows]
+        degrees2 = np.stack([d2.sum(axis=0), d2.sum(axis=1), u2.sum(axis=1)])[:, rows]
+        degree_agreement = 1 - (np.abs(degrees1 - degrees2) / np.maximum(np.maximum(degrees1, degrees2), 1)).mean(axis=0)
+
+        # 整图：边匹配和度一致性
+        tp_all = (d1 & d2).sum() + np.triu(u1 & u2).sum()
+        e1_all = d1.sum() + np.triu(u1).sum()
+        e2_all = d2.sum() + np.triu(u2).sum()
+        precision_all, recall_all, f1_all = self._prf(tp_all, e1_all, e2_all)
+
+        component_results = []
+        for i, component in enumerate(component_details.keys()):
+            score = round(float(f1[i]) * 100, 2)
+            component_results.append({
+                "component_pair": component,
+                "is_consistent": score >= self.consistent_threshold,
+                "consistency_score": score,
+                "score_details": [int(tp_inc[i]), int(e1_inc[i]), int(e2_inc[i]), score],
+                "edge_precision": round(float(precision[i]), 4),
+                "edge_recall": round(float(recall[i]), 4),
+                "degree_agreement": round(float(degree_agreement[i]), 4),
+                "reasoning": "图结构评分：按关联边的F1计算",
+                "engine": "graph"
+            })
+
+        consistent_count = sum(1 for r in component_results if r["consistency_score"] >= self.consistent_threshold)
+        result = {
+            "overall_consistent": consistent_count / len(component_results) >= 0.75,
+            "overall_score": float(np.mean([r["consistency_score"] for r in component_results])),
+            "component_count": len(component_results),
+            "consistent_count": consistent_count,
+            "component_results": component_results,
+            "graph_metrics": {
+                "models": model_names,
+                "edge_precision": round(float(precision_all), 4),
+                "edge_recall": round(float(recall_all), 4),
+                "edge_f1": round(float(f1_all), 4),
+                "degree_agreement": round(float(degree_agreement.mean()), 4),
+            },
+            "reason": f"{consistent_count}/{len(component_results)} 组件分析一致",
+            "engine": "graph"
+        }
+        if self.with_ged:
+            result["graph_metrics"].update(self._approximate_ged(d1, d2, u1, u2))
+        return result
+
+    @staticmethod
+    def _approximate_ged(d1: np.ndarray, d2: np.ndarray, u1: np.ndarray, u2: np.ndarray) -> Dict:
+        """节点按规范化名称对齐时的近似图编辑距离：孤立差异节点的增删加上边的对称差"""
+        present1 = d1.any(axis=0) | d1.any(axis=1) | u1.any(axis=1)
+        present2 = d2.any(axis=0) | d2.any(axis=1) | u2.any(axis=1)
+        node_edits = int((present1 ^ present2).sum())
+        edge_edits = int((d1 ^ d2).sum() + np.triu(u1 ^ u2).sum())
+        size = int(present1.sum() + present2.sum() + d1.sum() + d2.sum() + np.triu(u1).sum() + np.triu(u2).sum())
+        return {
+            "approx_ged": node_edits + edge_edits,
+            "normalized_ged": round((node_edits + edge_edits) / size, 4) if size else 0.0
+        }
+
+    def score_all(self, step1_results: Dict) -> Dict:
+        """对全部图像评分"""
+        results = {}
+        for image_id, model_analysis in step1_results.items():
+            results[image_id] = dict(self.score_image(model_analysis), image_id=image_id)
+        return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="基于连接图结构的一致性评分")
+    parser.add_argument("--input_file", type=str, required=True, help="第一步输出的 model_analysis.json")
+    parser.add_argument("--output_file", type=str, default="", help="输出路径，默认与输入同目录")
+    parser.add_argument("--no_ged", action="store_true", help="不计算近似图编辑距离")
+    args = parser.parse_args()
+
+    output_file = args.output_file or os.path.join(os.path.dirname(args.input_file), "graph_consistency_results.json")
+    with open(args.input_file, 'r', encoding='utf-8') as f:
+        step1_results = json.load(f)
+
+    scorer = GraphConsistencyScorer(with_ged=not args.no_ged)
+    results = scorer.score_all(step1_results)
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+
+    scores = [r["overall_score"] for r in results.values() if "overall_score" in r]
+    print(f"完成 {len(results)} 张图像的图结构评分，平均分 {np.mean(scores) if scores else 0:.2f}，结果已保存到 {output_file}")
+
+
+if __name__ == "__main__":
+    main()
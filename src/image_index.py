@@ -0,0 +1,94 @@
+import os
+import json
+from typing import Dict, List, Optional
+
+# 支持的图像文件扩展名
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tif', '.tiff')
+
+# 按 (图像根目录, 清单文件) 缓存的索引，同一进程内第一步和第二步共享
+_index_cache = {}
+
+
+class ImageIndex:
+    """图像路径索引
+
+    启动时遍历一次图像目录（或从清单文件加载），按相对路径和文件名建立索引，
+    之后的路径查找都是O(1)，不再每次遍历整个目录树。
+    """
+
+    def __init__(self, image_root: str, rel_paths: List[str]):
+        self.image_root = image_root
+        # 保持 os.walk 的原始顺序和系统路径分隔符，与 get_image_files 的历史行为一致
+        self.rel_paths = rel_paths
+        self.by_rel_path = {}
+        self.by_basename = {}
+        for rel_path in rel_paths:
+            key = rel_path.replace('\\', '/')
+            self.by_rel_path[key] = rel_path
+            self.by_basename.setdefault(os.path.basename(key), []).append(rel_path)
+
+        # 同名文件在不同子目录中出现时，按文件名查找无法确定是哪一个
+        self.ambiguous = {name: paths for name, paths in self.by_basename.items() if len(paths) > 1}
+        if self.ambiguous:
+            examples = ", ".join(f"{name} ({len(paths)}处)" for name, paths in list(self.ambiguous.items())[:5])
+            print(f"警告: 图像目录 {image_root} 中有 {len(self.ambiguous)} 个重名文件，按文件名查找时将无法确定路径: {examples}")
+
+    @classmethod
+    def scan(cls, image_root: str) -> "ImageIndex":
+        """遍历图像目录建立索引"""
+        rel_paths = []
+        for root, _, files in os.walk(image_root):
+            for file in files:
+                if file.lower().endswith(IMAGE_EXTENSIONS):
+                    rel_paths.append(os.path.relpath(os.path.join(root, file), image_root))
+        return cls(image_root, rel_paths)
+
+    @classmethod
+    def load_manifest(cls, image_root: str, manifest_path: str) -> "ImageIndex":
+        """从清单文件加载索引，清单为相对于image_root的路径列表"""
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            rel_paths = json.load(f)
+        return cls(image_root, [os.path.normpath(p) for p in rel_paths])
+
+    def save_manifest(self, manifest_path: str) -> None:
+        """保存清单文件，供下次启动时跳过目录遍历"""
+        with open(manifest_path, 'w', encoding='utf-8') as f:
+            json.dump([p.replace('\\', '/') for p in self.rel_paths], f, ensure_ascii=False, indent=2)
+
+    def resolve(self, image_id: str) -> Optional[str]:
+        """根据图像ID（相对路径或文件名）查找完整路径，找不到或存在歧义时返回None"""
+        key = image_id.replace('\\', '/')
+        if key in self.by_rel_path:
+            return os.path.join(self.image_root, self.by_rel_path[key])
+
+        basename = os.path.basename(key)
+        candidates = self.by_basename.get(basename, [])
+        if len(candidates) == 1:
+            return os.path.join(self.image_root, candidates[0])
+        if len(candidates) > 1:
+            print(f"警告: 图像 {image_id} 对应多个文件，无法确定路径: {candidates}")
+        return None
+
+
+def get_image_index(image_root: str, manifest_path: str = "") -> ImageIndex:
+    """获取图像目录的索引，同一目录和清单文件只建立一次
+
+    Args:
+        image_root: 图像根目录
+        manifest_path: 可选的清单文件路径，存在时直接加载，否则遍历目录后写入
+    """
+    # 清单可能与目录内容不同，不同清单的索引分别缓存
+    cache_key = (os.path.abspath(image_root), os.path.abspath(manifest_path) if manifest_path else "")
+    if cache_key in _index_cache:
+        return _index_cache[cache_key]
+
+    if manifest_path and os.path.exists(manifest_path):
+        print(f"从清单文件加载图像索引: {manifest_path}")
+        index = ImageIndex.load_manifest(image_root, manifest_path)
+    else:
+        index = ImageIndex.scan(image_root)
+        if manifest_path:
+            index.save_manifest(manifest_path)
+
+    _index_cache[cache_key] = index
+    return index
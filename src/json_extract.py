@@ -0,0 +1,238 @@
+import re
+import json
+from collections import Counter
+from typing import Any, Iterator, Optional, Tuple
+
+# 从模型回复中提取JSON的共用工具
+# 单次扫描找出括号平衡的候选片段（感知字符串和转义），依次尝试严格解析和容错修复，
+# 并报告结果来自哪里（direct / fence / scan）以及用到了哪些修复。
+# 目的是提取得更准（前后有说明文字、尾随逗号、单引号等原正则链失败的情况），不是更快：
+# 每个候选片段都要尝试解析，单次调用比原正则链慢（见 script/benchmark_json_extract.py）
+
+_OPEN_PATTERN = re.compile(r'[{\[]')
+_STRUCT_PATTERN = re.compile(r'["\'{}\[\]]')
+_DOUBLE_STRING = re.compile(r'"(?:[^"\\]|\\.)*"', re.S)
+_SINGLE_STRING = re.compile(r"'(?:[^'\\\n]|\\.)*'", re.S)
+_FENCE_PATTERN = re.compile(r'```[ \t]*(?:json|JSON)?[ \t]*\n?')
+_CLOSERS = {'{': '}', '[': ']'}
+
+# 修复阶段的词法单元：双引号字符串、单引号字符串、尾随逗号、Python字面量、未加引号的键、其他字符
+_REPAIR_TOKEN = re.compile(
+    r'(?P<dq>"(?:[^"\\]|\\.)*")'
+    r"|(?P<sq>'(?:[^'\\\n]|\\.)*')"
+    r'|(?P<tc>,\s*(?=[}\]]))'
+    r'|(?P<py>\b(?:True|False|None)\b)'
+    r'|(?P<key>\b[A-Za-z_][\w\-]*(?=\s*:))'
+    r'|(?P<other>[^"\',A-Za-z_]+|.)',
+    re.S
+)
+_PY_LITERALS = {"True": "true", "False": "false", "None": "null"}
+
+# 进程内累计的提取情况，用于运行结束时汇总
+extract_stats = Counter()
+
+
+def iter_json_candidates(text: str) -> Iterator[Tuple[int, int]]:
+    """扫描文本一遍，按出现顺序产出括号平衡的片段 (start, end)
+
+    只在括号内部识别字符串，括号外的撇号等普通文字不会干扰扫描；
+    单引号只在 { [ , : 之后出现时才视为字符串开头。最外层括号始终没有闭合
+    （如输出被截断）或遇到无法匹配的右括号时，改为产出其中已经闭合的最大片段。
+    """
+    n = len(text)
+    i = 0
+    while i < n:
+        m = _OPEN_PATTERN.search(text, i)
+        if not m:
+            return
+        start = m.start()
+        stack = [(_CLOSERS[m.group()], start)]
+        # 已闭合但外层尚未闭合的片段，内层片段会被包含它的外层片段替换
+        closed = []
+        i = start + 1
+        while stack:
+            m = _STRUCT_PATTERN.search(text, i)
+            if not m:
+                i = n
+                break
+            ch, pos = m.group(), m.start()
+            if ch == '"' or ch == "'":
+                if ch == "'":
+                    j = pos - 1
+                    while j >= 0 and text[j].isspace():
+                        j -= 1
+                    if j < 0 or text[j] not in '{[,:':
+                        i = pos + 1
+                        continue
+                string = (_DOUBLE_STRING if ch == '"' else _SINGLE_STRING).match(text, pos)
+                if string:
+                    i = string.end()
+                elif ch == '"':
+                    i = n
+                    break
+                else:
+                    i = pos + 1
+            elif ch in '{[':
+                stack.append((_CLOSERS[ch], pos))
+                i = pos + 1
+            else:
+                i = pos + 1
+                # 不匹配的右括号：回退到与之匹配的层，没有则放弃当前最外层
+                depth = len(stack)
+                while depth and stack[depth - 1][0] != ch:
+                    depth -= 1
+                if not depth:
+                    break
+                del stack[depth:]
+                _, opened = stack.pop()
+                while closed and closed[-1][0] > opened:
+                    closed.pop()
+                closed.append((opened, i))
+        if not stack:
+            yield closed[-1]
+        else:
+            yield from closed
+
+
+def repair_json(text: str) -> Tuple[str, list]:
+    """容错修复：单引号字符串、尾随逗号、Python字面量、未加引号的键，返回 (修复后文本, 用到的修复)"""
+    parts = []
+    repairs = set()
+    for m in _REPAIR_TOKEN.finditer(text):
+        kind = m.lastgroup
+        token = m.group()
+        if kind == "sq":
+            body = token[1:-1].replace("\\'", "'")
+            body = re.sub(r'(?<!\\)"', '\\"', body)
+            token = f'"{body}"'
+            repairs.add("single_quotes")
+        elif kind == "tc":
+            token = ""
+            repairs.add("trailing_commas")
+        elif kind == "py":
+            token = _PY_LITERALS[token]
+            repairs.add("python_literals")
+        elif kind == "key":
+            token = f'"{token}"'
+            repairs.add("unquoted_keys")
+        parts.append(token)
+    return "".join(parts), sorted(repairs)
+
+
+def _loads(text: str, repair: bool = True) -> Tuple[Any, Optional[list]]:
+    """依次尝试严格解析、允许控制字符、容错修复；失败时返回 (None, None)
+
+    嵌套过深（超过解释器递归深度）的片段视为无法解析，放宽规则也一样，不再尝试
+    """
+    try:
+        return json.loads(text), []
+    except RecursionError:
+        return None, None
+    except (json.JSONDecodeError, ValueError):
+        pass
+    try:
+        # 模型常在字符串里直接输出换行等控制字符
+        return json.loads(text, strict=False), ["control_characters"]
+    except RecursionError:
+        return None, None
+    except (json.JSONDecodeError, ValueError):
+        pass
+    if not repair:
+        return None, None
+    repaired, repairs = repair_json(text)
+    if not repairs:
+        return None, None
+    try:
+        return json.loads(repaired, strict=False), repairs
+    except (json.JSONDecodeError, ValueError, RecursionError):
+        return None, None
+
+
+def _accept(value, expect, required_keys) -> bool:
+    if expect is not None and not isinstance(value, expect):
+        return False
+    if required_keys:
+        return isinstance(value, dict) and all(k in value for k in required_keys)
+    return True
+
+
+def _plausible(segment: str, expect) -> bool:
+    """快速排除不可能符合要求的候选片段，避免对说明文字中的 {A}、[1] 之类反复尝试解析和修复"""
+    kind = dict if segment[0] == '{' else list
+    if expect is not None and not issubclass(kind, expect):
+        return False
+    # 非空对象至少包含一个冒号
+    return kind is list or ':' in segment or not segment[1:-1].strip()
+
+
+def _iter_fenced_blocks(text: str) -> Iterator[str]:
+    """产出 ``` 代码块中的内容，最后一个代码块未闭合时产出到文本末尾"""
+    pos = 0
+    while True:
+        m = _FENCE_PATTERN.search(text, pos)
+        if not m:
+            return
+        end = text.find("```", m.end())
+        if end == -1:
+            yield text[m.end():]
+            return
+        yield text[m.end():end]
+        pos = end + 3
+
+
+def extract_json(text: str, expect=None, required_keys=()) -> Tuple[Any, Optional[dict]]:
+    """从模型回复中提取第一个符合要求的JSON值
+
+    Args:
+        text: 模型回复
+        expect: 期望的类型（如 dict、list 或二者的元组），None表示不限
+        required_keys: 期望为dict时必须包含的键
+
+    Returns:
+        (value, info)，info 为 {"source": "direct"|"fence"|"scan", "repairs": [...]}；
+        找不到时返回 (None, None)
+    """
+    if not isinstance(text, str) or not text.strip():
+        return None, None
+
+    def found(value, source, repairs):
+        extract_stats[source] += 1
+        for repair in repairs:
+            extract_stats[repair] += 1
+        return value, {"source": source, "repairs": repairs}
+
+    # 1. 整个回复就是JSON（不以括号开头时只做严格解析）
+    stripped = text.strip()
+    value, repairs = _loads(stripped, repair=stripped[:1] in ('{', '['))
+    if repairs is not None and _accept(value, expect, required_keys):
+        return found(value, "direct", repairs)
+
+    # 2. markdown代码块
+    if "```" in text:
+        for block in _iter_fenced_blocks(text):
+            for start, end in iter_json_candidates(block):
+                segment = block[start:end]
+                if not _plausible(segment, expect):
+                    continue
+                value, repairs = _loads(segment)
+                if repairs is not None and _accept(value, expect, required_keys):
+                    return found(value, "fence", repairs)
+
+    # 3. 在全文中扫描括号平衡的片段
+    for start, end in iter_json_candidates(text):
+        segment = text[start:end]
+        if not _plausible(segment, expect):
+            continue
+        value, repairs = _loads(segment)
+        if repairs is not None and _accept(value, expect, required_keys):
+            return found(value, "scan", repairs)
+
+    extract_stats["failed"] += 1
+    return None, None
+
+
+def extract_summary() -> str:
+    """提取情况汇总"""
+    if not extract_stats:
+        return "JSON提取: 无"
+    return "JSON提取: " + ", ".join(f"{k} {v}" for k, v in sorted(extract_stats.items()))
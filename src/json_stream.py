@@ -0,0 +1,375 @@
+import os
+import re
+import json
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, Tuple
+
+# 顶层结构为 {image_id: record} 的结果文件（model_analysis.json 等）的流式读写工具
+# 逐条记录解析，内存占用与单张图像的记录大小成正比，而不是整个文件
+
+_NON_WS = re.compile(rb'\S')
+_STRING_STOP = re.compile(rb'["\\]')
+_STRUCT = re.compile(rb'["\[\]{}]')
+_SCALAR_END = re.compile(rb'[,}\]\s]')
+
+
+class JsonRecordReader:
+    """顶层映射的增量读取器
+
+    Args:
+        path: JSON文件路径，顶层必须是对象
+        chunk_size: 每次从磁盘读取的字节数
+    """
+
+    def __init__(self, path: str, chunk_size: int = 1 << 22):
+        self.path = path
+        self.chunk_size = chunk_size
+
+    # ---- 底层扫描 ----
+    def _fill(self) -> bool:
+        chunk = self._file.read(self.chunk_size)
+        if not chunk:
+            return False
+        self._buf += chunk
+        return True
+
+    def _peek(self) -> bytes:
+        """跳过空白，返回下一个字符（文件结束时返回空）"""
+        while True:
+            m = _NON_WS.search(self._buf, self._pos)
+            if m:
+                self._pos = m.start()
+                return self._buf[self._pos:self._pos + 1]
+            self._pos = len(self._buf)
+            if not self._fill():
+                return b''
+
+    def _skip_string(self, i: int) -> int:
+        """i指向起始引号，返回结束引号之后的位置"""
+        i += 1
+        while True:
+            m = _STRING_STOP.search(self._buf, i)
+            if not m:
+                i = len(self._buf)
+                if not self._fill():
+                    raise ValueError(f"{self.path}: 字符串未结束")
+                continue
+            if m.group() == b'"':
+                return m.end()
+            # 转义字符：跳过反斜杠和其后的一个字节
+            i = m.start() + 2
+            while i > len(self._buf):
+                if not self._fill():
+                    raise ValueError(f"{self.path}: 字符串未结束")
+
+    def _skip_value(self, i: int) -> int:
+        """i指向值的第一个字符，返回值结束后的位置"""
+        first = self._buf[i:i + 1]
+        if first == b'"':
+            return self._skip_string(i)
+        if first not in (b'{', b'['):
+            while True:
+                m = _SCALAR_END.search(self._buf, i)
+                if m:
+                    return m.start()
+                if not self._fill():
+                    return len(self._buf)
+        depth = 0
+        while True:
+            m = _STRUCT.search(self._buf, i)
+            if not m:
+                i = len(self._buf)
+                if not self._fill():
+                    raise ValueError(f"{self.path}: JSON结构未结束")
+                continue
+            ch = m.group()
+            if ch == b'"':
+                i = self._skip_string(m.start())
+                continue
+            depth += 1 if ch in (b'{', b'[') else -1
+            i = m.end()
+            if depth == 0:
+                return i
+
+    def _scan(self) -> Iterator[Tuple[str, int, int, bytes]]:
+        """逐条产出 (key, 值起始字节偏移, 值结束字节偏移, 值字节)"""
+        with open(self.path, 'rb') as f:
+            self._file, self._buf, self._pos, self._base = f, b'', 0, 0
+            if self._peek() != b'{':
+                raise ValueError(f"{self.path}: 顶层不是JSON对象")
+            self._pos += 1
+            while True:
+                ch = self._peek()
+                if ch == b',':
+                    self._pos += 1
+                    ch = self._peek()
+                if ch == b'}' or ch == b'':
+                    return
+                key_end = self._skip_string(self._pos)
+                key = json.loads(self._buf[self._pos:key_end].decode('utf-8'))
+                self._pos = key_end
+                if self._peek() != b':':
+                    raise ValueError(f"{self.path}: 键 {key} 之后缺少冒号")
+                self._pos += 1
+                self._peek()
+                start = self._pos
+                end = self._skip_value(start)
+                yield key, self._base + start, self._base + end, self._buf[start:end]
+                self._pos = end
+                # 丢弃已处理的部分，保持缓冲区只包含当前记录
+                if self._pos > self.chunk_size:
+                    self._buf = self._buf[self._pos:]
+                    self._base += self._pos
+                    self._pos = 0
+
+    # ---- 对外接口 ----
+    def __iter__(self) -> Iterator[Tuple[str, Any]]:
+        """逐条产出 (image_id, record)"""
+        for key, _, _, raw in self._scan():
+            yield key, json.loads(raw.decode('utf-8'))
+
+    def iter_keys(self) -> Iterator[str]:
+        """只扫描结构，不解析记录内容"""
+        for key, _, _, _ in self._scan():
+            yield key
+
+    def build_offset_index(self) -> Dict[str, Tuple[int, int]]:
+        """建立 {image_id: (字节偏移, 字节长度)} 索引"""
+        return {key: (start, end - start) for key, start, end, _ in self._scan()}
+
+
+def iter_json_records(path: str) -> Iterator[Tuple[str, Any]]:
+    """逐条读取 {image_id: record} 结构的JSON文件"""
+    return iter(JsonRecordReader(path))
+
+
+class JsonRecordJournal:
+    """{image_id: record} 结果文件的追加式更新日志
+
+    更新的记录逐行追加到 "<path>.journal"（每行一个 [image_id, record]，写入后 fsync），
+    内存中只保存每条记录在日志中的字节偏移，同一记录多次更新时以最后一次为准（位置按第一次）。
+    compact 把结果文件和日志流式合并为原格式的JSON文件（已有记录保持原位置，新记录按日志顺序
+    追加在末尾，原子替换），然后删除日志。进程中断后日志保留在磁盘上，下次打开时仍然生效。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.journal_path = f"{path}.journal"
+        self.offsets = self._scan()
+
+    def _scan(self) -> Dict[str, Tuple[int, int]]:
+        offsets = {}
+        if not os.path.exists(self.journal_path):
+            return offsets
+        good_end = 0
+        with open(self.journal_path, 'rb') as f:
+            for line in f:
+                try:
+                    key, _ = json.loads(line.decode('utf-8'))
+                except (ValueError, TypeError):
+                    # 中断时写了一半的最后一行
+                    break
+                offsets[key] = (good_end, len(line))
+                good_end += len(line)
+        if good_end < os.path.getsize(self.journal_path):
+            print(f"警告: 丢弃 {self.journal_path} 末尾不完整的记录")
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(good_end)
+        return offsets
+
+    def __contains__(self, key) -> bool:
+        return key in self.offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def keys(self):
+        return self.offsets.keys()
+
+    @property
+    def size(self) -> int:
+        """日志文件的字节数（含被后续更新覆盖的旧行）"""
+        return os.path.getsize(self.journal_path) if self.offsets else 0
+
+    def get(self, key: str) -> Any:
+        start, length = self.offsets[key]
+        with open(self.journal_path, 'rb') as f:
+            f.seek(start)
+            return json.loads(f.read(length).decode('utf-8'))[1]
+
+    def append(self, key: str, record: Any) -> None:
+        """追加一条记录，返回前已落盘"""
+        line = (json.dumps([key, record], ensure_ascii=False) + "\n").encode('utf-8')
+        with open(self.journal_path, 'ab') as f:
+            start = f.tell()
+            f.write(line)
+            f.flush()
+            os.fsync(f.fileno())
+        self.offsets[key] = (start, len(line))
+
+    def compact(self) -> int:
+        """把日志合并进结果文件，返回合并的记录数"""
+        if not self.offsets:
+            return 0
+        existing = iter_json_records(self.path) if os.path.exists(self.path) else iter(())
+        written = set()
+        with JsonRecordWriter(self.path) as writer:
+            for key, record in existing:
+                if key in self.offsets:
+                    record = self.get(key)
+                    written.add(key)
+                writer.write(key, record)
+            for key in self.offsets:
+                if key not in written:
+                    writer.write(key, self.get(key))
+        count = len(self.offsets)
+        os.remove(self.journal_path)
+        self.offsets = {}
+        return count
+
+
+class JsonRecordStore:
+    """基于字节偏移索引的随机访问
+
+    索引保存在 "<path>.index.json"，文件大小或修改时间变化时自动重建。
+    对外表现为映射，按需从磁盘读取单条记录，并用小容量LRU缓存最近访问的记录。
+    update 把修改后的记录追加到更新日志（JsonRecordJournal），读取时日志中的记录优先；
+    日志超过文件大小的 compact_ratio 时合并回JSON文件，单次更新的均摊代价与记录大小成正比。
+    """
+
+    def __init__(self, path: str, cache_size: int = 32, persist_index: bool = True, compact_ratio: float = 0.25):
+        self.path = path
+        self.index_path = f"{path}.index.json"
+        self.cache_size = cache_size
+        self.persist_index = persist_index
+        self.compact_ratio = compact_ratio
+        self._cache = OrderedDict()
+        self.offsets = self._load_or_build_index(persist_index)
+        self.journal = JsonRecordJournal(path)
+
+    def _file_signature(self) -> list:
+        stat = os.stat(self.path)
+        return [stat.st_size, stat.st_mtime_ns]
+
+    def _load_or_build_index(self, persist_index: bool) -> Dict[str, list]:
+        signature = self._file_signature()
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r', encoding='utf-8') as f:
+                    saved = json.load(f)
+                if saved.get("signature") == signature:
+                    return saved["offsets"]
+            except (json.JSONDecodeError, KeyError, OSError):
+                pass
+        offsets = {k: list(v) for k, v in JsonRecordReader(self.path).build_offset_index().items()}
+        if persist_index:
+            try:
+                with open(self.index_path, 'w', encoding='utf-8') as f:
+                    json.dump({"signature": signature, "offsets": offsets}, f, ensure_ascii=False)
+            except OSError as e:
+                print(f"警告: 无法保存索引文件 {self.index_path}: {e}")
+        return offsets
+
+    def _new_keys(self) -> list:
+        """只在更新日志中、尚未合并进文件的记录"""
+        return [key for key in self.journal.keys() if key not in self.offsets]
+
+    def __contains__(self, key) -> bool:
+        return key in self.offsets or key in self.journal
+
+    def __len__(self) -> int:
+        return len(self.offsets) + len(self._new_keys())
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def keys(self):
+        if not len(self.journal):
+            return self.offsets.keys()
+        return list(self.offsets) + self._new_keys()
+
+    def _remember(self, key: str, record: Any) -> None:
+        self._cache[key] = record
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def __getitem__(self, key: str) -> Any:
+        if key in self._cache:
+            self._cache.move_to_end(key)
+            return self._cache[key]
+        if key in self.journal:
+            record = self.journal.get(key)
+        else:
+            start, length = self.offsets[key]
+            with open(self.path, 'rb') as f:
+                f.seek(start)
+                record = json.loads(f.read(length).decode('utf-8'))
+        self._remember(key, record)
+        return record
+
+    def get(self, key: str, default=None) -> Any:
+        return self[key] if key in self else default
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        """按文件顺序顺序读取全部记录（不经过缓存），更新日志中的记录优先，新记录排在最后"""
+        for key, record in JsonRecordReader(self.path):
+            yield key, self.journal.get(key) if key in self.journal else record
+        for key in self._new_keys():
+            yield key, self.journal.get(key)
+
+    def values(self) -> Iterator[Any]:
+        for _, record in self.items():
+            yield record
+
+    def update(self, key: str, record: Any) -> None:
+        """写入或替换单条记录：追加到更新日志，日志过大时合并回文件"""
+        self.journal.append(key, record)
+        self._remember(key, record)
+        if self.journal.size > self.compact_ratio * os.path.getsize(self.path):
+            self.compact()
+
+    def compact(self) -> int:
+        """把更新日志合并回JSON文件并重建索引，返回合并的记录数"""
+        count = self.journal.compact()
+        if count:
+            self.offsets = self._load_or_build_index(self.persist_index)
+        return count
+
+
+class JsonRecordWriter:
+    """增量写出 {image_id: record} 结构的JSON文件
+
+    输出格式与 json.dump(data, f, ensure_ascii=False, indent=indent) 完全相同（默认indent=2）；
+    先写临时文件，关闭时原子替换目标文件。
+    """
+
+    def __init__(self, path: str, indent: int = 2):
+        self.path = path
+        self.tmp_path = f"{path}.tmp"
+        self.indent = indent
+        self._file = None
+        self._count = 0
+
+    def __enter__(self) -> "JsonRecordWriter":
+        self._file = open(self.tmp_path, 'w', encoding='utf-8')
+        self._file.write("{")
+        return self
+
+    def write(self, key: str, record: Any) -> None:
+        pad = " " * self.indent
+        value = json.dumps(record, ensure_ascii=False, indent=self.indent).replace("\n", "\n" + pad)
+        self._file.write(("," if self._count else "") + f"\n{pad}{json.dumps(key, ensure_ascii=False)}: {value}")
+        self._count += 1
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self._file.close()
+            os.remove(self.tmp_path)
+            return
+        self._file.write("\n}" if self._count else "}")
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        os.replace(self.tmp_path, self.path)
+
@@ -3,21 +3,60 @@ import asyncio
 from typing import Dict, Any
 import traceback
 
+# 服务端不支持结构化输出参数时，错误信息中常见的关键字
+_SCHEMA_ERROR_HINTS = ("guided", "json_schema", "response_format", "schema", "extra_forbidden", "extra inputs")
+
 class ModelClient:
     """Model API Client"""
     
-    def __init__(self, api_base: str, api_key: str, model: str):
+    def __init__(self, api_base: str, api_key: str, model: str, structured_output: str = "auto"):
         self.api_base = api_base
         self.api_key = api_key
         self.model = model
         # Check API base URL to determine provider
         self.is_openai = "openai" in api_base.lower()
         self.is_anthropic = "anthropic" in api_base.lower()
-    
+        # Structured output mode: auto / guided_json / json_schema / off
+        self.structured_output = structured_output
+        # Set once the server rejects the schema parameter; later requests rely on the prompt only
+        self.schema_unsupported = False
+
+    def _schema_mode(self, json_schema: Dict) -> str:
+        """Resolve how a JSON schema is passed to the server ('' means not passed)"""
+        if not json_schema or self.schema_unsupported or self.structured_output == "off":
+            return ""
+        mode = self.structured_output
+        if mode == "auto":
+            if self.is_anthropic:
+                return ""
+            # OpenAI uses response_format json_schema, vLLM-style servers accept guided_json
+            mode = "json_schema" if self.is_openai else "guided_json"
+        # OpenAI json_schema only accepts an object at the root
+        if mode == "json_schema" and self.is_openai and json_schema.get("type") != "object":
+            return ""
+        return mode
+
+    @staticmethod
+    def _apply_schema(payload: Dict, mode: str, json_schema: Dict, schema_name: str) -> None:
+        if mode == "json_schema":
+            payload["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {"name": schema_name, "schema": json_schema}
+            }
+        elif mode == "guided_json":
+            payload["guided_json"] = json_schema
+
     async def generate(self, session, prompt: str, query: str, 
                       image_base64: str = None, temperature=0.1, 
-                      max_tokens=2048, enforce_json=False) -> Dict[str, Any]:
-        """Call model to generate response"""
+                      max_tokens=2048, enforce_json=False,
+                      json_schema: Dict = None, schema_name: str = "response") -> Dict[str, Any]:
+        """Call model to generate response
+
+        json_schema: optional JSON schema of the expected answer. It is passed to the server as
+        guided_json / response_format json_schema when supported; if the server rejects it,
+        the request is retried once without the schema and the schema is not sent again.
+        """
+        schema_mode = self._schema_mode(json_schema)
         
         retries = 3
         backoff_factor = 2.0
@@ -69,7 +108,9 @@ class ModelClient:
                 }
                 
                 # Add response_format based on different API providers
-                if enforce_json:
+                if schema_mode:
+                    self._apply_schema(payload, schema_mode, json_schema, schema_name)
+                elif enforce_json:
                     if self.is_openai:
                         payload["response_format"] = {"type": "json_object"}
                     elif self.is_anthropic:
@@ -102,6 +143,13 @@ class ModelClient:
                         if response.status >= 500:
                             print(f"Server error {response.status}, retrying...")
                             response.raise_for_status() # Will be caught by ClientError
+                        if schema_mode and response.status in (400, 422) and \
+                                any(hint in error_text.lower() for hint in _SCHEMA_ERROR_HINTS):
+                            if not self.schema_unsupported:
+                                print(f"服务端不支持结构化输出({schema_mode})，改为仅通过提示词约束JSON格式: {error_text[:200]}")
+                            self.schema_unsupported = True
+                            return await self.generate(session, prompt, query, image_base64, temperature,
+                                                       max_tokens, enforce_json)
                         return {"error": f"API请求失败: {response.status}, {error_text}"}
                     
                     result = await response.json()
@@ -142,7 +190,7 @@ class ModelClient:
     
     async def evaluate_consistency(self, session, prompt: str, query: str,
                                  model1_json: str, model2_json: str, 
-                                 temperature=0.1) -> Dict[str, Any]:
+                                 temperature=0.1, json_schema: Dict = None) -> Dict[str, Any]:
         """评估两个分析结果的一致性（不包含图像）"""
         try:
             # 构建一致性评估提示词
@@ -155,7 +203,9 @@ class ModelClient:
                 query,
                 image_base64=None,
                 temperature=temperature,
-                enforce_json=True
+                enforce_json=True,
+                json_schema=json_schema,
+                schema_name="consistency_verdict"
             )
             
         except Exception as e:
@@ -163,7 +213,8 @@ class ModelClient:
     
     async def evaluate_consistency_with_image(self, session, prompt: str, query: str,
                                            model1_json: str, model2_json: str, 
-                                           image_base64: str, temperature=0.1) -> Dict[str, Any]:
+                                           image_base64: str, temperature=0.1,
+                                           json_schema: Dict = None) -> Dict[str, Any]:
         """评估两个分析结果的一致性（包含原始图像）
         
         Args:
@@ -174,6 +225,7 @@ class ModelClient:
             model2_json: 模型2的分析结果JSON
             image_base64: 原始图像的base64编码
             temperature: 温度参数
+            json_schema: 评估结果的JSON schema（可选）
             
         Returns:
             evaluation result dictionary
@@ -189,7 +241,9 @@ class ModelClient:
                 query,
                 image_base64=image_base64,
                 temperature=temperature,
-                enforce_json=True
+                enforce_json=True,
+                json_schema=json_schema,
+                schema_name="consistency_verdict"
             )
             
         except Exception as e:
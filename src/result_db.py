@@ -0,0 +1,272 @@
+import os
+import sys
+import json
+import time
+import sqlite3
+import argparse
+import threading
+import contextlib
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.json_stream import iter_json_records, JsonRecordWriter
+
+# 每张图像一行；component_details 拆到 components 表中，每个组件一行，
+# 图像记录中只保留 component_details 的占位（null），以便还原时保持字段顺序
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS records (
+    image_id   TEXT PRIMARY KEY,
+    position   INTEGER NOT NULL,
+    record     TEXT NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS components (
+    image_id   TEXT NOT NULL,
+    component  TEXT NOT NULL,
+    position   INTEGER NOT NULL,
+    detail     TEXT NOT NULL,
+    label      TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (image_id, component)
+);
+CREATE INDEX IF NOT EXISTS idx_records_position ON records(position);
+CREATE INDEX IF NOT EXISTS idx_components_component ON components(component);
+"""
+
+
+def default_db_path(json_path: str) -> str:
+    """JSON结果文件对应的结果库路径，如 results/model_analysis.db"""
+    return os.path.splitext(json_path)[0] + ".db"
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False)
+
+
+class ResultDB:
+    """SQLite结果库（WAL模式）
+
+    存放 {image_id: record} 结构的结果或标注：按图像、按组件分行保存，
+    写入是单条记录的upsert，读取不会被写入阻塞；保留与JSON文件的导入导出。
+    每个线程使用独立的连接，可在Flask等多线程服务中直接使用。
+    """
+
+    def __init__(self, db_path: str, timeout: float = 30.0):
+        self.db_path = db_path
+        self.timeout = timeout
+        self._local = threading.local()
+        self.conn.executescript(_SCHEMA)
+
+    # ---- 连接与事务 ----
+    @property
+    def conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    @contextlib.contextmanager
+    def _transaction(self):
+        """写事务：开始时即获取写锁，避免读后写升级时出现死锁"""
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def close(self) -> None:
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    # ---- 写入 ----
+    def _upsert(self, conn: sqlite3.Connection, image_id: str, record: Any, now: float) -> None:
+        component_details = record.get("component_details") if isinstance(record, dict) else None
+        if isinstance(component_details, dict):
+            stored = dict(record, component_details=None)
+        else:
+            stored = record
+        conn.execute(
+            "INSERT INTO records (image_id, position, record, updated_at) "
+            "VALUES (?, (SELECT IFNULL(MAX(position), -1) + 1 FROM records), ?, ?) "
+            "ON CONFLICT(image_id) DO UPDATE SET record = excluded.record, updated_at = excluded.updated_at",
+            (image_id, _dumps(stored), now)
+        )
+        conn.execute("DELETE FROM components WHERE image_id = ?", (image_id,))
+        if isinstance(component_details, dict):
+            conn.executemany(
+                "INSERT INTO components (image_id, component, position, detail, label, updated_at) VALUES (?, ?, ?, ?, ?, ?)",
+                [(image_id, component, i, _dumps(detail),
+                  detail.get("label") if isinstance(detail, dict) else None, now)
+                 for i, (component, detail) in enumerate(component_details.items())]
+            )
+
+    def upsert(self, image_id: str, record: Any) -> None:
+        """写入或替换单张图像的记录"""
+        with self._transaction() as conn:
+            self._upsert(conn, image_id, record, time.time())
+
+    def upsert_many(self, items) -> int:
+        """在一个事务中写入多条 (image_id, record)，返回写入条数"""
+        count = 0
+        now = time.time()
+        with self._transaction() as conn:
+            for image_id, record in items:
+                self._upsert(conn, image_id, record, now)
+                count += 1
+        return count
+
+    def update_component(self, image_id: str, component: str, fields: Dict) -> bool:
+        """合并更新单个组件的字段（如标注label），返回组件是否存在"""
+        with self._transaction() as conn:
+            row = conn.execute("SELECT detail FROM components WHERE image_id = ? AND component = ?",
+                               (image_id, component)).fetchone()
+            if row is None:
+                return False
+            detail = json.loads(row[0])
+            detail.update(fields)
+            conn.execute(
+                "UPDATE components SET detail = ?, label = ?, updated_at = ? WHERE image_id = ? AND component = ?",
+                (_dumps(detail), detail.get("label"), time.time(), image_id, component)
+            )
+        return True
+
+    def merge(self, image_id: str, fields: Dict) -> Dict:
+        """在同一个写事务中读取并合并更新单张图像记录的顶层字段，记录不存在时新建，返回更新后的记录"""
+        with self._transaction() as conn:
+            row = conn.execute("SELECT record FROM records WHERE image_id = ?", (image_id,)).fetchone()
+            record = self._assemble(image_id, row[0]) if row is not None else {}
+            record.update(fields)
+            self._upsert(conn, image_id, record, time.time())
+        return record
+
+    def delete(self, image_id: str) -> None:
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM components WHERE image_id = ?", (image_id,))
+            conn.execute("DELETE FROM records WHERE image_id = ?", (image_id,))
+
+    # ---- 读取 ----
+    def _assemble(self, image_id: str, record_text: str) -> Any:
+        record = json.loads(record_text)
+        if isinstance(record, dict) and "component_details" in record and record["component_details"] is None:
+            rows = self.conn.execute(
+                "SELECT component, detail FROM components WHERE image_id = ? ORDER BY position", (image_id,)
+            ).fetchall()
+            record["component_details"] = {component: json.loads(detail) for component, detail in rows}
+        return record
+
+    def get(self, image_id: str, default=None) -> Any:
+        row = self.conn.execute("SELECT record FROM records WHERE image_id = ?", (image_id,)).fetchone()
+        return default if row is None else self._assemble(image_id, row[0])
+
+    def get_component(self, image_id: str, component: str) -> Optional[Dict]:
+        """按图像和组件框直接查询单个组件"""
+        row = self.conn.execute("SELECT detail FROM components WHERE image_id = ? AND component = ?",
+                                (image_id, component)).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def __contains__(self, image_id) -> bool:
+        return self.conn.execute("SELECT 1 FROM records WHERE image_id = ?", (image_id,)).fetchone() is not None
+
+    def __getitem__(self, image_id: str) -> Any:
+        record = self.get(image_id, self)
+        if record is self:
+            raise KeyError(image_id)
+        return record
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM records").fetchone()[0]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.keys())
+
+    def keys(self) -> list:
+        return [row[0] for row in self.conn.execute("SELECT image_id FROM records ORDER BY position")]
+
+    def keys_with(self, field: str) -> list:
+        """顶层字段 field 存在且不为 null 的记录的 image_id（不读取组件行）"""
+        return [row[0] for row in self.conn.execute(
+            "SELECT image_id FROM records WHERE json_extract(record, ?) IS NOT NULL ORDER BY position", (f"$.{field}",))]
+
+    def items(self) -> Iterator[Tuple[str, Any]]:
+        """按写入顺序逐条读取全部记录"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT image_id, record FROM records ORDER BY position")
+        for image_id, record_text in cursor:
+            yield image_id, self._assemble(image_id, record_text)
+
+    def values(self) -> Iterator[Any]:
+        for _, record in self.items():
+            yield record
+
+    def load_all(self) -> Dict[str, Any]:
+        return dict(self.items())
+
+    def image_stats(self) -> List[Dict]:
+        """每张图像的组件数、JSON格式正确数和IO匹配数，按图像名排序（字段与 ResultQuery.image_stats 相同）"""
+        rows = self.conn.execute(
+            "SELECT r.image_id, COUNT(c.component), "
+            "IFNULL(SUM(json_extract(c.detail, '$.warning') = 'JSON格式正确'), 0), "
+            "IFNULL(SUM(json_extract(c.detail, '$.io_num_match') = 1), 0) "
+            "FROM records r LEFT JOIN components c ON c.image_id = r.image_id "
+            "GROUP BY r.image_id ORDER BY r.image_id"
+        ).fetchall()
+        return [{"name": image_id, "total_components": total, "json_format_correct": json_ok, "io_matches": io_matches}
+                for image_id, total, json_ok, io_matches in rows]
+
+    # ---- JSON导入导出 ----
+    def import_json(self, json_path: str, batch_size: int = 500) -> int:
+        """流式导入 {image_id: record} 结构的JSON文件，返回导入条数"""
+        count, batch = 0, []
+        for item in iter_json_records(json_path):
+            batch.append(item)
+            if len(batch) >= batch_size:
+                count += self.upsert_many(batch)
+                batch = []
+        if batch:
+            count += self.upsert_many(batch)
+        return count
+
+    def export_json(self, json_path: str, indent: int = 2) -> int:
+        """导出为与 json.dump(indent=indent) 相同格式的JSON文件（原子替换），返回导出条数"""
+        count = 0
+        with JsonRecordWriter(json_path, indent) as writer:
+            for image_id, record in self.items():
+                writer.write(image_id, record)
+                count += 1
+        return count
+
+
+def open_result_db(json_path: str) -> ResultDB:
+    """打开JSON结果文件对应的结果库；库为空而JSON文件已存在时先导入"""
+    db = ResultDB(default_db_path(json_path))
+    if len(db) == 0 and os.path.exists(json_path):
+        count = db.import_json(json_path)
+        print(f"已从 {json_path} 导入 {count} 条记录到结果库 {db.db_path}")
+    return db
+
+
+def main():
+    parser = argparse.ArgumentParser(description="结果库与JSON文件互相转换")
+    parser.add_argument("action", choices=["import", "export"], help="import: JSON导入结果库；export: 结果库导出JSON")
+    parser.add_argument("--json_file", type=str, required=True, help="JSON结果文件路径")
+    parser.add_argument("--db_file", type=str, default="", help="结果库路径，默认与JSON文件同名的 .db 文件")
+    args = parser.parse_args()
+
+    db = ResultDB(args.db_file or default_db_path(args.json_file))
+    if args.action == "import":
+        print(f"已导入 {db.import_json(args.json_file)} 条记录到 {db.db_path}")
+    else:
+        print(f"已导出 {db.export_json(args.json_file)} 条记录到 {args.json_file}")
+
+
+if __name__ == "__main__":
+    main()
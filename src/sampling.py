@@ -0,0 +1,131 @@
+import math
+import random
+from statistics import NormalDist
+from typing import Dict, List, Tuple
+
+# 按图像组件数量分层的区间
+COMPONENT_COUNT_BINS = ((1, 2), (3, 5), (6, 10), (11, None))
+
+
+def wilson_interval(successes: int, n: int, z: float) -> Tuple[float, float]:
+    """二项比例的Wilson置信区间"""
+    if n == 0:
+        return 0.0, 1.0
+    p = successes / n
+    denom = 1 + z * z / n
+    center = (p + z * z / (2 * n)) / denom
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / denom
+    return max(0.0, center - half), min(1.0, center + half)
+
+
+def component_count_stratum(component_count: int) -> str:
+    """按组件数量给图像分层"""
+    for low, high in COMPONENT_COUNT_BINS:
+        if high is None or component_count <= high:
+            if component_count >= low:
+                return f"{low}+" if high is None else f"{low}-{high}"
+    return "0"
+
+
+class SequentialEstimator:
+    """序贯抽样一致率估计
+
+    以组件为抽样单位，按随机顺序（可按图像组件数分层、按比例分配）抽取，
+    每得到一个判定就更新一致率估计和置信区间，区间半宽达到目标时停止。
+    不分层时使用Wilson区间；分层时使用各层Wilson修正比例的加权正态近似。
+    """
+
+    def __init__(self, units: List[Tuple[str, str, str]], half_width: float = 0.03,
+                 confidence: float = 0.95, min_samples: int = 30, stratify: bool = False, seed: int = 0):
+        """
+        Args:
+            units: (image_id, component, stratum) 抽样单位
+            half_width: 目标置信区间半宽
+            confidence: 置信水平
+            min_samples: 达到该样本量前不判断停止
+            stratify: 是否按stratum分层
+            seed: 随机种子，保证抽样顺序可复现
+        """
+        self.half_width = half_width
+        self.confidence = confidence
+        self.min_samples = min_samples
+        self.stratify = stratify
+        self.z = NormalDist().inv_cdf((1 + confidence) / 2)
+
+        rng = random.Random(seed)
+        self.strata = {}
+        for unit in units:
+            stratum = unit[2] if stratify else "all"
+            self.strata.setdefault(stratum, []).append(unit)
+        for stratum_units in self.strata.values():
+            rng.shuffle(stratum_units)
+        self.population = {h: len(u) for h, u in self.strata.items()}
+        self.total = sum(self.population.values())
+        self.drawn = {h: 0 for h in self.strata}
+        self.n = {h: 0 for h in self.strata}
+        self.successes = {h: 0 for h in self.strata}
+
+    def next_unit(self):
+        """按比例分配抽取下一个单位：选择已抽比例最低的层，全部抽完时返回None"""
+        candidates = [h for h in self.strata if self.drawn[h] < self.population[h]]
+        if not candidates:
+            return None
+        stratum = min(candidates, key=lambda h: self.drawn[h] / self.population[h])
+        unit = self.strata[stratum][self.drawn[stratum]]
+        self.drawn[stratum] += 1
+        return unit
+
+    def record(self, unit: Tuple[str, str, str], is_consistent: bool) -> None:
+        """记录一个判定结果"""
+        stratum = unit[2] if self.stratify else "all"
+        self.n[stratum] += 1
+        self.successes[stratum] += int(bool(is_consistent))
+
+    @property
+    def sample_size(self) -> int:
+        return sum(self.n.values())
+
+    def estimate(self) -> Dict:
+        """当前估计值和置信区间"""
+        n = self.sample_size
+        if not self.stratify:
+            successes = self.successes["all"]
+            low, high = wilson_interval(successes, n, self.z)
+            rate = successes / n if n else 0.0
+        else:
+            rate, variance = 0.0, 0.0
+            for h, n_h in self.n.items():
+                weight = self.population[h] / self.total
+                if n_h == 0:
+                    # 尚未抽到的层按最大方差处理
+                    rate += weight * 0.5
+                    variance += weight * weight * 0.25
+                    continue
+                # Wilson修正比例，避免小样本时方差为0
+                p_h = (self.successes[h] + self.z * self.z / 2) / (n_h + self.z * self.z)
+                rate += weight * self.successes[h] / n_h
+                # 有限总体修正：层内抽完时方差为0
+                fpc = (self.population[h] - n_h) / max(self.population[h] - 1, 1)
+                variance += weight * weight * p_h * (1 - p_h) / n_h * fpc
+            half = self.z * math.sqrt(variance)
+            low, high = max(0.0, rate - half), min(1.0, rate + half)
+        return {
+            "consistency_rate": rate,
+            "ci_low": low,
+            "ci_high": high,
+            "half_width": (high - low) / 2,
+            "confidence": self.confidence,
+            "sample_size": n,
+            "population_size": self.total,
+            "strata": {h: {"population": self.population[h], "sampled": self.n[h], "consistent": self.successes[h]}
+                       for h in self.strata}
+        }
+
+    def converged(self) -> bool:
+        """区间半宽达到目标（或已抽完全部单位）"""
+        n = self.sample_size
+        if n >= self.total:
+            return True
+        if n < self.min_samples:
+            return False
+        return self.estimate()["half_width"] <= self.half_width
@@ -0,0 +1,120 @@
+import asyncio
+import signal
+from typing import Callable, Iterable, Optional
+
+
+class GracefulShutdown:
+    """优雅退出控制器
+
+    捕获 SIGINT/SIGTERM 后停止接收新任务，在限定时间内等待在途请求完成，
+    超时后取消剩余任务。再次收到信号时立即取消所有任务。
+    多个阶段共享同一个控制器时（流水线模式）共用一个排空期限，总等待时间不超过 drain_timeout。
+    """
+
+    def __init__(self, drain_timeout: float = 60.0):
+        self.drain_timeout = drain_timeout
+        self.stopping = False
+        self._force = False
+        self._event = None
+        self._loop = None
+        self._installed = []
+        self._users = 0
+        self._deadline = None
+
+    def install(self) -> None:
+        """在当前事件循环上注册信号处理（可被多个并发阶段共享，重复调用只注册一次）"""
+        self._users += 1
+        if self._users > 1:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._event = asyncio.Event()
+        for sig in (signal.SIGINT, getattr(signal, "SIGTERM", None)):
+            if sig is None:
+                continue
+            try:
+                self._loop.add_signal_handler(sig, self.request_stop, sig)
+                self._installed.append((sig, None))
+            except (NotImplementedError, RuntimeError):
+                # Windows 不支持 add_signal_handler，退回到 signal.signal
+                previous = signal.signal(sig, lambda s, f: self._loop.call_soon_threadsafe(self.request_stop, s))
+                self._installed.append((sig, previous))
+
+    def uninstall(self) -> None:
+        """恢复原有的信号处理（最后一个使用者退出时才真正恢复）"""
+        self._users -= 1
+        if self._users > 0:
+            return
+        for sig, previous in self._installed:
+            if previous is None:
+                self._loop.remove_signal_handler(sig)
+            else:
+                signal.signal(sig, previous)
+        self._installed = []
+
+    def request_stop(self, sig=None) -> None:
+        """收到退出信号：第一次进入排空阶段，第二次强制取消"""
+        if self.stopping:
+            print(f"\n再次收到退出信号，立即取消所有在途任务")
+            self._force = True
+        else:
+            print(f"\n收到退出信号，停止接收新任务，最多等待 {self.drain_timeout} 秒完成在途请求...")
+            self.stopping = True
+        if self._event is not None:
+            self._event.set()
+
+    async def wait_all(self, tasks: Iterable[asyncio.Task],
+                       on_done: Optional[Callable[[asyncio.Task], None]] = None) -> None:
+        """等待所有任务完成；收到退出信号后限时排空，超时则取消剩余任务
+
+        Args:
+            tasks: 已创建的任务，任务内部应在开始处理前检查 stopping
+            on_done: 每个任务正常结束后的回调（用于进度条和定期保存）
+        """
+        if self._event is None:
+            self._event = asyncio.Event()
+        pending = set(tasks)
+        stop_waiter = asyncio.ensure_future(self._event.wait())
+
+        def finish(done):
+            for task in done:
+                if task.cancelled():
+                    continue
+                if task.exception() is not None:
+                    print(f"任务异常结束: {task.exception()!r}")
+                if on_done:
+                    on_done(task)
+
+        try:
+            while pending and not self.stopping:
+                done, pending = await asyncio.wait(pending | {stop_waiter}, return_when=asyncio.FIRST_COMPLETED)
+                done.discard(stop_waiter)
+                pending.discard(stop_waiter)
+                finish(done)
+
+            if pending and not self._force:
+                # 排空阶段：排队中的任务会立即返回，在途任务限时完成
+                self._event.clear()
+                stop_waiter.cancel()
+                stop_waiter = asyncio.ensure_future(self._event.wait())
+                loop = asyncio.get_running_loop()
+                # 排空期限从第一个进入排空阶段的使用者开始计算，之后的使用者只等待剩余时间
+                if self._deadline is None:
+                    self._deadline = loop.time() + self.drain_timeout
+                deadline = self._deadline
+                while pending and not self._force:
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    done, pending = await asyncio.wait(pending | {stop_waiter}, timeout=remaining,
+                                                       return_when=asyncio.FIRST_COMPLETED)
+                    done.discard(stop_waiter)
+                    pending.discard(stop_waiter)
+                    finish(done)
+
+            if pending:
+                print(f"取消 {len(pending)} 个未完成的任务")
+                for task in pending:
+                    task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+        finally:
+            stop_waiter.cancel()
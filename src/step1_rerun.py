@@ -1,4 +1,5 @@
 import os
+import copy
 import json
 import asyncio
 import aiohttp
@@ -8,7 +9,9 @@ from tqdm import tqdm
 from src.config import Config
 from src.image_processor import ImageProcessor
 from src.model_client import ModelClient
-from src.utils import get_image_files
+from src.utils import get_image_files, save_json_atomic
+from src.result_db import open_result_db
+from src.shutdown import GracefulShutdown
 import traceback
 
 class ComponentAnalyzer:
@@ -22,13 +25,15 @@ class ComponentAnalyzer:
         self.model1_client = ModelClient(
             api_base=config.model1_api,
             api_key=config.model1_key,
-            model=config.model1_model
+            model=config.model1_model,
+            structured_output=config.structured_output
         )
         
         self.model2_client = ModelClient(
             api_base=config.model2_api,
             api_key=config.model2_key,
-            model=config.model2_model
+            model=config.model2_model,
+            structured_output=config.structured_output
         )
         
         # 结果存储
@@ -40,9 +45,18 @@ class ComponentAnalyzer:
         os.makedirs(self.config.output_dir, exist_ok=True)
         self.model_analysis_path = os.path.join(self.config.output_dir, "model_analysis.json")
 
-        if os.path.exists(self.model_analysis_path):
+        # 结果库模式：每张图像完成后单独写入SQLite，不再反复重写整个JSON文件
+        self.result_db = open_result_db(self.model_analysis_path) if self.config.result_db else None
+
+        if self.result_db is not None or os.path.exists(self.model_analysis_path):
             self.load_results()
 
+        # 优雅退出控制
+        self.shutdown = GracefulShutdown(self.config.drain_timeout)
+
+        # 流水线模式下，每完成一张图像就推送到该队列供第二步消费
+        self.result_queue = None
+
         self.old_results_path = self.config.old_results_path
         self.old_results = {}
         if os.path.exists(self.old_results_path):
@@ -131,6 +145,7 @@ class ComponentAnalyzer:
             # 保存模型分析结果
             self.model1_circuit_analyses[image_id] = model1_analysis
             self.convert_model_results()
+            self._persist_result(image_id)
             
             print(f"  完成图像 {image_id} 处理")
         except Exception as e:
@@ -159,7 +174,7 @@ class ComponentAnalyzer:
     async def run(self) -> Dict:
         """运行组件分析流程"""
         # 获取所有图像文件
-        image_files = get_image_files(self.config.image_root_dir)
+        image_files = get_image_files(self.config.image_root_dir, self.config.image_manifest)
         
         if not image_files:
             raise Exception(f"在目录 {self.config.image_root_dir} 中未找到图像文件")
@@ -171,37 +186,65 @@ class ComponentAnalyzer:
         
         async def process_with_semaphore(image_path):
             async with semaphore:
+                # 收到退出信号后不再接收新图像
+                if self.shutdown.stopping:
+                    return
                 await self._process_image(session, image_path)
+                # 在并发名额内推送：第二步积压时队列已满，第一步随之暂停
+                await self._emit_result(image_path)
         
         # 异步处理所有图像
-        async with aiohttp.ClientSession() as session:
-            # 创建所有任务
-            tasks = [process_with_semaphore(image_path) for image_path in image_files]
-            
-            # 使用asyncio.as_completed来正确显示进度
-            completed = 0
-            with tqdm(total=len(tasks), desc="处理图像") as pbar:
-                for coro in asyncio.as_completed(tasks):
-                    await coro
-                    completed += 1
-                    pbar.update(1)
+        self.shutdown.install()
+        try:
+            async with aiohttp.ClientSession() as session:
+                # 创建所有任务
+                tasks = [asyncio.ensure_future(process_with_semaphore(image_path)) for image_path in image_files]
+                
+                completed = 0
+                with tqdm(total=len(tasks), desc="处理图像") as pbar:
+                    def on_done(task):
+                        nonlocal completed
+                        completed += 1
+                        pbar.update(1)
+                        
+                        # 每处理10张图片就保存一次（结果库模式下已逐张写入）
+                        if completed % 10 == 0 and self.result_db is None:
+                            self._save_results()
                     
-                    # 每处理10张图片就保存一次
-                    if completed % 10 == 0:
-                        self._save_results()
-        
-        # 保存结果
-        result_paths = self._save_results()
+                    await self.shutdown.wait_all(tasks, on_done)
+        finally:
+            self.shutdown.uninstall()
+            # 保存结果（包括被中断时已完成的图像）
+            result_paths = self._save_results()
+            if self.result_queue is not None:
+                await self.result_queue.put(None)
         
         return result_paths
     
+    async def _emit_result(self, image_path: str) -> None:
+        """流水线模式：将已完成图像的分析结果副本推送给第二步"""
+        if self.result_queue is None:
+            return
+        image_id = image_path.replace('\\', '/')
+        if image_id in self.all_results:
+            # 深拷贝，避免第二步写入的评估结果混入第一步的输出文件
+            await self.result_queue.put((image_id, copy.deepcopy(self.all_results[image_id])))
+
+    def _persist_result(self, image_id: str) -> None:
+        """结果库模式：单张图像完成后立即写入该图像的记录"""
+        if self.result_db is not None and image_id in self.all_results:
+            self.result_db.upsert(image_id, self.all_results[image_id])
+
     def _save_results(self) -> Dict[str, str]:
         """保存分析结果，仅保存最终分析结果，不保存components列表"""
         # 保存模型1分析结果
 
 
-        with open(self.model_analysis_path, 'w', encoding='utf-8') as f:
-            json.dump(self.all_results, f, ensure_ascii=False, indent=2)
+        if self.result_db is not None:
+            # 结果库中已是最新结果，导出JSON供第二步和下游工具使用
+            self.result_db.export_json(self.model_analysis_path)
+        else:
+            save_json_atomic(self.model_analysis_path, self.all_results)
         
         print(f"\n分析结果保存完成:")
         print(f"- 模型分析结果: {self.model_analysis_path}")
@@ -212,6 +255,9 @@ class ComponentAnalyzer:
     def load_results(self) -> None:
         """加载评估结果"""
         print(f"加载模型分析结果: {self.model_analysis_path}")
+        if self.result_db is not None:
+            self.all_results = self.result_db.load_all()
+            return
         try:
             with open(self.model_analysis_path, 'r', encoding='utf-8') as f:
                 self.all_results = json.load(f)
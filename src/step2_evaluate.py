@@ -8,12 +8,22 @@ from tqdm import tqdm
 from src.config import Config
 from src.model_client import ModelClient
 from src.image_processor import ImageProcessor
+from src.utils import save_json_atomic
+from src.image_index import get_image_index
+from src.component_compare import ComponentComparator
+from src.graph_consistency import GraphConsistencyScorer
+from src.sampling import SequentialEstimator, component_count_stratum
+from src.shutdown import GracefulShutdown
+from src.json_stream import JsonRecordStore, JsonRecordJournal, iter_json_records
+from src.json_extract import extract_json, extract_summary
+from config.schemas import CONSISTENCY_VERDICT_SCHEMA, COMPONENT_CONSISTENCY_SCHEMA, COMPONENT_CONSISTENCY_BATCH_SCHEMA
+from src.result_db import ResultDB, default_db_path, open_result_db
 import traceback
 
 class ConsistencyEvaluator:
     """一致性评估器，实现两步评估的第二步"""
     
-    def __init__(self, config: Config, result_paths: Dict[str, str]):
+    def __init__(self, config: Config, result_paths: Dict[str, str], step1_results: Dict = None):
         self.config = config
         self.prompts_data = self.config.prompts
         self.result_paths = result_paths
@@ -22,22 +32,45 @@ class ConsistencyEvaluator:
         self.evaluator_client = ModelClient(
             api_base=config.evaluator_api,
             api_key=config.evaluator_key,
-            model=config.evaluator_model
+            model=config.evaluator_model,
+            structured_output=config.structured_output
         )
         
         # 结果存储
         self.consistency_results = []
         self.component_consistency_results = {}  # 按组件的一致性结果
 
-        self.step1_results = self._load_model_analyses()
-        self.step2_results = {}
+        # 流水线模式下由第一步逐张推送，不再从文件加载
+        self.step1_results = self._load_model_analyses() if step1_results is None else step1_results
         
         # 确保输出目录存在
         os.makedirs(self.config.output_dir, exist_ok=True)
         self.component_consistency_path = os.path.join(self.config.output_dir, "component_consistency_results.json")
+        self.sampling_results_path = os.path.join(self.config.output_dir, "component_consistency_sampling.json")
 
-        if os.path.exists(self.component_consistency_path):
-            self.load_results()
+        # 每张图像评估完成后立即落盘，内存中只保留已完成的图像ID：
+        # 结果库模式写入SQLite，否则追加到结果文件的更新日志，结束时合并为JSON
+        self.result_db = open_result_db(self.component_consistency_path) if self.config.result_db else None
+        self.result_journal = JsonRecordJournal(self.component_consistency_path) if self.result_db is None else None
+        self.completed_ids = self._load_completed_ids()
+
+        # 优雅退出控制
+        self.shutdown = GracefulShutdown(self.config.drain_timeout)
+
+        # 图像路径索引，与第一步的 get_image_files 共享
+        self.image_index = get_image_index(self.config.image_root_dir, self.config.image_manifest)
+
+        # 所有图像共享的评估模型并发限制（在run中创建）
+        self.evaluator_semaphore = None
+
+        # 评估引擎：llm 使用评估模型逐组件判断，graph 使用本地图结构评分
+        self.graph_scorer = GraphConsistencyScorer() if self.config.eval_engine == "graph" else None
+
+        # 批量评估统计
+        self.batch_stats = {"batch_requests": 0, "batched_pairs": 0, "fallback_pairs": 0}
+
+        # 本地快速比较器
+        self.comparator = ComponentComparator(self.config.fast_path_mismatch_score) if self.config.fast_path_compare else None
     
     def _load_prompts(self) -> Dict[str, str]:
         """加载提示词"""
@@ -50,11 +83,12 @@ class ConsistencyEvaluator:
     def _load_model_analyses(self) -> tuple:
         """加载两个模型的分析结果"""
         try:
-            # 加载模型1分析结果
-            with open(self.result_paths["model_analysis"], 'r', encoding='utf-8') as f:
-                model_analyses = json.load(f)
-            
-            return model_analyses
+            db_path = default_db_path(self.result_paths["model_analysis"])
+            if self.config.result_db and os.path.exists(db_path):
+                # 直接从第一步的结果库按需读取
+                return ResultDB(db_path)
+            # 按字节偏移索引按需读取单条记录，不把整个文件载入内存
+            return JsonRecordStore(self.result_paths["model_analysis"])
         except Exception as e:
             raise Exception(f"加载模型分析结果失败: {str(e)}")
     
@@ -90,19 +124,26 @@ class ConsistencyEvaluator:
         
         return True, None
     
+    @staticmethod
+    def _model_pair(details: Dict) -> Tuple[Dict, Dict]:
+        """组件的两个模型分析结果；已写入的 eval_result 不是模型，不足两个模型时抛出 ValueError"""
+        model_name = [k for k in details.keys() if k != "eval_result"]
+        if len(model_name) < 2:
+            raise ValueError(f"组件只有 {len(model_name)} 个模型的分析结果")
+        return details[model_name[0]], details[model_name[1]]
+
     def _get_image_path(self, image_id: str) -> str:
         """获取图像的完整路径"""
-        # 尝试直接在图像根目录查找
+        # 通过启动时建立的索引按相对路径或文件名查找
+        image_path = self.image_index.resolve(image_id)
+        if image_path:
+            return image_path
+        
+        # 索引建立后新增的文件
         direct_path = os.path.join(self.config.image_root_dir, image_id)
         if os.path.exists(direct_path):
             return direct_path
         
-        # 尝试在子目录中查找
-        for root, dirs, files in os.walk(self.config.image_root_dir):
-            for file in files:
-                if file == image_id or file == os.path.basename(image_id):
-                    return os.path.join(root, file)
-        
         # 如果找不到，返回原始ID（可能导致后续处理错误，但能提供明确的错误信息）
         print(f"警告: 找不到图像 {image_id} 的路径")
         return os.path.join(self.config.image_root_dir, image_id)
@@ -158,7 +199,8 @@ class ConsistencyEvaluator:
                     json.dumps(model1_analysis, ensure_ascii=False),
                     json.dumps(model2_analysis, ensure_ascii=False),
                     image_base64,
-                    temperature=0.1
+                    temperature=0.1,
+                    json_schema=CONSISTENCY_VERDICT_SCHEMA
                 )
             else:
                 print(f"不使用图像进行评估: {image_id}")
@@ -168,7 +210,8 @@ class ConsistencyEvaluator:
                     "评估两个模型分析的一致性",
                     json.dumps(model1_analysis, ensure_ascii=False),
                     json.dumps(model2_analysis, ensure_ascii=False),
-                    temperature=0.1
+                    temperature=0.1,
+                    json_schema=CONSISTENCY_VERDICT_SCHEMA
                 )
             
             if "error" in result:
@@ -198,36 +241,16 @@ class ConsistencyEvaluator:
                 content_preview = result["content"][:100] + "..." if len(result["content"]) > 100 else result["content"]
                 print(f"评估响应预览 ({image_id}): {content_preview}")
                 
-                # 直接解析整个响应
-                try:
-                    eval_result = json.loads(result["content"])
-                    if "is_consistent" in eval_result and "reason" in eval_result:
-                        return {
-                            "image_id": image_id,
-                            "is_consistent": eval_result["is_consistent"],
-                            "reason": eval_result["reason"],
-                            "json_valid": True,
-                            "used_image": image_base64 is not None
-                        }
-                except json.JSONDecodeError:
-                    pass
-                
-                # 如果上面失败，尝试从文本中提取JSON
-                match = re.search(r'\{.*\}', result["content"], re.DOTALL)
-                if match:
-                    try:
-                        json_str = match.group(0)
-                        eval_result = json.loads(json_str)
-                        if "is_consistent" in eval_result and "reason" in eval_result:
-                            return {
-                                "image_id": image_id,
-                                "is_consistent": eval_result["is_consistent"],
-                                "reason": eval_result["reason"],
-                                "json_valid": True,
-                                "used_image": image_base64 is not None
-                            }
-                    except json.JSONDecodeError:
-                        pass
+                # 提取包含 is_consistent 和 reason 的JSON对象
+                eval_result, _ = extract_json(result["content"], expect=dict, required_keys=("is_consistent", "reason"))
+                if eval_result is not None:
+                    return {
+                        "image_id": image_id,
+                        "is_consistent": eval_result["is_consistent"],
+                        "reason": eval_result["reason"],
+                        "json_valid": True,
+                        "used_image": image_base64 is not None
+                    }
                 
                 # 如果都失败了，尝试简单解析响应中的一致性信息
                 is_consistent = "yes" in result["content"].lower() or "true" in result["content"].lower()
@@ -336,7 +359,9 @@ class ConsistencyEvaluator:
                 image_base64,
                 temperature=0.1,
                 enforce_json=True,
-                max_tokens=self.config.max_tokens
+                max_tokens=self.config.max_tokens,
+                json_schema=COMPONENT_CONSISTENCY_SCHEMA,
+                schema_name="component_consistency"
             )
             
             if "error" in result:
@@ -347,49 +372,10 @@ class ConsistencyEvaluator:
             try:
                 content = result["content"]
                 
-                # 首先，检查返回内容是否包含markdown代码块标记
-                if "```" in content:
-                    # 尝试提取markdown代码块中的JSON
-                    code_block_pattern = r'```(?:json)?\s*([\s\S]*?)\s*```'
-                    match = re.search(code_block_pattern, content)
-                    if match:
-                        content = match.group(1)
-                
-                # 尝试直接解析为JSON
-                try:
-                    eval_result = json.loads(content)
+                # 提取JSON对象（代码块、尾随逗号、单引号等由共用提取器处理）
+                eval_result, _ = extract_json(content, expect=dict)
+                if eval_result is not None:
                     return eval_result
-                except json.JSONDecodeError:
-                    pass
-                
-                # 尝试从文本中提取JSON
-                match = re.search(r'\{.*\}', content, re.DOTALL)
-                if match:
-                    try:
-                        json_str = match.group(0)
-                        eval_result = json.loads(json_str)
-                        return eval_result
-                    except json.JSONDecodeError:
-                        pass
-                
-                # 尝试修复常见的JSON格式问题后重新解析
-                if content.strip().startswith("{") and "}" in content:
-                    try:
-                        # 提取从开始的'{'到最后的'}'之间的内容
-                        start_idx = content.find("{")
-                        end_idx = content.rfind("}") + 1
-                        if start_idx != -1 and end_idx != -1:
-                            json_str = content[start_idx:end_idx]
-                            # 尝试修复常见的JSON格式问题
-                            # 1. 替换单引号为双引号
-                            json_str = json_str.replace("'", "\"")
-                            # 2. 确保属性名使用双引号
-                            json_str = re.sub(r'(\w+):', r'"\1":', json_str)
-                            
-                            eval_result = json.loads(json_str)
-                            return eval_result
-                    except json.JSONDecodeError:
-                        pass
                 
                 print(f"无法解析组件一致性评估结果，将返回默认值")
                 print(f"原始响应: {content[:200]}...")
@@ -419,12 +405,95 @@ class ConsistencyEvaluator:
                                        "consistency_score": 0,
                                        "reasoning": f"处理组件对时出错: {str(traceback.format_exc())}"})
     
+    def _estimate_result_tokens(self, model1_details: Dict, model2_details: Dict) -> int:
+        """粗略估计单个组件对评估结果的输出token数，连接越多理由越长"""
+        details_len = len(json.dumps(model1_details, ensure_ascii=False)) + len(json.dumps(model2_details, ensure_ascii=False))
+        return 150 + details_len // 16
+
+    def _pack_component_batches(self, pending_pairs: List[Tuple]) -> List[List[Tuple]]:
+        """按max_tokens和输出token估计把组件对打包，每批最多eval_batch_size个"""
+        # 预留部分输出预算给JSON结构本身
+        token_budget = int(self.config.max_tokens * 0.8)
+        batches = []
+        current, current_tokens = [], 0
+        for item in pending_pairs:
+            tokens = self._estimate_result_tokens(item[1], item[2])
+            if current and (len(current) >= self.config.eval_batch_size or current_tokens + tokens > token_budget):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(item)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    async def _evaluate_component_batch(self, session, image_path: str, batch: List[Tuple]) -> Dict[str, Dict]:
+        """在一次请求中评估同一图像的多个组件对，返回解析成功的 {component: 评估结果}"""
+        try:
+            try:
+                image_base64 = ImageProcessor.encode_image(image_path)
+            except Exception as e:
+                print(f"警告: 无法加载图像 {image_path}: {str(e)}")
+                image_base64 = None
+
+            component_blocks = "\n\n".join(
+                f"### Component {i + 1}: \"{component}\"\n"
+                f"Model 1 Analysis:\n{json.dumps(model1_details, ensure_ascii=False)}\n"
+                f"Model 2 Analysis:\n{json.dumps(model2_details, ensure_ascii=False)}"
+                for i, (component, model1_details, model2_details) in enumerate(batch)
+            )
+            batch_prompt = self.prompts_data["component_consistency_batch_prompt"].format(
+                component_count=len(batch), component_blocks=component_blocks)
+
+            self.batch_stats["batch_requests"] += 1
+            self.batch_stats["batched_pairs"] += len(batch)
+            result = await self.evaluator_client.generate(
+                session,
+                batch_prompt,
+                f"评估 {len(batch)} 个组件连接关系的一致性",
+                image_base64,
+                temperature=0.1,
+                enforce_json=True,
+                max_tokens=self.config.max_tokens,
+                json_schema=COMPONENT_CONSISTENCY_BATCH_SCHEMA,
+                schema_name="component_consistency_batch"
+            )
+            if "error" in result or not result.get("content"):
+                print(f"批量组件一致性评估时出错: {result.get('error', '模型返回的内容为空')}")
+                return {}
+
+            parsed, _ = extract_json(result["content"], expect=dict, required_keys=("results",))
+            if parsed is None:
+                parsed, _ = extract_json(result["content"], expect=list)
+            entries = parsed.get("results", []) if isinstance(parsed, dict) else parsed
+
+            expected = {item[0] for item in batch}
+            batch_results = {}
+            for entry in entries if isinstance(entries, list) else []:
+                if not isinstance(entry, dict):
+                    continue
+                component = str(entry.get("component_pair", ""))
+                if component not in expected or component in batch_results:
+                    continue
+                if not isinstance(entry.get("consistency_score"), (int, float)) or "is_consistent" not in entry:
+                    continue
+                batch_results[component] = entry
+            return batch_results
+        except Exception as e:
+            print(f"解析批量组件一致性评估结果时出错: {str(e)}")
+            return {}
+
     async def _evaluate_component_consistency(self, session, image_id: str) -> Dict:
         """评估同一图像中每个组件的分析一致性"""
-        model_analysis = self.step1_results[image_id]
-        if image_id in self.step2_results and self.step2_results[image_id].get("score_details") and len(self.step2_results[image_id].get("score_details"))>0:
-            print(f"图像 {image_id} 的组件级一致性评估结果已存在,{self.step2_results[image_id].get('score_details')}")
+        if image_id in self.completed_ids:
+            print(f"图像 {image_id} 的组件级一致性评估结果已存在，跳过")
             return 
+        model_analysis = self.step1_results[image_id]
+        if self.graph_scorer is not None:
+            # 图结构评分引擎：本地计算，不调用评估模型
+            model_analysis['total_eval_result'] = dict(self.graph_scorer.score_image(model_analysis), image_id=image_id)
+            self._persist_result(image_id, model_analysis)
+            return
         try:
             # print(f"\n评估图像 {image_id} 的组件级一致性")
 
@@ -433,16 +502,54 @@ class ConsistencyEvaluator:
             image_path = self._get_image_path(image_id)
             component_pairs=list(model_analysis["component_details"].keys())
             
-            # 逐对评估组件一致性
+            # 并发评估所有组件对，受共享的评估模型并发限制约束
             print(f"  评估 {len(component_pairs)} 对组件的一致性...")
-            component_results = []
+            if self.evaluator_semaphore is None:
+                self.evaluator_semaphore = asyncio.Semaphore(self.config.evaluator_workers)
             
-            for component in tqdm(component_pairs, desc=f"  组件对评估"):
-                model_name = list(model_analysis["component_details"][component].keys())
-                model1_details = model_analysis["component_details"][component][model_name[0]]
-                model2_details = model_analysis["component_details"][component][model_name[1]]
-                result = await self._evaluate_component_pair(session, image_path, component, model1_details, model2_details)
-                component_results.append(result)
+            with tqdm(total=len(component_pairs), desc=f"  组件对评估") as pbar:
+                pair_results = {}
+                pending_pairs = []
+                for component in component_pairs:
+                    model1_details, model2_details = self._model_pair(model_analysis["component_details"][component])
+                    # 先用本地比较器判定明显一致/不一致的组件对，只有中间地带才调用评估模型
+                    result = self.comparator.compare(component, model1_details, model2_details) if self.comparator else None
+                    if result is None:
+                        pending_pairs.append((component, model1_details, model2_details))
+                    else:
+                        pair_results[component] = result
+                        pbar.update(1)
+
+                async def evaluate_pair(component, model1_details, model2_details):
+                    async with self.evaluator_semaphore:
+                        pair_results[component] = await self._evaluate_component_pair(session, image_path, component, model1_details, model2_details)
+                    pbar.update(1)
+
+                async def evaluate_batch(batch):
+                    if len(batch) == 1:
+                        await evaluate_pair(*batch[0])
+                        return
+                    async with self.evaluator_semaphore:
+                        batch_results = await self._evaluate_component_batch(session, image_path, batch)
+                    pair_results.update(batch_results)
+                    pbar.update(len(batch_results))
+                    # 批量结果中缺失或无法解析的组件对退回单个评估
+                    fallback = [item for item in batch if item[0] not in batch_results]
+                    if fallback:
+                        self.batch_stats["fallback_pairs"] += len(fallback)
+                        print(f"  批量评估缺少 {len(fallback)}/{len(batch)} 个组件结果，改为逐个评估")
+                        await asyncio.gather(*[evaluate_pair(*item) for item in fallback])
+
+                if self.config.eval_batch_size > 1:
+                    batches = self._pack_component_batches(pending_pairs)
+                    await asyncio.gather(*[evaluate_batch(batch) for batch in batches])
+                else:
+                    await asyncio.gather(*[evaluate_pair(*item) for item in pending_pairs])
+                
+                # 保持与component_pairs相同的顺序
+                component_results = [pair_results[c] for c in component_pairs]
+            
+            for component, result in zip(component_pairs, component_results):
                 model_analysis["component_details"][component]['eval_result'] = result
                 
             
@@ -477,21 +584,33 @@ class ConsistencyEvaluator:
         
 
         model_analysis['total_eval_result'] = result
-        self.step2_results[image_id] = model_analysis
+        self._persist_result(image_id, model_analysis)
         return 
     
-    async def run(self) -> None:
-        """运行一致性评估流程"""        
+    async def run(self, queue: asyncio.Queue = None) -> None:
+        """运行一致性评估流程
+
+        Args:
+            queue: 流水线模式下第一步的结果队列，元素为 (image_id, model_analysis)，以 None 结束；
+                   为 None 时评估已加载的全部第一步结果
+        """        
         # 获取共同的图像ID列表
         common_image_ids = set(self.step1_results.keys())
         
-        if not common_image_ids:
-            raise Exception("没有找到两个模型共同分析的图像")
-        
-        print(f"发现 {len(common_image_ids)} 个共同分析的图像")
+        if queue is None:
+            if not common_image_ids:
+                raise Exception("没有找到两个模型共同分析的图像")
+            
+            print(f"发现 {len(common_image_ids)} 个共同分析的图像")
         
         # 创建信号量限制并发
         semaphore = asyncio.Semaphore(self.config.num_workers)
+        self.evaluator_semaphore = asyncio.Semaphore(self.config.evaluator_workers)
+        
+        if queue is None and self.config.sampling_mode:
+            # 抽样模式：只估计一致率，达到目标精度即停止
+            await self._run_sampling()
+            return
         
         # 判断是否进行组件级评估
         use_component_level = True  # 设置为True启用组件级评估
@@ -500,53 +619,187 @@ class ConsistencyEvaluator:
             # 组件级评估
             print("\n使用组件级别一致性评估...")
 
-            completed_count = 0  # 新增：已完成数量
-            save_interval = 5   # 新增：每多少次保存一次
-            lock = asyncio.Lock()  # 新增：用于保护 completed_count 的锁
+            completed_count = 0
+            total_images = len(common_image_ids)
+            lock = asyncio.Lock()
 
             tasks = []
             
             # 异步处理所有图像
-            async with aiohttp.ClientSession() as session:
-                async def evaluate_components_with_semaphore(image_id):
-                    nonlocal completed_count
-                    async with semaphore:
-                        await self._evaluate_component_consistency(
-                            session, 
-                            image_id,
-                        )
-                        async with lock:
-                            completed_count += 1
-                            total_images = len(common_image_ids)
-                            print(f"  完成图像 {image_id} 的组件级一致性评估 ({completed_count}/{total_images})")
-                            # 每save_interval次保存一次
-                            if completed_count % save_interval == 0:
-                                self._save_results()
-
-                for image_id in common_image_ids:
-                    tasks.append(evaluate_components_with_semaphore(image_id))
-                
-                # 执行所有任务
-                await asyncio.gather(*tasks)
+            self.shutdown.install()
+            try:
+                async with aiohttp.ClientSession() as session:
+                    async def evaluate_components_with_semaphore(image_id):
+                        nonlocal completed_count
+                        try:
+                            async with semaphore:
+                                # 收到退出信号后不再接收新图像
+                                if self.shutdown.stopping:
+                                    return
+                                # 评估完成时结果已落盘
+                                await self._evaluate_component_consistency(
+                                    session, 
+                                    image_id,
+                                )
+                                async with lock:
+                                    completed_count += 1
+                                    print(f"  完成图像 {image_id} 的组件级一致性评估 ({completed_count}/{total_images})")
+                        finally:
+                            if queue is not None:
+                                # 流水线模式：第一步推送的记录用完即释放
+                                self.step1_results.pop(image_id, None)
+
+                    if queue is None:
+                        for image_id in common_image_ids:
+                            tasks.append(asyncio.ensure_future(evaluate_components_with_semaphore(image_id)))
+                    else:
+                        # 流水线模式：第一步每完成一张图像就立即开始评估；
+                        # 只在有空闲并发名额时取下一张，积压留在有界队列中使第一步暂停
+                        slots = asyncio.Semaphore(self.config.num_workers)
+                        while True:
+                            await slots.acquire()
+                            item = await queue.get()
+                            if item is None:
+                                break
+                            image_id, model_analysis = item
+                            self.step1_results[image_id] = model_analysis
+                            total_images += 1
+                            task = asyncio.ensure_future(evaluate_components_with_semaphore(image_id))
+                            task.add_done_callback(lambda _: slots.release())
+                            tasks.append(task)
+                    
+                    # 执行所有任务，收到退出信号时限时排空
+                    await self.shutdown.wait_all(tasks)
+            finally:
+                self.shutdown.uninstall()
+                # 保存结果（包括被中断时已完成的图像）
+                self._save_results()
+                if self.comparator:
+                    print(self.comparator.summary())
+                print(extract_summary())
+                if self.config.eval_batch_size > 1:
+                    print(f"批量评估: {self.batch_stats['batch_requests']} 次请求覆盖 {self.batch_stats['batched_pairs']} 个组件对，"
+                          f"{self.batch_stats['fallback_pairs']} 个退回逐个评估")
             
         else:
             pass 
- 
-        # 保存结果
-        self._save_results()
     
+    async def _run_sampling(self) -> Dict:
+        """序贯抽样评估：随机抽取组件判断一致性，置信区间半宽达到目标时提前停止"""
+        units = []
+        for image_id, model_analysis in self.step1_results.items():
+            component_details = model_analysis.get("component_details", {})
+            stratum = component_count_stratum(len(component_details))
+            units.extend((image_id, component, stratum) for component in component_details)
+        if not units:
+            raise Exception("没有可抽样的组件")
+
+        estimator = SequentialEstimator(
+            units,
+            half_width=self.config.sampling_half_width,
+            confidence=self.config.sampling_confidence,
+            min_samples=self.config.sampling_min_samples,
+            stratify=self.config.sampling_stratify,
+            seed=self.config.sampling_seed
+        )
+        print(f"\n抽样模式: 共 {len(units)} 个组件，目标置信区间半宽 {self.config.sampling_half_width}"
+              f"（置信水平 {self.config.sampling_confidence}{'，按组件数分层' if self.config.sampling_stratify else ''}）")
+
+        samples = []
+        skipped = 0
+
+        async def evaluate_unit(unit):
+            """返回 (unit, result, error)；单个组件出错时只跳过该组件，不中断抽样"""
+            image_id, component, _ = unit
+            try:
+                details = self.step1_results[image_id]["component_details"][component]
+                model1_details, model2_details = self._model_pair(details)
+                result = self.comparator.compare(component, model1_details, model2_details) if self.comparator else None
+                if result is None:
+                    async with self.evaluator_semaphore:
+                        result = await self._evaluate_component_pair(session, self._get_image_path(image_id), component, model1_details, model2_details)
+                return unit, result or {}, None
+            except Exception as e:
+                print(f"抽样评估组件出错 ({image_id}, {component}): {str(e)}")
+                return unit, None, str(e)
+
+        self.shutdown.install()
+        try:
+            async with aiohttp.ClientSession() as session:
+                in_flight = set()
+                stopped = False
+                with tqdm(total=len(units), desc="抽样评估") as pbar:
+                    while True:
+                        # 保持评估模型并发跑满，收敛或收到退出信号后不再抽取
+                        while not stopped and len(in_flight) < self.config.evaluator_workers:
+                            unit = estimator.next_unit()
+                            if unit is None:
+                                break
+                            in_flight.add(asyncio.ensure_future(evaluate_unit(unit)))
+                        if not in_flight:
+                            break
+                        done, in_flight = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+                        for task in done:
+                            unit, result, error = task.result()
+                            if error is not None:
+                                # 无法评估的组件不计入估计，单独记录
+                                skipped += 1
+                                samples.append({"image_id": unit[0], "component": unit[1], "stratum": unit[2], "error": error})
+                                pbar.update(1)
+                                continue
+                            is_consistent = result.get("consistency_score", 0) >= 85
+                            estimator.record(unit, is_consistent)
+                            samples.append({"image_id": unit[0], "component": unit[1], "stratum": unit[2],
+                                            "is_consistent": is_consistent, "eval_result": result})
+                            pbar.update(1)
+                        if not stopped and (estimator.converged() or self.shutdown.stopping):
+                            # 已发出的请求继续完成，其结果同样计入估计
+                            stopped = True
+                            estimate = estimator.estimate()
+                            pbar.set_postfix(rate=f"{estimate['consistency_rate']:.3f}", hw=f"{estimate['half_width']:.3f}")
+        finally:
+            self.shutdown.uninstall()
+
+        estimate = estimator.estimate()
+        estimate["skipped"] = skipped
+        print(f"一致率估计: {estimate['consistency_rate']:.4f}，{int(estimate['confidence'] * 100)}% 置信区间 "
+              f"[{estimate['ci_low']:.4f}, {estimate['ci_high']:.4f}]，样本 {estimate['sample_size']}/{estimate['population_size']}"
+              f"{f'，跳过无法评估的组件 {skipped} 个' if skipped else ''}")
+        if self.comparator:
+            print(self.comparator.summary())
+        save_json_atomic(self.sampling_results_path, {"estimate": estimate, "samples": samples})
+        print(f"抽样评估结果已保存到 {self.sampling_results_path}")
+        return estimate
+
+    def _load_completed_ids(self) -> set:
+        """已有结果中已完成评估（有 total_eval_result）的图像ID，用于断点续跑"""
+        if self.result_db is not None:
+            return set(self.result_db.keys_with("total_eval_result"))
+        completed = set()
+        if os.path.exists(self.component_consistency_path):
+            # 逐条扫描，内存中只保留图像ID
+            for image_id, record in iter_json_records(self.component_consistency_path):
+                if isinstance(record, dict) and record.get("total_eval_result"):
+                    completed.add(image_id)
+        # 上次运行中断时尚未合并的日志记录都已完成评估
+        completed.update(self.result_journal.keys())
+        return completed
+
+    def _persist_result(self, image_id: str, record: Dict) -> None:
+        """单张图像评估完成后立即写入：结果库模式写入SQLite，否则追加到更新日志"""
+        if self.result_db is not None:
+            self.result_db.upsert(image_id, record)
+        else:
+            self.result_journal.append(image_id, record)
+        self.completed_ids.add(image_id)
+
     def _save_results(self) -> None:
-        """保存评估结果"""
-        # 判断使用哪种结果
-        print("save results to",self.component_consistency_path)
-        if self.step2_results:
-            # 保存组件级一致性评估结果
-            with open(self.component_consistency_path, 'w', encoding='utf-8') as f:
-                json.dump(self.step2_results, f, ensure_ascii=False, indent=2)
-            print(f"组件级一致性评估结果已保存到 {self.component_consistency_path}")
-
-    def load_results(self) -> None:
-        """加载评估结果"""
-        with open(self.component_consistency_path, 'r', encoding='utf-8') as f:
-            self.step2_results = json.load(f)
-        
\ No newline at end of file
+        """保存评估结果：把本次（及以前中断时）的增量结果流式合并到JSON文件"""
+        if self.result_db is not None:
+            # 结果库中已是最新结果，导出JSON供下游工具使用
+            if len(self.result_db):
+                self.result_db.export_json(self.component_consistency_path)
+                print(f"组件级一致性评估结果已导出到 {self.component_consistency_path}")
+        elif len(self.result_journal):
+            count = self.result_journal.compact()
+            print(f"组件级一致性评估结果已保存到 {self.component_consistency_path}（本次合并 {count} 条）")
@@ -2,6 +2,7 @@ import os
 import json
 import argparse
 from src.config import Config
+from src.image_index import get_image_index
 
 def load_config(config_path: str) -> dict:
     """从JSON文件加载配置"""
@@ -11,23 +12,18 @@ def load_config(config_path: str) -> dict:
     except Exception as e:
         raise Exception(f"加载配置文件失败: {str(e)}")
 
-def get_image_files(image_root: str) -> list:
-    """获取图像目录中的所有图像文件"""
-    image_files = []
-    
-    # 支持的图像文件扩展名
-    image_extensions = ['.jpg', '.jpeg', '.png', '.bmp', '.gif', '.tif', '.tiff']
-    
-    # 遍历图像目录
-    for root, _, files in os.walk(image_root):
-        for file in files:
-            # 检查文件扩展名
-            if any(file.lower().endswith(ext) for ext in image_extensions):
-                # 获取相对路径
-                rel_path = os.path.relpath(os.path.join(root, file), image_root)
-                image_files.append(rel_path)
-    
-    return image_files
+def save_json_atomic(path: str, data) -> None:
+    """原子写入JSON文件：先写入临时文件并刷盘，再替换目标文件，避免中断时留下半截JSON"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+def get_image_files(image_root: str, manifest_path: str = "") -> list:
+    """获取图像目录中的所有图像文件（使用共享的图像索引，目录只遍历一次）"""
+    return list(get_image_index(image_root, manifest_path).rel_paths)
 
 def parse_args():
     """解析命令行参数"""
@@ -42,13 +38,44 @@ def parse_args():
                       help="图像根目录路径")
     parser.add_argument("--output-dir", type=str,
                       help="输出目录路径")
+    parser.add_argument("--image-manifest", type=str,
+                      help="图像清单文件路径（存在时跳过目录遍历，不存在时遍历后写入）")
     parser.add_argument("--workers", type=int,
                       help="并发工作线程数")
+    parser.add_argument("--evaluator-workers", type=int,
+                      help="评估模型最大并发请求数")
+    parser.add_argument("--eval-batch-size", type=int,
+                      help="第二步每次请求最多打包的组件对数量")
+    parser.add_argument("--eval-engine", type=str, choices=["llm", "graph"],
+                      help="第二步评估引擎: llm 或 graph")
+    parser.add_argument("--fast-path-compare", action="store_true",
+                      help="第二步先用本地规则判定明显一致/不一致的组件对，其余再调用评估模型")
+    parser.add_argument("--sampling", action="store_true",
+                      help="第二步抽样模式：估计一致率并在达到目标精度时停止")
+    parser.add_argument("--sampling-half-width", type=float,
+                      help="抽样模式的目标置信区间半宽")
+    parser.add_argument("--sampling-stratify", action="store_true",
+                      help="抽样模式按图像组件数分层")
+    parser.add_argument("--columnar-export", action="store_true",
+                      help="第二步完成后把评估结果导出为Parquet列式表")
+    parser.add_argument("--result-db", action="store_true",
+                      help="结果逐张写入SQLite结果库，JSON只在结束时导出")
+    parser.add_argument("--structured-output", type=str, choices=["auto", "guided_json", "json_schema", "off"],
+                      help="结构化输出方式：auto 按服务端类型选择，off 只靠提示词约束JSON格式")
+
+    parser.add_argument("--detect-model", type=str, choices=["two_stage", "pose"],
+                      help="节点/端口检测路径：two_stage 两个检测器，pose 单个姿态模型")
+    parser.add_argument("--no-detect-cache", action="store_true",
+                      help="不使用节点/端口检测结果缓存")
 
     parser.add_argument("--old-results-path", type=str,
                       help="旧结果路径")    
     parser.add_argument("--rerun", type=bool,
                       help="是否重新运行")
+    parser.add_argument("--drain-timeout", type=float,
+                      help="收到退出信号后等待在途请求完成的最长秒数")
+    parser.add_argument("--pipeline", action="store_true",
+                      help="流水线模式：第一步和第二步同时运行")
     
     return parser.parse_args()
 
@@ -63,15 +90,60 @@ def create_config_from_args(args):
     
     if args.output_dir:
         config_data["output_dir"] = args.output_dir
+
+    if args.image_manifest:
+        config_data["image_manifest"] = args.image_manifest
     
     if args.workers:
         config_data["workers"] = args.workers
 
+    if args.evaluator_workers:
+        config_data["evaluator_workers"] = args.evaluator_workers
+
+    if args.eval_batch_size:
+        config_data["eval_batch_size"] = args.eval_batch_size
+
+    if args.eval_engine:
+        config_data["eval_engine"] = args.eval_engine
+
+    if args.fast_path_compare:
+        config_data["fast_path_compare"] = args.fast_path_compare
+
+    if args.sampling:
+        config_data["sampling_mode"] = args.sampling
+
+    if args.sampling_half_width:
+        config_data["sampling_half_width"] = args.sampling_half_width
+
+    if args.sampling_stratify:
+        config_data["sampling_stratify"] = args.sampling_stratify
+
+    if args.columnar_export:
+        config_data["columnar_export"] = args.columnar_export
+
+    if args.result_db:
+        config_data["result_db"] = args.result_db
+
+    if args.structured_output:
+        config_data["structured_output"] = args.structured_output
+
+    if args.detect_model:
+        config_data["detect_model"] = args.detect_model
+
+    if args.no_detect_cache:
+        config_data["detect_cache"] = False
+
     if args.old_results_path:
         config_data["old_results_path"] = args.old_results_path
 
     if args.rerun:
         config_data["rerun"] = args.rerun
+
+    if args.drain_timeout is not None:
+        config_data["drain_timeout"] = args.drain_timeout
+
+    if args.pipeline:
+        config_data["pipeline"] = args.pipeline
     
     # 创建配置对象
     config = Config(
@@ -79,6 +151,7 @@ def create_config_from_args(args):
         image_root_dir=config_data["image_root"],
         prompts_path=config_data["prompts_file"],
         output_dir=config_data["output_dir"],
+        image_manifest=config_data.get("image_manifest", ""),
         
         # 模型配置
         model1_api=config_data["model1_api"],
@@ -95,13 +168,58 @@ def create_config_from_args(args):
         
         # 并发配置
         num_workers=config_data["workers"],
+        evaluator_workers=config_data.get("evaluator_workers", 16),
         
         # 生成参数
         temperature=config_data["temperature"],
         max_tokens=config_data["max_tokens"],
+        structured_output=config_data.get("structured_output", "auto"),
 
         ##sample node rate 
         node_sample_rate=config_data["node_sample_rate"],
+
+        ## 节点/端口检测
+        detect_batch_size=config_data.get("detect_batch_size", 8),
+        detect_workers=config_data.get("detect_workers", 1),
+        detect_profile=config_data.get("detect_profile", "production"),
+        detect_backend=config_data.get("detect_backend", "torch"),
+        detect_threads=config_data.get("detect_threads", 0),
+        detect_int8=config_data.get("detect_int8", False),
+        detect_cache=config_data.get("detect_cache", True),
+        detect_cache_path=config_data.get("detect_cache_path", ""),
+        detect_tile_pixels=config_data.get("detect_tile_pixels", 2048 * 2048),
+        detect_tile_size=config_data.get("detect_tile_size", 1024),
+        detect_model=config_data.get("detect_model", "two_stage"),
+        detect_pose_weights=config_data.get("detect_pose_weights", ""),
+
+        ## 优雅退出
+        drain_timeout=config_data.get("drain_timeout", 60.0),
+
+        ## 流水线模式
+        pipeline=config_data.get("pipeline", False),
+        pipeline_queue_size=config_data.get("pipeline_queue_size", 16),
+
+        ## 第二步本地快速比较
+        fast_path_compare=config_data.get("fast_path_compare", False),
+        fast_path_mismatch_score=config_data.get("fast_path_mismatch_score", 0.0),
+
+        ## 第二步批量评估
+        eval_batch_size=config_data.get("eval_batch_size", 1),
+        eval_engine=config_data.get("eval_engine", "llm"),
+
+        ## 第二步抽样模式
+        sampling_mode=config_data.get("sampling_mode", False),
+        sampling_half_width=config_data.get("sampling_half_width", 0.03),
+        sampling_confidence=config_data.get("sampling_confidence", 0.95),
+        sampling_min_samples=config_data.get("sampling_min_samples", 30),
+        sampling_stratify=config_data.get("sampling_stratify", False),
+        sampling_seed=config_data.get("sampling_seed", 0),
+
+        ## 列式结果导出
+        columnar_export=config_data.get("columnar_export", False),
+
+        ## 结果库
+        result_db=config_data.get("result_db", False),
     )
     
     # 创建输出目录
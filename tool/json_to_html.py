@@ -7,8 +7,13 @@ JSON到HTML可视化转换器
 
 import json
 import os
+import sys
 from datetime import datetime
 
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.columnar_store import ResultQuery, default_columnar_dir, is_up_to_date
+
 def load_json_data(json_file_path):
     """加载JSON数据"""
     try:
@@ -39,7 +44,17 @@ def format_description(description):
     else:
         return description
 
-def create_html_content(data):
+def load_summary(json_file_path):
+    """从未过期的列式结果计算整体统计，没有列式结果时返回None"""
+    if not is_up_to_date(json_file_path):
+        return None
+    try:
+        return ResultQuery(default_columnar_dir(json_file_path)).summary()
+    except Exception as e:
+        print(f"读取列式结果时出错: {e}")
+        return None
+
+def create_html_content(data, summary=None):
     """创建HTML内容"""
     html_content = f"""
 <!DOCTYPE html>
@@ -292,6 +307,28 @@ def create_html_content(data):
         </div>
 """
     
+    if summary:
+        html_content += f"""
+        <div class="summary-stats">
+            <div class="stat-card">
+                <div class="stat-number">{summary['total_images']}</div>
+                <div class="stat-label">图像数</div>
+            </div>
+            <div class="stat-card">
+                <div class="stat-number">{summary['consistent_components']}/{summary['total_components']}</div>
+                <div class="stat-label">一致组件数</div>
+            </div>
+            <div class="stat-card">
+                <div class="stat-number">{summary['component_consistency_rate']:.1%}</div>
+                <div class="stat-label">组件一致率</div>
+            </div>
+            <div class="stat-card">
+                <div class="stat-number">{summary['average_consistency_score']:.1f}</div>
+                <div class="stat-label">平均一致性分数</div>
+            </div>
+        </div>
+"""
+    
     # 遍历每个图像的结果
     for image_name, image_data in data.items():
         components = image_data.get('components', [])
@@ -436,7 +473,7 @@ def main():
     
     # 创建HTML内容
     print("正在生成HTML内容...")
-    html_content = create_html_content(data)
+    html_content = create_html_content(data, load_summary(json_file))
     
     # 保存HTML文件
     print("正在保存HTML文件...")
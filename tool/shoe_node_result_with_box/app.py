@@ -6,6 +6,16 @@ import base64
 from PIL import Image, ImageDraw, ImageFont
 import io
 import html
+import sys
+import atexit
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from src.json_stream import JsonRecordStore
+from src.columnar_store import ResultQuery, default_columnar_dir, is_up_to_date
+from src.result_db import ResultDB, default_db_path
+from src.box import Box, parse_box
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key-here'
@@ -21,12 +31,50 @@ def get_image_root_dir():
     """获取当前设置的图片根目录路径"""
     return session.get('image_root_dir', DEFAULT_IMAGE_ROOT_DIR)
 
+# 按文件路径缓存的记录索引，文件大小或修改时间变化后重建
+_store_cache = {}
+
+# 标注保存追加到JSON文件的更新日志（见 JsonRecordStore.update），多个请求线程串行写入
+_save_lock = threading.Lock()
+
+@atexit.register
+def _compact_stores():
+    """退出时把标注的更新日志合并回JSON文件"""
+    for _, store in _store_cache.values():
+        try:
+            store.compact()
+        except Exception as e:
+            print(f"合并 {store.path} 的更新日志时出错: {e}")
+
+# 按文件路径缓存的结果库连接
+_db_cache = {}
+
+def get_result_db(json_file):
+    """JSON文件旁存在同名结果库时返回结果库，否则返回None"""
+    db_path = default_db_path(json_file)
+    if not os.path.exists(db_path):
+        return None
+    if db_path not in _db_cache:
+        _db_cache[db_path] = ResultDB(db_path)
+    return _db_cache[db_path]
+
 def load_json_data():
-    """加载JSON数据"""
+    """加载JSON数据，返回按需读取单条记录的映射，不把整个文件载入内存
+
+    JSON文件旁有同名结果库（.db）时以结果库为准，否则按字节偏移索引读取JSON文件。
+    """
     json_file = get_json_data_file()
     try:
-        with open(json_file, 'r', encoding='utf-8') as f:
-            return json.load(f)
+        db = get_result_db(json_file)
+        if db is not None:
+            return db
+        stat = os.stat(json_file)
+        signature = (stat.st_size, stat.st_mtime_ns)
+        cached = _store_cache.get(json_file)
+        if cached is None or cached[0] != signature:
+            cached = (signature, JsonRecordStore(json_file))
+            _store_cache[json_file] = cached
+        return cached[1]
     except Exception as e:
         print(f"加载JSON文件时出错: {e}")
         return {}
@@ -45,6 +93,20 @@ def escape_html_attr(text):
 def get_image_list():
     """获取图像列表"""
     data = load_json_data()
+    # 同一份文件的统计只流式扫描一次
+    if getattr(data, 'image_list', None) is not None:
+        return data.image_list
+    if isinstance(data, ResultDB):
+        # 结果库：按组件行直接聚合
+        return data.image_stats()
+    json_file = get_json_data_file()
+    if isinstance(data, JsonRecordStore) and is_up_to_date(json_file):
+        # 已导出且未过期的列式结果：直接按列聚合
+        try:
+            data.image_list = ResultQuery(default_columnar_dir(json_file)).image_stats()
+            return data.image_list
+        except Exception as e:
+            print(f"读取列式结果时出错，改为逐条统计: {e}")
     image_list = []
     
     for image_name, image_data in data.items():
@@ -64,7 +126,10 @@ def get_image_list():
             'io_matches': io_matches
         })
     
-    return sorted(image_list, key=lambda x: x['name'])
+    image_list = sorted(image_list, key=lambda x: x['name'])
+    if isinstance(data, JsonRecordStore):
+        data.image_list = image_list
+    return image_list
 
 def get_image_index(image_name):
     """获取图像在列表中的索引"""
@@ -104,7 +169,7 @@ def draw_boxes_on_image(image_path, component_details):
         # 为每个组件画框
         for component_coords, detail_info in component_details.items():
             # 解析组件坐标
-            coords = eval(component_coords)  # [x1, y1, x2, y2]
+            coords = Box.parse(component_coords)  # [x1, y1, x2, y2]
             x1, y1, x2, y2 = coords
             
             # 根据IO是否匹配设置组件颜色
@@ -210,7 +275,7 @@ def create_image_html(image_name, image_data):
         io_match = detail_info.get('io_num_match', False)
         try:
             # 根据坐标排序，确保顺序稳定
-            coords = eval(coords_str)
+            coords = Box.parse(coords_str)
             y1, x1 = coords[1], coords[0]
         except Exception:
             y1, x1 = 0, 0
@@ -1714,13 +1779,14 @@ def save_annotation():
         print(f"JSON文件路径: {json_file}")
         
         json_data = load_json_data()
-        print(f"加载的JSON数据键: {list(json_data.keys())}")
+        print(f"加载的JSON数据图像数: {len(json_data)}")
         
         if image_name not in json_data:
             print(f"图像不存在: {image_name}")
             return jsonify({'success': False, 'message': '图像不存在'})
         
-        component_details = json_data[image_name].get('component_details', {})
+        image_data = json_data[image_name]
+        component_details = image_data.get('component_details', {})
         print(f"组件详情键: {list(component_details.keys())}")
         
         if component_coords not in component_details:
@@ -1734,9 +1800,15 @@ def save_annotation():
         
         # 保存到文件
         print(f"准备保存到文件: {json_file}")
-        with open(json_file, 'w', encoding='utf-8') as f:
-            json.dump(json_data, f, ensure_ascii=False, indent=2)
-        print("文件保存成功")
+        if isinstance(json_data, ResultDB):
+            # 结果库：只更新这一个组件的行
+            json_data.update_component(image_name, component_coords, {'label': label})
+            print("结果库更新成功")
+        else:
+            # 只追加当前图像的记录，日志过大或程序退出时合并回JSON文件
+            with _save_lock:
+                json_data.update(image_name, image_data)
+            print("文件保存成功")
         
         return jsonify({'success': True, 'message': f'已保存标注: {label}'})
         
@@ -1810,7 +1882,7 @@ def draw_single_component_with_connections(image_path, component_coords, compone
         description = current_detail.get('description', {})
         
         # 解析当前组件坐标
-        coords = eval(component_coords)
+        coords = Box.parse(component_coords)
         x1, y1, x2, y2 = coords
         
         # 绘制当前组件（红色边框，更粗）
@@ -1851,34 +1923,11 @@ def draw_single_component_with_connections(image_path, component_coords, compone
             """将不同的坐标格式转换为标准的[x1, y1, x2, y2]格式"""
             if not box_str or box_str == "()":
                 return None
-            
-            try:
-                # 移除所有空格，然后处理不同的括号
-                clean_str = box_str.replace(" ", "")
-                
-                # 如果是圆括号格式，转换为方括号
-                if clean_str.startswith("(") and clean_str.endswith(")"):
-                    # 去掉圆括号
-                    coords_str = clean_str[1:-1]
-                    # 解析坐标
-                    coords = [int(x.strip()) for x in coords_str.split(",")]
-                    if len(coords) == 4:
-                        # 转换为标准格式（带空格的方括号）
-                        return f"[{coords[0]}, {coords[1]}, {coords[2]}, {coords[3]}]"
-                
-                # 如果已经是方括号格式，直接解析并格式化
-                elif clean_str.startswith("[") and clean_str.endswith("]"):
-                    coords_str = clean_str[1:-1]
-                    coords = [int(x.strip()) for x in coords_str.split(",")]
-                    if len(coords) == 4:
-                        # 确保格式一致（带空格）
-                        return f"[{coords[0]}, {coords[1]}, {coords[2]}, {coords[3]}]"
-                
-                return None
-                
-            except Exception as e:
-                print(f"坐标格式转换失败: {box_str}, 错误: {e}")
+            box = parse_box(box_str)
+            if box is None:
+                print(f"坐标格式转换失败: {box_str}")
                 return None
+            return box.key
         
         # 收集输入和输出连接的组件
         input_components = set()
@@ -1932,7 +1981,7 @@ def draw_single_component_with_connections(image_path, component_coords, compone
         # 绘制输入连接的组件（紫色边框，与输入端口颜色一致）
         for conn_coords in input_components:
             try:
-                conn_coords_list = eval(conn_coords)
+                conn_coords_list = Box.parse(conn_coords)
                 if len(conn_coords_list) == 4:
                     cx1, cy1, cx2, cy2 = conn_coords_list
                     # 直接绘制连接区域的框（紫色）
@@ -1952,7 +2001,7 @@ def draw_single_component_with_connections(image_path, component_coords, compone
         # 绘制输出连接的组件（青色边框，与输出端口颜色一致）
         for conn_coords in output_components:
             try:
-                conn_coords_list = eval(conn_coords)
+                conn_coords_list = Box.parse(conn_coords)
                 if len(conn_coords_list) == 4:
                     cx1, cy1, cx2, cy2 = conn_coords_list
                     # 直接绘制连接区域的框（青色）
@@ -1972,7 +2021,7 @@ def draw_single_component_with_connections(image_path, component_coords, compone
         # 绘制双向连接的组件（橙色边框）
         for conn_coords in bidirectional_components:
             try:
-                conn_coords_list = eval(conn_coords)
+                conn_coords_list = Box.parse(conn_coords)
                 if len(conn_coords_list) == 4:
                     cx1, cy1, cx2, cy2 = conn_coords_list
                     # 直接绘制连接区域的框（橙色）